@@ -0,0 +1,168 @@
+# benchmarks/bench_callback_dispatch.py
+"""
+Compares aiogram's router scan with CallbackDispatchTable for callback queries, and translating-and-comparing
+reply button texts with the reply_button_index lookup. The router tree mirrors the callback handlers in
+handlers/ (same CallbackData classes, rules, FSM states and include order) with no-op handlers.
+Run from the project root: python -m benchmarks.bench_callback_dispatch [--queries 20000]
+"""
+import argparse
+import asyncio
+import time
+from typing import Any, Dict, List, Tuple
+
+from aiogram import Bot, Dispatcher, F, Router
+from aiogram.filters import Filter
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Update
+
+from utils.callbacks import (
+    LanguageCallback, MainMenuCallback, ChannelCallback, BoostOrderCallback, WalletCallback,
+    PromocodeCallback, AdminCallback, AdminReportCallback, PageCallback
+)
+from utils.dispatch import CallbackDispatchTable, reply_button_index
+from utils.states import Form
+
+_ORDER_LISTINGS = {"active": None, "history": None}
+_REPORT_LISTINGS = {"orders": None, "topups": None}
+
+class _AllowAll(Filter): # Stands in for AdminFilter
+    async def __call__(self, *args: Any, **kwargs: Any) -> bool:
+        return True
+
+# (router, filters) in bot.py's include order; handler names are only for the equivalence check
+ROUTERS: List[List[Tuple[str, tuple]]] = [
+    [], # start
+    [("set_language", (LanguageCallback.filter(), Form.lang_selection))], # language
+    [], # channel_setup
+    [], # main_menu
+    [ # boosting
+        ("new_boost", (MainMenuCallback.filter(F.action == "new_boost"),)),
+        ("type_select", (BoostOrderCallback.filter(F.action == "type_select"), Form.boosting_choose_type)),
+        ("channel_select", (ChannelCallback.filter(F.action == "select"), Form.boosting_choose_channel)),
+        ("confirm_order", (BoostOrderCallback.filter(F.action == "confirm"), Form.boosting_confirm_order)),
+        ("cancel_order", (BoostOrderCallback.filter(F.action == "cancel"), Form.boosting_confirm_order)),
+        ("orders_listing", (MainMenuCallback.filter(F.action.in_({"active_boosts", "boost_history"})),)),
+        ("orders_page", (PageCallback.filter(F.listing.in_(_ORDER_LISTINGS)),)),
+        ("my_channels", (MainMenuCallback.filter(F.action == "my_channels"),)),
+        ("manage_channel", (ChannelCallback.filter(F.action == "manage"),)),
+        ("buy_slots", (MainMenuCallback.filter(F.action == "buy_channel_slots"),)),
+    ],
+    [ # account
+        ("promocode", (MainMenuCallback.filter(F.action == "promocode"),)),
+        ("promocode_input", (PromocodeCallback.filter(F.action == "input"),)),
+        ("invite_friends", (MainMenuCallback.filter(F.action == "invite_friends"),)),
+    ],
+    [ # wallet
+        ("buy", (WalletCallback.filter(F.action == "buy"),)),
+        ("select_amount", (WalletCallback.filter(F.action == "select_amount"),)),
+        ("check_payment", (WalletCallback.filter(F.action == "check_payment"),)),
+        ("earn", (WalletCallback.filter(F.action == "earn"),)),
+    ],
+    [ # offers
+        ("become_pro", (MainMenuCallback.filter(F.action == "become_pro"),)),
+        ("franchise", (MainMenuCallback.filter(F.action == "franchise"),)),
+    ],
+    [ # admin_panel (router-level AdminFilter)
+        ("cancel_broadcast_state", (AdminCallback.filter(F.action == "cancel_broadcast"), Form.admin_broadcast)),
+        ("financial", (AdminReportCallback.filter(F.action == "financial"),)),
+        ("reports_menu", (AdminReportCallback.filter(F.action == "menu"),)),
+        ("report_listing", (AdminReportCallback.filter(F.action.in_(_REPORT_LISTINGS)),)),
+        ("report_page", (PageCallback.filter(F.listing.in_(_REPORT_LISTINGS)),)),
+    ],
+    [ # callbacks (global)
+        ("main_menu", (MainMenuCallback.filter(F.action == "main_menu"),)),
+        ("boosting", (MainMenuCallback.filter(F.action == "boosting"),)),
+        ("wallet", (MainMenuCallback.filter(F.action == "wallet"),)),
+        ("my_account", (MainMenuCallback.filter(F.action == "my_account"),)),
+        ("offers", (MainMenuCallback.filter(F.action == "offers"),)),
+        ("cancel_broadcast", (AdminCallback.filter(F.action == "cancel_broadcast"),)),
+    ],
+]
+
+QUERIES = [
+    MainMenuCallback(action=a).pack() for a in
+    ("main_menu", "boosting", "wallet", "my_account", "offers", "new_boost", "active_boosts", "my_channels", "promocode", "franchise")
+] + [
+    WalletCallback(action="select_amount", credits=500, usd_amount=5.0).pack(),
+    WalletCallback(action="check_payment", invoice_uuid="0b8f1c2e-4a7d-4e1b-9c55-2f1e7b3d9a10").pack(),
+    ChannelCallback(action="manage", channel_id=-1001234567890).pack(),
+    PageCallback(listing="history", ts=1718000000000, item_id="O0HZX4K2N7P3Q").pack(),
+    AdminReportCallback(action="orders").pack(),
+    BoostOrderCallback(action="confirm", order_type="turbo").pack(), # Needs an FSM state: falls through unhandled
+    "unknown:data",
+]
+
+def build_dispatcher(indexed: bool, calls: List[str]) -> Dispatcher:
+    dp = Dispatcher(storage=MemoryStorage())
+    for i, handlers in enumerate(ROUTERS):
+        router = Router(name=f"router_{i}")
+        if i == 8:
+            router.callback_query.filter(_AllowAll())
+        for name, filters in handlers:
+            async def handler(call, _name=name):
+                calls.append(_name)
+            router.callback_query.register(handler, *filters)
+        dp.include_router(router)
+    if indexed:
+        dp.callback_query.outer_middleware(CallbackDispatchTable(dp))
+    return dp
+
+def _update(update_id: int, data: str, bot: Bot) -> Update:
+    return Update.model_validate({"update_id": update_id, "callback_query": {
+        "id": str(update_id), "chat_instance": "1", "data": data,
+        "from": {"id": 42, "is_bot": False, "first_name": "Test"},
+        "message": {"message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}},
+    }}, context={"bot": bot})
+
+async def _time(dp: Dispatcher, bot: Bot, updates: List[Update]) -> float:
+    start = time.perf_counter()
+    for update in updates:
+        await dp.feed_update(bot, update)
+    return time.perf_counter() - start
+
+def _time_buttons(texts: List[str], translate: Dict[str, str], repeat: int) -> Tuple[float, float]:
+    keys = ["main_menu.buttons.boosting", "main_menu.buttons.my_account", "main_menu.buttons.wallet", "main_menu.buttons.offers"]
+    _ = translate.__getitem__ # Cheapest possible translator, flatters the if/elif chain
+    start = time.perf_counter()
+    for _r in range(repeat):
+        for text in texts:
+            for key in keys:
+                if text == _(key):
+                    break
+    chain = time.perf_counter() - start
+    index = reply_button_index("main_menu.buttons")
+    start = time.perf_counter()
+    for _r in range(repeat):
+        for text in texts:
+            index.get(text)
+    return chain, time.perf_counter() - start
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=20000)
+    args = parser.parse_args()
+
+    bot = Bot("123456:" + "A" * 35)
+    updates = [_update(i, QUERIES[i % len(QUERIES)], bot) for i in range(args.queries)]
+    scan_calls: List[str] = []
+    table_calls: List[str] = []
+    scan = build_dispatcher(False, scan_calls)
+    table = build_dispatcher(True, table_calls)
+    await _time(scan, bot, updates[:200]) # Warm up
+    await _time(table, bot, updates[:200])
+    if scan_calls != table_calls:
+        raise SystemExit("Indexed dispatch picked different handlers than the router scan")
+    scan_time = min([await _time(scan, bot, updates) for _ in range(3)])
+    table_time = min([await _time(table, bot, updates) for _ in range(3)])
+    print(f"{'callback routing':<20}{'router scan':>14}{'table':>14}{'speedup':>10}   ({args.queries} queries)")
+    print(f"{'feed_update':<20}{scan_time:>13.3f}s{table_time:>13.3f}s{scan_time / table_time:>9.2f}x")
+
+    en = {"main_menu.buttons.boosting": "🚀 Boosting", "main_menu.buttons.my_account": "👤 My Account",
+          "main_menu.buttons.wallet": "💰 Wallet", "main_menu.buttons.offers": "💡 Special Offers"}
+    texts = list(en.values()) + ["some free text"]
+    chain, lookup = _time_buttons(texts, en, args.queries)
+    print(f"{'reply buttons':<20}{chain:>13.3f}s{lookup:>13.3f}s{chain / lookup:>9.2f}x")
+    await bot.session.close()
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+# benchmarks/bench_i18n.py
+"""
+Compares the generic translation path (every locale's YAML tree loaded up front, each _() walking the
+dotted key through it with a default-locale fallback, then str.format parsing the template) with the
+compiled i18n.core catalogs (flat key -> Template table per locale, compiled on first use).
+Run from the project root: python -m benchmarks.bench_i18n [--calls 200000]
+"""
+import argparse
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import yaml
+
+from config.settings import settings
+from i18n.core import YamlI18n
+
+class GenericCatalog:
+    """The lookup the compiled core replaces: nested dicts walked per call, templates parsed by str.format per call."""
+
+    def __init__(self, path: Path, default_locale: str):
+        self.default_locale = default_locale
+        self.trees: Dict[str, Dict[str, Any]] = {}
+        for file in path.glob("*.yml"):
+            with open(file, encoding="utf-8") as f:
+                self.trees[file.stem] = yaml.safe_load(f) or {}
+
+    def _find(self, tree: Dict[str, Any], key: str) -> Optional[str]:
+        node: Any = tree
+        for part in key.split("."):
+            if not isinstance(node, dict) or part not in node:
+                return None
+            node = node[part]
+        return node if isinstance(node, str) else None
+
+    def translator(self, locale: str) -> Callable[..., str]:
+        def _(key: str, **kwargs: Any) -> str:
+            text = self._find(self.trees.get(locale, {}), key)
+            if text is None:
+                text = self._find(self.trees[self.default_locale], key) or key
+            return text.format(**kwargs) if kwargs else text
+        return _
+
+# (key, format arguments) in roughly the mix handlers use: mostly plain labels, some formatted messages
+CALLS: List[Tuple[str, Dict[str, Any]]] = [
+    ("common.back", {}),
+    ("common.back_to_main", {}),
+    ("main_menu.buttons.boosting", {}),
+    ("boosting_menu.active_orders", {}),
+    ("main_menu.greeting", {"user_name": "Alice"}),
+    ("wallet_menu.current_balance", {"balance": 1500}),
+    ("my_account_menu.user_info", {
+        "id": 123456789, "username": "alice", "first_name": "Alice", "last_name": "", "lang_code": "en",
+        "registered_at": "2024-06-01 12:00", "last_activity_at": "2024-06-10 08:30", "balance": 1500, "pro_status_text": "PRO",
+    }),
+    ("error.default", {}),
+]
+
+def _time(translate: Callable[..., str], calls: int, formatted: bool) -> float:
+    batch = [(key, kwargs) for key, kwargs in CALLS if bool(kwargs) == formatted]
+    rounds = max(calls // len(batch), 1)
+    start = time.perf_counter()
+    if formatted:
+        for _r in range(rounds):
+            for key, kwargs in batch:
+                translate(key).format(**kwargs) # How handlers call it: _("key").format(...)
+    else:
+        for _r in range(rounds):
+            for key, _kwargs in batch:
+                translate(key)
+    return time.perf_counter() - start
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--calls", type=int, default=200000)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    generic = GenericCatalog(settings.LOCALES_DIR, settings.DEFAULT_LOCALE)
+    generic_load = time.perf_counter() - start
+    start = time.perf_counter()
+    compiled = YamlI18n(settings.LOCALES_DIR, settings.DEFAULT_LOCALE)
+    compiled.translator("en") # A user's locale plus the default it falls back to
+    compiled_load = time.perf_counter() - start
+    print(f"startup: generic {generic_load * 1000:.1f}ms ({len(generic.trees)} locales), "
+          f"compiled {compiled_load * 1000:.1f}ms ({', '.join(compiled.loaded)} of {len(compiled.available)} locales)")
+
+    for key, kwargs in CALLS:
+        expected = generic.translator("en")(key).format(**kwargs)
+        if compiled.translator("en")(key).format(**kwargs) != expected:
+            raise SystemExit(f"Compiled catalog renders {key} differently")
+
+    print(f"{'':<16}{'generic':>12}{'compiled':>12}{'speedup':>10}   ({args.calls} calls)")
+    for label, formatted in (("_(key)", False), ("_(key).format", True)):
+        generic_time = min(_time(generic.translator("en"), args.calls, formatted) for _ in range(3))
+        compiled_time = min(_time(compiled.translator("en"), args.calls, formatted) for _ in range(3))
+        print(f"{label:<16}{generic_time:>11.3f}s{compiled_time:>11.3f}s{generic_time / compiled_time:>9.2f}x")
+
+if __name__ == "__main__":
+    main()
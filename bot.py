@@ -1,42 +1,41 @@
 # bot.py
+from utils.startup_profile import startup_profiler
+startup_profiler.install_from_env() # STARTUP_PROFILE=1: time every import below
+
 import asyncio
 
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage # Or RedisStorage for production
+from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.enums import ParseMode
 import logging
-from apscheduler.schedulers.asyncio import AsyncIOScheduler # Import for scheduler
 from pathlib import Path # Add this import for path manipulation within i18n setup
 
 # Project imports
 from config.settings import settings
 from database.db import MongoDB # Corrected to MongoDB class
-from database.repositories import UserRepository, OrderRepository, TransactionRepository, PromoCodeRepository, BoosterAccountRepository
+from database.repositories import UserRepository, OrderRepository, TransactionRepository, PromoCodeRepository, BoosterAccountRepository, DailyFinancialsRepository, FSMStateRepository, BroadcastRepository
+from database.cache import TTLCache
+from database.fsm_storage import MongoStorage
+from database.write_behind import WriteBehindBuffer
+from utils.webhook import run_webhook
+from utils.sharding import INVALIDATE_PATH, PeerCacheInvalidator, run_sharded, worker_health, worker_invalidation
+from utils.rate_limit import OutboundRateLimitMiddleware
+from utils.dispatch import CallbackDispatchTable
+from utils.container import ServiceContainer, ServiceResolverMiddleware
 
 # Middlewares
 from middlewares.user_middleware import UserMiddleware
 from middlewares.i18n_middleware import UserI18nMiddleware
 from middlewares.auth_middleware import AuthMiddleware
+from utils.ordered_dispatcher import OrderedDispatcher
+from utils.ordered_executor import OrderedExecutor
 
-# i18n setup
-# --- PATCH START ---
-# Import the i18n_manager from your i18n.py file
+# i18n setup: YAML catalogs from i18n/locales, compiled per locale on first use
 from i18n import i18n_manager
-# --- PATCH END ---
 
 # Utilities
 from utils.logger import setup_logging
 
-# Services
-from services.user_service import UserService
-from services.channel_service import ChannelService
-from services.order_service import OrderService
-from services.payment_service import PaymentService
-from services.admin_service import AdminService
-from services.mailing_service import MailingService
-from services.ai_service import AIService
-from services.webapp_service import WebAppService # NEW
-
 # Handlers imports
 from handlers.private import (
     start,
@@ -51,16 +50,27 @@ from handlers.private import (
 from handlers.admin import admin_panel
 from handlers.callbacks import router as global_callbacks_router # Import common callback router itself
 
-# Scheduler tasks setup
-from tasks.scheduler import setup_scheduler as setup_background_scheduler
-
 # Setup logging
 setup_logging()
 logger = logging.getLogger(__name__)
 
-async def on_startup(bot: Bot, dispatcher: Dispatcher):
+def register_services(services: ServiceContainer) -> None:
+    """Services handlers can ask for by parameter name; each module is imported and built on first use."""
+    services.add("user_service", "services.user_service:UserService", "user_repo", "promo_repo")
+    services.add("channel_service", "services.channel_service:ChannelService", "bot", "user_repo")
+    services.add("order_service", "services.order_service:OrderService", "order_repo", "user_repo", "mongo_transactions")
+    services.add("payment_service", "services.payment_service:PaymentService", "user_repo", "transaction_repo", "daily_financials_repo")
+    services.add("admin_service", "services.admin_service:AdminService",
+                 "user_repo", "order_repo", "transaction_repo", "promo_repo", "booster_account_repo", "daily_financials_repo")
+    services.add("broadcast_service", "services.broadcast_service:BroadcastService", "bot", "user_repo", "broadcast_repo")
+    services.add("mailing_service", "services.mailing_service:MailingService", "bot", "user_repo", "broadcast_service")
+    services.add("ai_service", "services.ai_service:AIService")
+    services.add("webapp_service", "services.webapp_service:WebAppService", "user_repo")
+
+async def on_startup(bot: Bot, dispatcher: Dispatcher, services: ServiceContainer):
     # Ensure MongoDB connection is initialized globally first
-    await MongoDB().connect() # Connect using the global instance
+    with startup_profiler.phase("MongoDB connect"):
+        await MongoDB().connect() # Connect using the global instance
 
     # Initialize repositories
     user_repo = UserRepository(MongoDB().db)
@@ -68,36 +78,58 @@ async def on_startup(bot: Bot, dispatcher: Dispatcher):
     transaction_repo = TransactionRepository(MongoDB().db)
     promo_repo = PromoCodeRepository(MongoDB().db)
     booster_account_repo = BoosterAccountRepository(MongoDB().db)
-
-    # Initialize services
-    user_service = UserService(user_repo, promo_repo)
-    channel_service = ChannelService(bot, user_repo)
-    order_service = OrderService(order_repo, user_repo)
-    payment_service = PaymentService(user_repo, transaction_repo)
-    admin_service = AdminService(user_repo, order_repo, transaction_repo, promo_repo, booster_account_repo)
-    mailing_service = MailingService(bot, user_repo)
-    ai_service = AIService()
-    webapp_service = WebAppService(user_repo) # NEW
-
-    # Pass services and repositories to handlers via data
-    # This makes them available in the `data` dictionary of handler functions
+    daily_financials_repo = DailyFinancialsRepository(MongoDB().db)
+    broadcast_repo = BroadcastRepository(MongoDB().db)
+
+    # Coalesced last_activity_at writes, flushed in bulk every few seconds
+    activity_buffer = WriteBehindBuffer(
+        user_repo.collection,
+        flush_interval=settings.ACTIVITY_FLUSH_INTERVAL_SECONDS,
+        max_pending=settings.ACTIVITY_MAX_PENDING
+    )
+    activity_buffer.start()
+
+    # Repositories are cheap and used by outer middlewares: built now. Services are built by the container
+    # when a handler first declares them (ServiceResolverMiddleware), so admin-only ones mostly never are.
     dispatcher["user_repo"] = user_repo
-    dispatcher["user_service"] = user_service
-    dispatcher["channel_service"] = channel_service
-    dispatcher["order_service"] = order_service
-    dispatcher["payment_service"] = payment_service
-    dispatcher["admin_service"] = admin_service
-    dispatcher["mailing_service"] = mailing_service
-    dispatcher["ai_service"] = ai_service
-    dispatcher["webapp_service"] = webapp_service # NEW
+    if settings.BOT_MODE == "shard_worker":
+        # Users are cached by the worker owning them: writes made here to other workers' users are sent there
+        peer_invalidator = PeerCacheInvalidator(settings.SHARD_INDEX, settings.SHARD_WORKERS, settings.WEBHOOK_SECRET)
+        user_repo.on_invalidate = peer_invalidator
+        dispatcher["peer_invalidator"] = peer_invalidator
+    dispatcher["activity_buffer"] = activity_buffer
+    for name, instance in (("bot", bot), ("user_repo", user_repo), ("order_repo", order_repo),
+                           ("transaction_repo", transaction_repo), ("promo_repo", promo_repo),
+                           ("booster_account_repo", booster_account_repo), ("daily_financials_repo", daily_financials_repo),
+                           ("broadcast_repo", broadcast_repo), ("mongo_transactions", MongoDB().supports_transactions)):
+        services.add_instance(name, instance)
 
     # Setup background scheduler tasks
     # Passing the global MongoDB instance to scheduler tasks
-    await setup_background_scheduler(mailing_service, payment_service)
+    if settings.RUN_SCHEDULER: # Off in all shard workers but one, so jobs don't run once per process
+        with startup_profiler.phase("scheduler"):
+            from tasks.scheduler import setup_scheduler as setup_background_scheduler # APScheduler only where jobs run
+            await setup_background_scheduler(services.get("mailing_service"), services.get("payment_service"))
+        services.get("broadcast_service").start_watchdog() # Resumes broadcasts whose process died
 
     logger.info("Bot started successfully!")
+    if startup_profiler.enabled:
+        startup_profiler.uninstall() # Imports from here on are lazy service builds, logged by the container
+        logger.info(startup_profiler.report())
 
 async def on_shutdown(bot: Bot, dispatcher: Dispatcher):
+    update_executor = dispatcher.get("update_executor")
+    if update_executor:
+        await update_executor.join() # Let accepted updates finish while the database is still there
+    services = dispatcher.get("services")
+    if services and "broadcast_service" in services.built():
+        await services.get("broadcast_service").stop() # Checkpoints running broadcasts so the next start resumes them
+    peer_invalidator = dispatcher.get("peer_invalidator")
+    if peer_invalidator:
+        await peer_invalidator.close() # After the last writes above, so their invalidations still go out
+    activity_buffer = dispatcher.get("activity_buffer")
+    if activity_buffer:
+        await activity_buffer.stop() # Final flush, needs the connection still open
     await MongoDB().close() # Close connection using the global instance
     logger.info("Bot shutting down.")
     # Ensure scheduler is shut down properly
@@ -109,31 +141,55 @@ async def on_shutdown(bot: Bot, dispatcher: Dispatcher):
 async def main():
     # Initialize Bot and Dispatcher
     bot = Bot(token=settings.BOT_TOKEN, parse_mode=ParseMode.HTML)
-    storage = MemoryStorage() # Use RedisStorage for production: `RedisStorage.from_url("redis://localhost:6379/1")`
-    dp = Dispatcher(storage=storage)
+    if settings.BOT_MODE == "sharded":
+        logger.info(f"Starting sharded front with {settings.SHARD_WORKERS} workers...")
+        await run_sharded(bot) # Routes updates to worker processes; no dispatcher in this process
+        return
+
+    # Outgoing message budget. Shard workers get their share of it from the front through /health
+    outbound_limiter = OutboundRateLimitMiddleware(
+        settings.OUTBOUND_RATE_LIMIT,
+        chat_rate=settings.OUTBOUND_CHAT_RATE,
+        chat_burst=settings.OUTBOUND_CHAT_BURST,
+        group_rate=settings.OUTBOUND_GROUP_RATE,
+        group_burst=settings.OUTBOUND_GROUP_BURST,
+        max_chats=settings.OUTBOUND_CHAT_BUCKETS,
+        max_retries=settings.OUTBOUND_MAX_RETRIES
+    )
+    bot.session.middleware(outbound_limiter)
+    if settings.FSM_STORAGE == "mongo":
+        with startup_profiler.phase("MongoDB connect (FSM storage)"):
+            await MongoDB().connect() # The storage needs the database before startup; on_startup reuses this connection
+        storage = MongoStorage(
+            FSMStateRepository(MongoDB().db),
+            state_ttl=settings.FSM_STATE_TTL_SECONDS,
+            cache=TTLCache(maxsize=settings.FSM_CACHE_SIZE, ttl=settings.FSM_CACHE_TTL_SECONDS)
+        )
+    else:
+        storage = MemoryStorage() # Per process and lost on restart
+    # Per-user ordered, cross-user parallel processing. The executor wraps feed_update itself, so aiogram's
+    # FSM middleware reads a user's state only after that user's previous update is done.
+    update_executor = OrderedExecutor(max_concurrency=settings.UPDATE_CONCURRENCY, max_pending=settings.UPDATE_MAX_PENDING)
+    dp = OrderedDispatcher(update_executor, storage=storage)
+    dp["update_executor"] = update_executor
+
+    # Services, built lazily; on_startup adds the repositories they are built from
+    services = ServiceContainer()
+    register_services(services)
+    dp["services"] = services
 
     # Register middlewares
     # Order for outer_middleware is important:
-    # 1. Official aiogram_i18n middleware (i18n_manager itself) should be registered first.
-    #    This sets up the primary i18n context (like locale detection from user settings)
-    #    and makes the 'i18n' object available in handler data.
-    # 2. UserMiddleware: If it provides 'user' and 'user_repo' in 'data' dictionary,
-    #    and your UserI18nMiddleware relies on them, then UserMiddleware must run before.
-    # 3. UserI18nMiddleware: Your custom middleware which then overrides/refines the locale
-    #    based on your database user preferences.
-
-    # --- PATCH START ---
-    # Register the aiogram_i18n.I18n instance from your i18n.py file as a middleware
-    dp.update.outer_middleware(i18n_manager) # Make sure this is one of the first outer_middlewares
-    # --- PATCH END ---
+    # 1. UserMiddleware provides 'user' (and its lang_code) in the 'data' dictionary.
+    # 2. UserI18nMiddleware picks the translator '_' for that user's language, so it must run after.
 
     dp.update.outer_middleware(UserMiddleware())
-    # Pass the i18n_manager instance (which is your aiogram_i18n.I18n object)
-    # to your custom UserI18nMiddleware.
+    # Pass the i18n_manager (i18n.YamlI18n catalogs) to UserI18nMiddleware.
     dp.update.outer_middleware(UserI18nMiddleware(i18n_manager))
 
     dp.message.middleware(AuthMiddleware())
     # dp.callback_query.middleware(AuthMiddleware()) # AuthMiddleware also applies to callbacks, no need to duplicate
+    ServiceResolverMiddleware(services).setup(dp) # Handlers get the services they declare, built on first use
 
     # Register routers (handlers)
     dp.include_router(start.router)
@@ -147,13 +203,26 @@ async def main():
     dp.include_router(admin_panel.router) # Admin panel router
     dp.include_router(global_callbacks_router) # Common callbacks like go to main menu
 
+    # Built from the router tree above, so it must come after the last include_router
+    dp.callback_query.outer_middleware(CallbackDispatchTable(dp))
+
     # Register startup/shutdown hooks
     dp.startup.register(on_startup)
     dp.shutdown.register(on_shutdown)
 
+    if settings.BOT_MODE in ("webhook", "shard_worker"):
+        logger.info(f"Starting bot in {settings.BOT_MODE} mode...")
+        if settings.BOT_MODE == "shard_worker":
+            await run_webhook(dp, bot, register=False, health=worker_health(dp, outbound_limiter),
+                              posts={INVALIDATE_PATH: worker_invalidation(dp)})
+        else:
+            await run_webhook(dp, bot)
+        return
+
     # Start polling
     logger.info("Starting bot polling...")
-    await dp.start_polling(bot)
+    await bot.delete_webhook() # Telegram refuses getUpdates while a webhook from webhook mode is still set
+    await dp.start_polling(bot, handle_as_tasks=False) # feed_update only queues into update_executor, so this keeps intake in order
 
 if __name__ == "__main__":
     try:
@@ -10,9 +10,93 @@ class Settings(BaseSettings):
     BOT_TOKEN: str
     ADMIN_IDS: List[int] = [] # Set default empty list, will be populated from .env
 
-    # MongoDB
+    # Update delivery: "polling", "webhook" (aiohttp server Telegram posts to; see utils/webhook.py) or "sharded" (below)
+    BOT_MODE: str = "polling"
+    WEBHOOK_BASE_URL: Optional[str] = None # Public HTTPS URL of the webhook server, e.g. https://bot.example.com
+    WEBHOOK_PATH: str = "/telegram/webhook"
+    WEBHOOK_SECRET: Optional[str] = None # Required by BOT_MODE=webhook/sharded (startup fails without it); Telegram sends it in X-Telegram-Bot-Api-Secret-Token and requests without it get 401
+    WEBHOOK_HOST: str = "0.0.0.0"
+    WEBHOOK_PORT: int = 8080
+    WEBHOOK_WORKERS: int = 64 # Updates processed concurrently
+    WEBHOOK_QUEUE_SIZE: int = 10000 # Acknowledged but unprocessed updates; beyond this Telegram is asked to retry
+    WEBHOOK_DEDUP_SIZE: int = 10000 # Recent update_ids remembered to drop redelivered updates
+    WEBHOOK_MAX_CONNECTIONS: int = 100 # Parallel connections Telegram may open (setWebhook max_connections, 1-100)
+
+    # BOT_MODE=sharded (utils/sharding.py): this process receives the webhook and routes each user to one of
+    # SHARD_WORKERS bot processes (BOT_MODE=shard_worker, started and restarted by it) on 127.0.0.1:SHARD_BASE_PORT + i
+    SHARD_WORKERS: int = 4
+    SHARD_BASE_PORT: int = 8100
+    SHARD_FORWARD_TIMEOUT_SECONDS: float = 5.0
+    SHARD_HEALTH_INTERVAL_SECONDS: float = 2.0
+    SHARD_HEALTH_TIMEOUT_SECONDS: float = 2.0
+    SHARD_HEALTH_FAILURES: int = 3 # Consecutive failed health checks before a worker is restarted
+    SHARD_STARTUP_GRACE_SECONDS: float = 30.0 # Time a (re)started worker gets before failed health checks count
+    SHARD_RATE_FLOOR: float = 0.3 # Share of OUTBOUND_RATE_LIMIT split evenly; the rest follows each worker's demand
+    SHARD_INDEX: int = 0 # Set by the front on each shard_worker: its position among the SHARD_WORKERS
+    RUN_SCHEDULER: bool = True # Background jobs (tasks/scheduler.py); in sharded mode only worker 0 runs them
+
+    # Outgoing messages per second for the whole bot (utils/rate_limit.py); in sharded mode split between workers
+    OUTBOUND_RATE_LIMIT: float = 30.0
+    OUTBOUND_CHAT_RATE: float = 1.0 # Per private chat
+    OUTBOUND_CHAT_BURST: float = 3.0 # Messages a private chat can get back to back (a reply plus a follow-up or two)
+    OUTBOUND_GROUP_RATE: float = 0.33 # Per group/channel: Telegram allows about 20 a minute
+    OUTBOUND_GROUP_BURST: float = 5.0
+    OUTBOUND_CHAT_BUCKETS: int = 10000 # Per-chat buckets kept, least recently used dropped first
+    OUTBOUND_MAX_RETRIES: int = 3 # Resends after a flood wait (RetryAfter) before the error reaches the caller
+
+    # Broadcast engine (services/broadcast_service.py); progress lives in the `broadcasts` collection
+    BROADCAST_CONCURRENCY: int = 30 # Most sends in flight per process; AIMD pacing picks the actual concurrency and rate
+    BROADCAST_AIMD_INITIAL_RATE: float = 10.0 # msg/s the first broadcast starts at; later ones continue from the learned rate
+    BROADCAST_AIMD_MIN_RATE: float = 1.0 # The rate never drops below this; the ceiling is OUTBOUND_RATE_LIMIT
+    BROADCAST_AIMD_INCREASE: float = 1.0 # msg/s added per second of clean sending
+    BROADCAST_AIMD_DECREASE: float = 0.5 # Rate and concurrency factor on a flood wait, 5xx/network error or slow responses
+    BROADCAST_LATENCY_TARGET_MS: float = 2000.0 # Average send latency above this counts as the API being overloaded
+    BROADCAST_BATCH_SIZE: int = 500 # Recipients fetched per round trip
+    BROADCAST_CHECKPOINT_SECONDS: float = 2.0 # Progress saved this often; on a crash at most the sends in flight are repeated
+    BROADCAST_PROGRESS_SECONDS: float = 5.0 # Progress message edits (throughput, ETA)
+    BROADCAST_LEASE_SECONDS: float = 60.0 # A broadcast not checkpointed for this long is resumed by another process
+    BROADCAST_RESUME_INTERVAL_SECONDS: float = 30.0 # How often the RUN_SCHEDULER process looks for abandoned broadcasts
+
+    # Update processing (utils/ordered_executor.py): parallel across users, strictly ordered per user
+    UPDATE_CONCURRENCY: int = 100 # Handlers running at the same time
+    UPDATE_MAX_PENDING: int = 10000 # Queued + running updates before intake (polling / webhook workers) waits
+
+    # MongoDB. Boost orders debit the balance and insert the order in one transaction, which needs a replica set
+    # or mongos (a single-node replica set is enough). Against a standalone server, detected on connect, they fall
+    # back to the conditional debit alone plus a refund if the order insert fails (see OrderService)
     MONGO_URI: str
     MONGO_DB_NAME: str
+    MONGO_AUTO_MIGRATE: bool = True # Sync indexes and apply pending migrations on MongoDB.connect()
+    MONGO_BACKEND: str = "motor" # "motor" (real server) or "memory" (in-process, for load tests/benchmarks; see database/memory.py)
+    MONGO_QUERY_METRICS: bool = False # Per-operation latency/size histograms behind /query_stats; see database/metrics.py
+    MONGO_QUERY_SIZE_SAMPLE: int = 20 # With metrics on, measure payload sizes (a bson.encode per document) on 1 in N operations; 0 = never
+    MONGO_SLOW_QUERY_MS: float = 100.0 # Operations at least this slow go to the "database.slow_queries" log
+
+    # Order/Transaction _id generation (database/ids.py): "snowflake" (time-ordered, per-worker) or "legacy" timestamp strings
+    ID_GENERATOR: str = "snowflake"
+    WORKER_ID: int = 0 # 0..1023, must differ between processes writing to the same database
+
+    # In-process user cache (UserRepository); size 0 disables it. In sharded mode a write made on another worker
+    # (scheduled payment credits, admin bans and balance changes) is sent to the worker caching that user; if that
+    # fails, its copy is stale for at most the TTL (utils/sharding.py:PeerCacheInvalidator)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: float = 60.0
+
+    # Memoized keyboard builders (utils/keyboard_cache.py), keyed by (builder, locale, arguments); 0 disables it
+    KEYBOARD_CACHE_SIZE: int = 2048
+
+    # Write-behind buffer for User.last_activity_at and similar hot fields (database/write_behind.py)
+    ACTIVITY_FLUSH_INTERVAL_SECONDS: float = 5.0
+    ACTIVITY_MAX_PENDING: int = 10000 # Pending users that trigger an early flush
+
+    # aiogram FSM storage: "mongo" (shared by all workers, survives restarts; database/fsm_storage.py) or "memory" (per process)
+    FSM_STORAGE: str = "mongo"
+    FSM_STATE_TTL_SECONDS: float = 86400.0 # States untouched this long are dropped (abandoned flows)
+    FSM_CACHE_SIZE: int = 10000 # Local write-through cache; 0 disables it
+    FSM_CACHE_TTL_SECONDS: float = 30.0 # Upper bound on staleness when another worker changes the same user's state
+
+    # Booster pool stats snapshot served by /account_stats (AdminService)
+    BOOSTER_STATS_TTL_SECONDS: float = 60.0
 
     # Cryptomus API
     CRYPTOMUS_MERCHANT_ID: str
@@ -35,6 +119,7 @@ class Settings(BaseSettings):
     # Paths
     BASE_DIR: Path = Path(__file__).resolve().parent.parent
     LOCALES_DIR: Path = BASE_DIR / "i18n" / "locales"
+    DEFAULT_LOCALE: str = "ru" # Used for users without a language and as the fallback for missing keys
 
 # Initialize settings
 settings = Settings()
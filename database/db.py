@@ -1,6 +1,7 @@
 # database/db.py (изменился, чтобы быть глобальным инстансом)
 from motor.motor_asyncio import AsyncIOMotorClient
 from config.settings import settings
+from database.migrations import migrate as run_db_migrations
 import logging
 
 logger = logging.getLogger(__name__)
@@ -9,19 +10,35 @@ class MongoDB:
     _instance = None # Singleton instance
     client: AsyncIOMotorClient = None
     db = None
+    supports_transactions: bool = True # False on a standalone server; set by connect()
 
     def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super(MongoDB, cls).__new__(cls)
         return cls._instance
 
-    async def connect(self):
+    async def connect(self, migrate: bool = settings.MONGO_AUTO_MIGRATE):
         if self.client is None: # Only connect if not already connected
             try:
-                self.client = AsyncIOMotorClient(settings.MONGO_URI, maxPoolSize=100)
+                if settings.MONGO_BACKEND == "memory":
+                    from database.memory import MemoryClient # Only needed for load tests/benchmarks
+                    self.client = MemoryClient()
+                else:
+                    self.client = AsyncIOMotorClient(settings.MONGO_URI, maxPoolSize=100)
                 await self.client.admin.command('ping') # Test connection
                 self.db = self.client[settings.MONGO_DB_NAME]
-                logger.info(f"Connected to MongoDB: {settings.MONGO_URI} (DB: {settings.MONGO_DB_NAME})")
+                if settings.MONGO_BACKEND == "memory":
+                    logger.warning(f"Using the in-memory MongoDB backend (DB: {settings.MONGO_DB_NAME}): data is not persisted.")
+                else:
+                    logger.info(f"Connected to MongoDB: {settings.MONGO_URI} (DB: {settings.MONGO_DB_NAME})")
+                    # Transactions need a replica set member (setName) or a mongos router (msg: isdbgrid)
+                    hello = await self.client.admin.command('hello')
+                    self.supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+                    if not self.supports_transactions:
+                        logger.warning("MongoDB is a standalone server: no multi-document transactions. Boost orders use a "
+                                       "conditional debit with a compensating refund; run a (single-node) replica set to get them.")
+                if migrate:
+                    await run_db_migrations(self.db) # Build declared indexes, apply pending migrations, report drift
             except Exception as e:
                 logger.error(f"Failed to connect to MongoDB: {e}")
                 raise
@@ -0,0 +1,72 @@
+# database/fsm_storage.py
+import logging
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from aiogram.exceptions import DataNotDictLikeError
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+
+from database.cache import TTLCache
+from database.repositories import FSMStateRepository
+
+logger = logging.getLogger(__name__)
+
+def key_document(key: StorageKey) -> Dict[str, Any]:
+    """StorageKey as the fields of the `storage_key` index, in index order."""
+    return {
+        "bot_id": key.bot_id,
+        "chat_id": key.chat_id,
+        "user_id": key.user_id,
+        "thread_id": key.thread_id,
+        "business_connection_id": key.business_connection_id,
+        "destiny": key.destiny,
+    }
+
+class MongoStorage(BaseStorage):
+    """
+    aiogram FSM storage in MongoDB, shared by every bot worker and kept across restarts.
+    Each write refreshes the record's expiry; records untouched for `state_ttl` seconds are removed
+    by the TTL index (flows abandoned halfway). Reads go through a local write-through cache whose
+    short TTL bounds how stale a state updated by another worker can be.
+    """
+
+    def __init__(self, repo: FSMStateRepository, state_ttl: float = 86400, cache: Optional[TTLCache] = None):
+        self.repo = repo
+        self.state_ttl = state_ttl
+        self.cache = cache or TTLCache(maxsize=0) # (state, data) per StorageKey; maxsize 0 caches nothing
+
+    async def _load(self, key: StorageKey) -> Tuple[Optional[str], Dict[str, Any]]:
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+        record = await self.repo.get_record(key_document(key))
+        value = (record.state, record.data) if record else (None, {})
+        self.cache.set(key, value) # Absent keys are cached too: most updates come from users outside any flow
+        return value
+
+    async def _save(self, key: StorageKey, fields: Dict[str, Any]) -> None:
+        document = key_document(key)
+        record = await self.repo.save(document, fields, self.state_ttl)
+        self.cache.set(key, (record.state, record.data))
+        if record.state is None and not record.data:
+            await self.repo.delete_if_empty(document) # FSMContext.clear(): nothing left worth keeping
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._save(key, {"state": state.state if isinstance(state, State) else state})
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        state, _ = await self._load(key)
+        return state
+
+    async def set_data(self, key: StorageKey, data: Mapping[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise DataNotDictLikeError(f"Data must be a dict or dict-like object, got {type(data).__name__}")
+        await self._save(key, {"data": data.copy()})
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, data = await self._load(key)
+        return data.copy() # Callers may mutate the result; the cached dict must not change with it
+
+    async def close(self) -> None:
+        # The client belongs to database.db.MongoDB and is closed by on_shutdown
+        self.cache.clear()
@@ -0,0 +1,85 @@
+# database/ids.py
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+# Snowflake layout (64 bits): 42 bits milliseconds since ID_EPOCH_MS | 10 bits worker | 12 bits sequence
+# The clock is UTC (time.time_ns): local time repeats an hour when DST ends, which would reissue used IDs after a restart
+ID_EPOCH_MS = 1704067200000 # 2024-01-01T00:00:00Z in Unix milliseconds
+WORKER_BITS = 10
+SEQUENCE_BITS = 12
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+_SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+_BODY_LENGTH = 13 # 64 bits in base32
+
+# Crockford base32: digits < letters in ASCII, so fixed-length encodings sort like the numbers they encode
+_ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+
+# Kind prefixes. IDs are only time-ordered among themselves: legacy "%Y%m%d%H%M%S%f__ORDER" style IDs and the
+# ObjectIds of documents inserted before IDs were generated sort differently, so listings page on created_at.
+ORDER = "O"
+TRANSACTION = "T"
+BROADCAST = "B"
+_LEGACY_SUFFIXES = {ORDER: "__ORDER", TRANSACTION: "__TXN", BROADCAST: "__BCAST"}
+
+def _encode(value: int) -> str:
+    chars = []
+    for _ in range(_BODY_LENGTH):
+        chars.append(_ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+class SnowflakeIdGenerator:
+    """
+    Time-ordered 14-character IDs (kind letter + 13 base32 chars), unique across workers as long
+    as every process uses its own worker_id. Never goes backwards: on clock regressions or when a
+    millisecond's 4096 sequence numbers are used up, it keeps counting on the last timestamp.
+    """
+
+    def __init__(self, worker_id: int = 0):
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id must be in [0, {MAX_WORKER_ID}], got {worker_id}")
+        self.worker_id = worker_id
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock() # IDs may also be created from executor threads
+
+    def __call__(self, kind: str) -> str:
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000 - ID_EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                self._sequence = (self._sequence + 1) & _SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last_ms += 1 # Borrow the next millisecond instead of sleeping
+            value = (self._last_ms << (WORKER_BITS + SEQUENCE_BITS)) | (self.worker_id << SEQUENCE_BITS) | self._sequence
+        return kind + _encode(value)
+
+class LegacyIdGenerator:
+    """The original timestamp-string IDs ("20240101120000123456__ORDER"). Not unique across workers."""
+
+    def __call__(self, kind: str) -> str:
+        return datetime.now().strftime("%Y%m%d%H%M%S%f") + _LEGACY_SUFFIXES[kind]
+
+ID_GENERATORS: Dict[str, Callable[..., Callable[[str], str]]] = {
+    "snowflake": SnowflakeIdGenerator,
+    "legacy": lambda worker_id=0: LegacyIdGenerator(),
+}
+
+_generator: Optional[Callable[[str], str]] = None
+
+def set_id_generator(generator: Callable[[str], str]) -> None:
+    """Replaces the process-wide generator (any callable kind -> str)."""
+    global _generator
+    _generator = generator
+
+def new_id(kind: str) -> str:
+    """Default factory for Order/Transaction/Broadcast IDs. The generator is built from settings on first use."""
+    global _generator
+    if _generator is None:
+        from config.settings import settings # Local import: models must stay importable without settings
+        _generator = ID_GENERATORS[settings.ID_GENERATOR](worker_id=settings.WORKER_ID)
+    return _generator(kind)
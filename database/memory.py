@@ -0,0 +1,793 @@
+# database/memory.py
+# In-memory stand-in for the subset of Motor the bot uses, selected with MONGO_BACKEND=memory.
+# Meant for load tests and benchmarks: the whole bot runs without a MongoDB server, at memory speed.
+# Data lives in the process and is gone on exit. Unsupported operators raise NotImplementedError
+# instead of being silently ignored.
+import functools
+import logging
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Tuple
+
+from bson import ObjectId
+from pymongo import DeleteMany, DeleteOne, InsertOne, ReturnDocument, UpdateMany, UpdateOne
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from pymongo.results import BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult, UpdateResult
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object() # Field absent from the document (distinct from an explicit None)
+
+# --- Values -------------------------------------------------------------------
+
+def _clone(value: Any) -> Any:
+    """Copies the mutable containers of a document; leaves (str, int, datetime, ObjectId...) are immutable."""
+    if isinstance(value, dict):
+        return {k: _clone(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_clone(v) for v in value]
+    return value
+
+def _to_bson(value: Any) -> Any:
+    """_clone for values being written: datetimes are stored like BSON dates (naive UTC, millisecond precision)."""
+    if isinstance(value, dict):
+        return {k: _to_bson(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_to_bson(v) for v in value]
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return value.replace(microsecond=value.microsecond // 1000 * 1000)
+    return value
+
+def _type_rank(value: Any) -> int:
+    # MongoDB's cross-type ordering: null < numbers < strings < objects < arrays < ObjectId < bool < date
+    if value is None or value is _MISSING:
+        return 0
+    if isinstance(value, bool):
+        return 6
+    if isinstance(value, (int, float)):
+        return 1
+    if isinstance(value, str):
+        return 2
+    if isinstance(value, dict):
+        return 3
+    if isinstance(value, list):
+        return 4
+    if isinstance(value, ObjectId):
+        return 5
+    if isinstance(value, datetime):
+        return 7
+    return 8
+
+def _compare(a: Any, b: Any) -> int:
+    rank_a, rank_b = _type_rank(a), _type_rank(b)
+    if rank_a != rank_b:
+        return -1 if rank_a < rank_b else 1
+    if rank_a == 0:
+        return 0
+    try:
+        return (a > b) - (a < b)
+    except TypeError:
+        return 0
+
+def _get(doc: Any, path: str) -> Any:
+    """Single value at a dotted path (no array fan-out), or _MISSING."""
+    value = doc
+    for part in path.split("."):
+        if isinstance(value, dict):
+            value = value.get(part, _MISSING)
+        elif isinstance(value, list) and part.isdigit() and int(part) < len(value):
+            value = value[int(part)]
+        else:
+            return _MISSING
+        if value is _MISSING:
+            return _MISSING
+    return value
+
+def _candidates(value: Any, parts: List[str]) -> List[Any]:
+    """All values a query path reaches; arrays of sub-documents along the path fan out, as in MongoDB."""
+    if not parts:
+        return [value]
+    if isinstance(value, dict):
+        return _candidates(value[parts[0]], parts[1:]) if parts[0] in value else [_MISSING]
+    if isinstance(value, list):
+        if parts[0].isdigit():
+            index = int(parts[0])
+            return _candidates(value[index], parts[1:]) if index < len(value) else [_MISSING]
+        found = [c for item in value if isinstance(item, dict) for c in _candidates(item, parts)]
+        return found or [_MISSING]
+    return [_MISSING]
+
+def _set(doc: Dict[str, Any], path: str, value: Any) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+        if not isinstance(doc, dict):
+            raise NotImplementedError(f"Updating through non-document field '{path}' is not supported by the in-memory backend")
+    doc[parts[-1]] = value
+
+def _unset(doc: Dict[str, Any], path: str) -> None:
+    parts = path.split(".")
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+# --- Query matching -----------------------------------------------------------
+
+def _expand(candidates: List[Any]) -> Iterable[Any]:
+    """Candidates plus the elements of array candidates ({"tags": "x"} matches tags: ["x", "y"])."""
+    for value in candidates:
+        yield value
+        if isinstance(value, list):
+            yield from value
+
+def _equals_any(candidates: List[Any], target: Any) -> bool:
+    if target is None: # null matches both null and missing fields
+        return any(v is None or v is _MISSING for v in _expand(candidates))
+    return any(v is not _MISSING and _type_rank(v) == _type_rank(target) and v == target for v in _expand(candidates))
+
+def _compare_any(candidates: List[Any], target: Any, accept: Callable[[int], bool]) -> bool:
+    return any(
+        v is not _MISSING and v is not None and _type_rank(v) == _type_rank(target) and accept(_compare(v, target))
+        for v in _expand(candidates)
+    )
+
+def _is_operator_dict(cond: Any) -> bool:
+    return isinstance(cond, dict) and bool(cond) and all(k.startswith("$") for k in cond)
+
+def _match_condition(candidates: List[Any], cond: Any) -> bool:
+    if not _is_operator_dict(cond):
+        return _equals_any(candidates, cond)
+    for op, arg in cond.items():
+        if op == "$eq":
+            ok = _equals_any(candidates, arg)
+        elif op == "$ne":
+            ok = not _equals_any(candidates, arg)
+        elif op == "$gt":
+            ok = _compare_any(candidates, arg, lambda c: c > 0)
+        elif op == "$gte":
+            ok = _compare_any(candidates, arg, lambda c: c >= 0)
+        elif op == "$lt":
+            ok = _compare_any(candidates, arg, lambda c: c < 0)
+        elif op == "$lte":
+            ok = _compare_any(candidates, arg, lambda c: c <= 0)
+        elif op == "$in":
+            ok = any(_equals_any(candidates, a) for a in arg)
+        elif op == "$nin":
+            ok = not any(_equals_any(candidates, a) for a in arg)
+        elif op == "$exists":
+            ok = any(v is not _MISSING for v in candidates) == bool(arg)
+        elif op == "$not":
+            ok = not _match_condition(candidates, arg)
+        elif op == "$size":
+            ok = any(isinstance(v, list) and len(v) == arg for v in candidates)
+        elif op == "$elemMatch":
+            ok = any(
+                isinstance(v, list) and any(_match_element(e, arg) for e in v)
+                for v in candidates
+            )
+        else:
+            raise NotImplementedError(f"Query operator {op} is not supported by the in-memory backend")
+        if not ok:
+            return False
+    return True
+
+def _match_element(element: Any, cond: Any) -> bool:
+    """Array element against an $elemMatch / $pull condition: field query for documents, operators otherwise."""
+    if _is_operator_dict(cond):
+        return _match_condition([element], cond)
+    if isinstance(cond, dict):
+        return isinstance(element, dict) and matches(element, cond)
+    return element == cond
+
+def matches(doc: Dict[str, Any], query: Optional[Dict[str, Any]]) -> bool:
+    for key, cond in (query or {}).items():
+        if key == "$and":
+            ok = all(matches(doc, q) for q in cond)
+        elif key == "$or":
+            ok = any(matches(doc, q) for q in cond)
+        elif key == "$nor":
+            ok = not any(matches(doc, q) for q in cond)
+        elif key.startswith("$"):
+            raise NotImplementedError(f"Query operator {key} is not supported by the in-memory backend")
+        else:
+            ok = _match_condition(_candidates(doc, key.split(".")), cond)
+        if not ok:
+            return False
+    return True
+
+# --- Updates ------------------------------------------------------------------
+
+def _each(arg: Any) -> List[Any]:
+    if isinstance(arg, dict) and "$each" in arg:
+        return [_to_bson(v) for v in arg["$each"]]
+    return [_to_bson(arg)]
+
+def _array_at(doc: Dict[str, Any], path: str) -> List[Any]:
+    current = _get(doc, path)
+    if current is _MISSING:
+        current = []
+        _set(doc, path, current)
+    elif not isinstance(current, list):
+        raise TypeError(f"Field '{path}' is not an array")
+    return current
+
+def apply_update(doc: Dict[str, Any], update: Dict[str, Any], inserting: bool = False) -> None:
+    """Applies update operators to `doc` in place."""
+    if not update or not all(k.startswith("$") for k in update):
+        raise NotImplementedError("Replacement documents in update operations are not supported by the in-memory backend")
+    for op, fields in update.items():
+        for path, arg in fields.items():
+            if "$" in path:
+                raise NotImplementedError(f"Positional update path '{path}' is not supported by the in-memory backend")
+            if op == "$set":
+                _set(doc, path, _to_bson(arg))
+            elif op == "$setOnInsert":
+                if inserting:
+                    _set(doc, path, _to_bson(arg))
+            elif op == "$unset":
+                _unset(doc, path)
+            elif op == "$inc":
+                current = _get(doc, path)
+                _set(doc, path, arg if current is _MISSING else current + arg)
+            elif op in ("$max", "$min"):
+                current = _get(doc, path)
+                if current is _MISSING or (_compare(arg, current) > 0 if op == "$max" else _compare(arg, current) < 0):
+                    _set(doc, path, _to_bson(arg))
+            elif op == "$push":
+                _array_at(doc, path).extend(_each(arg))
+            elif op == "$addToSet":
+                array = _array_at(doc, path)
+                for value in _each(arg):
+                    if value not in array:
+                        array.append(value)
+            elif op == "$pull":
+                array = _get(doc, path)
+                if isinstance(array, list):
+                    array[:] = [e for e in array if not _match_element(e, arg)]
+            else:
+                raise NotImplementedError(f"Update operator {op} is not supported by the in-memory backend")
+
+def _upsert_seed(query: Dict[str, Any]) -> Dict[str, Any]:
+    """Starting document of an upsert: the plain equality fields of the filter."""
+    seed: Dict[str, Any] = {}
+    for key, cond in query.items():
+        if key.startswith("$"):
+            continue
+        if _is_operator_dict(cond):
+            if "$eq" in cond:
+                _set(seed, key, _to_bson(cond["$eq"]))
+        else:
+            _set(seed, key, _to_bson(cond))
+    return seed
+
+# --- Projection / sort --------------------------------------------------------
+
+def project(doc: Dict[str, Any], projection: Optional[Any]) -> Dict[str, Any]:
+    if not projection:
+        return _clone(doc)
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    include_id = projection.get("_id", 1)
+    fields = {k: v for k, v in projection.items() if k != "_id"}
+    if any(isinstance(v, dict) for v in fields.values()):
+        raise NotImplementedError("Projection operators are not supported by the in-memory backend")
+
+    if fields and all(fields.values()): # Inclusion
+        result: Dict[str, Any] = {}
+        if include_id and "_id" in doc:
+            result["_id"] = doc["_id"]
+        for path in fields:
+            value = _get(doc, path)
+            if value is not _MISSING:
+                _set(result, path, _clone(value))
+        return result
+
+    result = _clone(doc) # Exclusion
+    for path in fields:
+        _unset(result, path)
+    if not include_id:
+        result.pop("_id", None)
+    return result
+
+def _normalize_sort(key_or_list: Any, direction: Optional[int] = None) -> List[Tuple[str, int]]:
+    if key_or_list is None:
+        return []
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction if direction is not None else 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [tuple(item) for item in key_or_list]
+
+def sort_documents(docs: List[Dict[str, Any]], sort: List[Tuple[str, int]]) -> List[Dict[str, Any]]:
+    if not sort:
+        return docs
+    def compare(a: Dict[str, Any], b: Dict[str, Any]) -> int:
+        for field, direction in sort:
+            result = _compare(_get(a, field), _get(b, field))
+            if result:
+                return result if direction > 0 else -result
+        return 0
+    return sorted(docs, key=functools.cmp_to_key(compare))
+
+# --- Aggregation --------------------------------------------------------------
+
+def _evaluate(expr: Any, doc: Dict[str, Any]) -> Any:
+    if isinstance(expr, str) and expr.startswith("$"):
+        if expr == "$$NOW":
+            return datetime.now()
+        if expr == "$$ROOT":
+            return doc
+        value = _get(doc, expr[1:])
+        return None if value is _MISSING else value
+    if isinstance(expr, list):
+        return [_evaluate(e, doc) for e in expr]
+    if not isinstance(expr, dict):
+        return expr
+    if not _is_operator_dict(expr):
+        return {k: _evaluate(v, doc) for k, v in expr.items()}
+
+    (op, arg), = expr.items()
+    if op == "$literal":
+        return arg
+    if op == "$ifNull":
+        values = [_evaluate(a, doc) for a in arg]
+        return next((v for v in values[:-1] if v is not None), values[-1])
+    if op == "$dateToString":
+        date = _evaluate(arg["date"], doc)
+        if date is None:
+            return arg.get("onNull")
+        return date.strftime(arg.get("format", "%Y-%m-%dT%H:%M:%S.%LZ").replace("%L", f"{date.microsecond // 1000:03d}"))
+    if op in ("$add", "$multiply"):
+        values = [_evaluate(a, doc) for a in arg]
+        if any(v is None for v in values):
+            return None
+        return functools.reduce((lambda x, y: x + y) if op == "$add" else (lambda x, y: x * y), values)
+    if op in ("$subtract", "$divide"):
+        left, right = (_evaluate(a, doc) for a in arg)
+        if left is None or right is None:
+            return None
+        return left - right if op == "$subtract" else left / right
+    if op == "$cond":
+        if isinstance(arg, dict):
+            arg = [arg["if"], arg["then"], arg["else"]]
+        return _evaluate(arg[1] if _evaluate(arg[0], doc) else arg[2], doc)
+    if op in ("$eq", "$ne", "$gt", "$gte", "$lt", "$lte"):
+        result = _compare(_evaluate(arg[0], doc), _evaluate(arg[1], doc))
+        return {"$eq": result == 0, "$ne": result != 0, "$gt": result > 0, "$gte": result >= 0, "$lt": result < 0, "$lte": result <= 0}[op]
+    raise NotImplementedError(f"Expression operator {op} is not supported by the in-memory backend")
+
+def _accumulate(op: str, values: List[Any]) -> Any:
+    numbers = [v for v in values if isinstance(v, (int, float)) and not isinstance(v, bool)]
+    if op == "$sum":
+        return sum(numbers)
+    if op == "$avg":
+        return sum(numbers) / len(numbers) if numbers else None
+    present = [v for v in values if v is not None]
+    if op == "$min":
+        return min(present, key=functools.cmp_to_key(_compare)) if present else None
+    if op == "$max":
+        return max(present, key=functools.cmp_to_key(_compare)) if present else None
+    if op == "$first":
+        return values[0] if values else None
+    if op == "$last":
+        return values[-1] if values else None
+    if op == "$push":
+        return values
+    if op == "$addToSet":
+        unique: List[Any] = []
+        for v in values:
+            if v not in unique:
+                unique.append(v)
+        return unique
+    raise NotImplementedError(f"Accumulator {op} is not supported by the in-memory backend")
+
+def _hashable(value: Any) -> Hashable:
+    if isinstance(value, dict):
+        return tuple((k, _hashable(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return tuple(_hashable(v) for v in value)
+    return value
+
+def _group(docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> List[Dict[str, Any]]:
+    groups: Dict[Hashable, Tuple[Any, List[Dict[str, Any]]]] = {}
+    for doc in docs:
+        key = _evaluate(spec["_id"], doc)
+        groups.setdefault(_hashable(key), (key, []))[1].append(doc)
+    result = []
+    for key, members in groups.values():
+        out = {"_id": key}
+        for field, accumulator in spec.items():
+            if field == "_id":
+                continue
+            (op, expr), = accumulator.items()
+            out[field] = _accumulate(op, [_evaluate(expr, d) for d in members])
+        result.append(out)
+    return result
+
+# --- Cursors ------------------------------------------------------------------
+
+class MemoryCursor:
+    """find() cursor: chainable sort/skip/limit/batch_size, async iteration and to_list like Motor's."""
+
+    def __init__(self, collection: "MemoryCollection", query: Optional[Dict[str, Any]], projection: Any, sort: Any = None):
+        self._collection = collection
+        self._query = _to_bson(query) # Query values are BSON-encoded too (datetimes truncated to ms)
+        self._projection = projection
+        self._sort = _normalize_sort(sort)
+        self._skip = 0
+        self._limit = 0
+        self._results: Optional[List[Dict[str, Any]]] = None
+
+    def sort(self, key_or_list: Any, direction: Optional[int] = None) -> "MemoryCursor":
+        self._sort = _normalize_sort(key_or_list, direction)
+        return self
+
+    def skip(self, skip: int) -> "MemoryCursor":
+        self._skip = skip
+        return self
+
+    def limit(self, limit: int) -> "MemoryCursor":
+        self._limit = limit
+        return self
+
+    def batch_size(self, batch_size: int) -> "MemoryCursor":
+        return self # Everything is already in memory
+
+    def _evaluate(self) -> List[Dict[str, Any]]:
+        if self._results is None:
+            docs = [doc for doc in self._collection._docs.values() if matches(doc, self._query)]
+            docs = sort_documents(docs, self._sort)[self._skip:]
+            if self._limit:
+                docs = docs[:abs(self._limit)]
+            self._results = [project(doc, self._projection) for doc in docs]
+        return self._results
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        docs = self._evaluate()
+        return list(docs if length is None else docs[:length])
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for doc in self._evaluate():
+            yield doc
+
+class MemoryCommandCursor(MemoryCursor):
+    """aggregate() cursor over precomputed results."""
+
+    def __init__(self, results: List[Dict[str, Any]]):
+        self._results = results
+
+# --- Collections / databases / client -----------------------------------------
+
+class MemoryCollection:
+    def __init__(self, database: "MemoryDatabase", name: str):
+        self.database = database
+        self.name = name
+        self._docs: Dict[Hashable, Dict[str, Any]] = {} # _id -> document, in insertion order
+        self._indexes: Dict[str, Dict[str, Any]] = {} # name -> IndexModel.document
+        self._unique: Dict[str, Dict[Hashable, Hashable]] = {} # unique index name -> {indexed values: _id key}
+
+    def _unique_value(self, name: str, doc: Dict[str, Any]) -> Hashable:
+        return tuple(_hashable(None if (v := _get(doc, f)) is _MISSING else v) for f in self._indexes[name]["key"])
+
+    def _put(self, key: Hashable, doc: Dict[str, Any]) -> None:
+        self._drop(key)
+        self._docs[key] = doc
+        for name, entries in self._unique.items():
+            entries[self._unique_value(name, doc)] = key
+
+    def _drop(self, key: Hashable) -> None:
+        previous = self._docs.pop(key, None)
+        if previous is not None:
+            for name, entries in self._unique.items():
+                entries.pop(self._unique_value(name, previous), None)
+
+    # Writes replace stored documents instead of mutating them, so a transaction's undo log
+    # can keep references to the previous versions.
+    def _store(self, doc: Dict[str, Any], session: Optional["MemorySession"], previous: Any = _MISSING) -> None:
+        key = _hashable(doc["_id"])
+        if session is not None:
+            session._record(self, key, previous)
+        self._put(key, doc)
+
+    def _remove(self, key: Hashable, session: Optional["MemorySession"]) -> None:
+        if session is not None:
+            session._record(self, key, self._docs[key])
+        self._drop(key)
+
+    def _check_unique(self, doc: Dict[str, Any], ignore_key: Optional[Hashable] = None) -> None:
+        for name, entries in self._unique.items():
+            owner = entries.get(self._unique_value(name, doc))
+            if owner is not None and owner != ignore_key:
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: {name}", 11000)
+
+    def _insert(self, doc: Dict[str, Any], session) -> Any:
+        doc = _to_bson(doc)
+        doc.setdefault("_id", ObjectId())
+        if _hashable(doc["_id"]) in self._docs:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} index: _id_", 11000)
+        self._check_unique(doc)
+        self._store(doc, session)
+        return doc["_id"]
+
+    def _update(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool, multi: bool, session) -> Dict[str, Any]:
+        """Returns the raw result ({"n", "nModified", "upserted"}) of an update_one / update_many."""
+        query = _to_bson(query)
+        matched = modified = 0
+        for key, doc in list(self._docs.items()):
+            if not matches(doc, query):
+                continue
+            matched += 1
+            new_doc = _clone(doc)
+            apply_update(new_doc, update)
+            if new_doc != doc:
+                self._check_unique(new_doc, ignore_key=key)
+                self._store(new_doc, session, previous=doc)
+                modified += 1
+            if not multi:
+                break
+        raw = {"n": matched, "nModified": modified}
+        if not matched and upsert:
+            new_doc = _upsert_seed(query)
+            apply_update(new_doc, update, inserting=True)
+            raw["upserted"] = self._insert(new_doc, session)
+            raw["n"] = 1
+        return raw
+
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None, projection: Any = None, session=None, sort: Any = None) -> Optional[Dict[str, Any]]:
+        docs = await MemoryCursor(self, filter, projection, sort).limit(1).to_list(length=1)
+        return docs[0] if docs else None
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, projection: Any = None, sort: Any = None, session=None) -> MemoryCursor:
+        return MemoryCursor(self, filter, projection, sort)
+
+    async def count_documents(self, filter: Dict[str, Any], session=None) -> int:
+        filter = _to_bson(filter)
+        return sum(1 for doc in self._docs.values() if matches(doc, filter))
+
+    async def insert_one(self, document: Dict[str, Any], session=None) -> InsertOneResult:
+        inserted_id = self._insert(document, session)
+        document.setdefault("_id", inserted_id) # Motor adds the generated _id to the caller's dict too
+        return InsertOneResult(inserted_id, True)
+
+    async def insert_many(self, documents: List[Dict[str, Any]], ordered: bool = True, session=None) -> InsertManyResult:
+        ids = []
+        for document in documents:
+            inserted_id = self._insert(document, session)
+            document.setdefault("_id", inserted_id)
+            ids.append(inserted_id)
+        return InsertManyResult(ids, True)
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, session=None) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, False, session), True)
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], upsert: bool = False, session=None) -> UpdateResult:
+        return UpdateResult(self._update(filter, update, upsert, True, session), True)
+
+    async def find_one_and_update(self, filter: Dict[str, Any], update: Dict[str, Any], projection: Any = None,
+                                  sort: Any = None, upsert: bool = False, return_document: bool = ReturnDocument.BEFORE,
+                                  session=None) -> Optional[Dict[str, Any]]:
+        filter = _to_bson(filter)
+        candidates = sort_documents([doc for doc in self._docs.values() if matches(doc, filter)], _normalize_sort(sort))
+        if not candidates:
+            if not upsert:
+                return None
+            new_doc = _upsert_seed(filter)
+            apply_update(new_doc, update, inserting=True)
+            self._insert(new_doc, session)
+            return project(new_doc, projection) if return_document == ReturnDocument.AFTER else None
+        doc = candidates[0]
+        new_doc = _clone(doc)
+        apply_update(new_doc, update)
+        if new_doc != doc:
+            key = _hashable(doc["_id"])
+            self._check_unique(new_doc, ignore_key=key)
+            self._store(new_doc, session, previous=doc)
+        return project(new_doc if return_document == ReturnDocument.AFTER else doc, projection)
+
+    async def delete_one(self, filter: Dict[str, Any], session=None) -> DeleteResult:
+        filter = _to_bson(filter)
+        for key, doc in self._docs.items():
+            if matches(doc, filter):
+                self._remove(key, session)
+                return DeleteResult({"n": 1}, True)
+        return DeleteResult({"n": 0}, True)
+
+    async def delete_many(self, filter: Dict[str, Any], session=None) -> DeleteResult:
+        filter = _to_bson(filter)
+        keys = [key for key, doc in self._docs.items() if matches(doc, filter)]
+        for key in keys:
+            self._remove(key, session)
+        return DeleteResult({"n": len(keys)}, True)
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True, session=None) -> BulkWriteResult:
+        result = {"nInserted": 0, "nUpserted": 0, "nMatched": 0, "nModified": 0, "nRemoved": 0, "upserted": [], "writeErrors": []}
+        for index, request in enumerate(requests):
+            try:
+                if isinstance(request, InsertOne):
+                    self._insert(request._doc, session)
+                    result["nInserted"] += 1
+                elif isinstance(request, (UpdateOne, UpdateMany)):
+                    raw = self._update(request._filter, request._doc, bool(request._upsert), isinstance(request, UpdateMany), session)
+                    if "upserted" in raw:
+                        result["nUpserted"] += 1
+                        result["upserted"].append({"index": index, "_id": raw["upserted"]})
+                    else:
+                        result["nMatched"] += raw["n"]
+                        result["nModified"] += raw["nModified"]
+                elif isinstance(request, (DeleteOne, DeleteMany)):
+                    deleted = await (self.delete_many if isinstance(request, DeleteMany) else self.delete_one)(request._filter, session=session)
+                    result["nRemoved"] += deleted.deleted_count
+                else:
+                    raise NotImplementedError(f"{type(request).__name__} is not supported by the in-memory backend")
+            except DuplicateKeyError as e:
+                result["writeErrors"].append({"index": index, "code": 11000, "errmsg": str(e), "op": request})
+                if ordered:
+                    break
+        if result["writeErrors"]:
+            raise BulkWriteError(result)
+        del result["writeErrors"]
+        return BulkWriteResult(result, True)
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], session=None) -> MemoryCommandCursor:
+        docs = [_clone(doc) for doc in self._docs.values()]
+        for stage in pipeline:
+            (name, spec), = stage.items()
+            if name == "$match":
+                spec = _to_bson(spec)
+                docs = [doc for doc in docs if matches(doc, spec)]
+            elif name == "$group":
+                docs = _group(docs, spec)
+            elif name == "$sort":
+                docs = sort_documents(docs, _normalize_sort(spec))
+            elif name == "$skip":
+                docs = docs[spec:]
+            elif name == "$limit":
+                docs = docs[:spec]
+            elif name == "$count":
+                docs = [{spec: len(docs)}] if docs else []
+            elif name == "$project":
+                docs = [project(doc, spec) for doc in docs]
+            elif name in ("$set", "$addFields"):
+                for doc in docs:
+                    for field, expr in spec.items():
+                        _set(doc, field, _evaluate(expr, doc))
+            elif name in ("$merge", "$out"):
+                self._merge_into(docs, spec if name == "$merge" else {"into": spec, "whenMatched": "replace"})
+                docs = []
+            else:
+                raise NotImplementedError(f"Aggregation stage {name} is not supported by the in-memory backend")
+        return MemoryCommandCursor(docs)
+
+    def _merge_into(self, docs: List[Dict[str, Any]], spec: Dict[str, Any]) -> None:
+        if spec.get("on", "_id") != "_id":
+            raise NotImplementedError("$merge on fields other than _id is not supported by the in-memory backend")
+        target = self.database[spec["into"] if isinstance(spec["into"], str) else spec["into"]["coll"]]
+        when_matched = spec.get("whenMatched", "merge")
+        when_not_matched = spec.get("whenNotMatched", "insert")
+        for doc in map(_to_bson, docs):
+            key = _hashable(doc["_id"])
+            existing = target._docs.get(key)
+            if existing is None:
+                if when_not_matched == "insert":
+                    target._store(doc, None)
+                elif when_not_matched == "fail":
+                    raise DuplicateKeyError(f"$merge found no document with _id {doc['_id']!r} in {target.name}")
+            elif when_matched == "replace":
+                target._store(doc, None, previous=existing)
+            elif when_matched == "merge":
+                target._store({**existing, **doc}, None, previous=existing)
+            elif when_matched == "fail":
+                raise DuplicateKeyError(f"E11000 duplicate key error collection: {target.name} index: _id_", 11000)
+            # "keepExisting": leave the stored document as is
+
+    async def create_indexes(self, indexes: List[Any], session=None) -> List[str]:
+        for index in indexes:
+            document = dict(index.document)
+            name = document["name"]
+            self._indexes[name] = document
+            if document.get("unique") and name not in self._unique:
+                entries = self._unique[name] = {}
+                for key, doc in self._docs.items():
+                    entries[self._unique_value(name, doc)] = key
+        return [index.document["name"] for index in indexes]
+
+    async def index_information(self, session=None) -> Dict[str, Dict[str, Any]]:
+        info = {"_id_": {"key": [("_id", 1)]}}
+        for name, document in self._indexes.items():
+            info[name] = {k: v for k, v in document.items() if k not in ("name", "key")}
+            info[name]["key"] = list(document["key"].items())
+        return info
+
+    async def drop(self, session=None) -> None:
+        self._docs.clear()
+        self._indexes.clear()
+        self._unique.clear()
+
+class MemoryDatabase:
+    def __init__(self, client: "MemoryClient", name: str):
+        self.client = client
+        self.name = name
+        self._collections: Dict[str, MemoryCollection] = {}
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        collection = self._collections.get(name)
+        if collection is None:
+            collection = self._collections[name] = MemoryCollection(self, name)
+        return collection
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self[name]
+
+    async def list_collection_names(self, session=None) -> List[str]:
+        return list(self._collections)
+
+    async def command(self, command: Any, *args, **kwargs) -> Dict[str, Any]:
+        if command in ("ping", {"ping": 1}):
+            return {"ok": 1.0}
+        raise NotImplementedError(f"Command {command!r} is not supported by the in-memory backend")
+
+class MemorySession:
+    """
+    Client session. with_transaction undoes the writes made *with this session* if the callback raises,
+    which gives the all-or-nothing outcome of a transaction. There is no isolation from concurrent readers.
+    """
+
+    def __init__(self):
+        self._undo: Optional[List[Tuple[MemoryCollection, Hashable, Any]]] = None
+
+    def _record(self, collection: MemoryCollection, key: Hashable, previous: Any) -> None:
+        if self._undo is not None:
+            self._undo.append((collection, key, previous))
+
+    async def with_transaction(self, callback: Callable[["MemorySession"], Any], *args, **kwargs) -> Any:
+        self._undo = []
+        try:
+            return await callback(self)
+        except BaseException:
+            for collection, key, previous in reversed(self._undo):
+                if previous is _MISSING:
+                    collection._drop(key)
+                else:
+                    collection._put(key, previous)
+            raise
+        finally:
+            self._undo = None
+
+    async def end_session(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "MemorySession":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        pass
+
+class MemoryClient:
+    """Drop-in for AsyncIOMotorClient within the bot's usage: client[db_name], admin.command('ping'), start_session(), close()."""
+
+    def __init__(self, *args, **kwargs):
+        self._databases: Dict[str, MemoryDatabase] = {}
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        database = self._databases.get(name)
+        if database is None:
+            database = self._databases[name] = MemoryDatabase(self, name)
+        return database
+
+    @property
+    def admin(self) -> MemoryDatabase:
+        return self["admin"]
+
+    async def start_session(self, *args, **kwargs) -> MemorySession:
+        return MemorySession()
+
+    def close(self) -> None:
+        pass
@@ -0,0 +1,258 @@
+# database/metrics.py
+import bisect
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+import bson
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("database.slow_queries") # Separate logger so it can be routed to its own file
+
+LATENCY_BUCKETS_MS = [0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+DOCUMENT_BUCKETS = [0, 1, 2, 5, 10, 20, 50, 100, 500, 1000, 5000]
+SIZE_BUCKETS_BYTES = [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216]
+
+class Histogram:
+    """Fixed-bucket histogram: constant memory per series, percentiles are bucket upper bounds."""
+
+    def __init__(self, bounds: List[float]):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1) # Last bucket: above the highest bound
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+class OperationStats:
+    """Timings, document counts and payload sizes of one (collection, operation) pair."""
+
+    def __init__(self):
+        self.latency_ms = Histogram(LATENCY_BUCKETS_MS)
+        self.documents = Histogram(DOCUMENT_BUCKETS)
+        self.payload_bytes = Histogram(SIZE_BUCKETS_BYTES)
+        self.slow = 0
+
+class QueryStats:
+    """Process-wide registry filled by InstrumentedCollection."""
+
+    def __init__(self, slow_threshold_ms: float = 100.0, recent_slow: int = 50, size_sample_every: int = 20):
+        self.slow_threshold_ms = slow_threshold_ms
+        # Payload sizes cost a bson.encode of every document: only 1 in N operations is measured (0 disables sizing)
+        self.size_sample_every = size_sample_every
+        self._size_tick = 0
+        self.operations: Dict[Tuple[str, str], OperationStats] = {}
+        self.recent_slow: Deque[Dict[str, Any]] = deque(maxlen=recent_slow)
+
+    def sample_size(self) -> bool:
+        """Whether the operation being recorded should have its payload size measured."""
+        if self.size_sample_every <= 0:
+            return False
+        self._size_tick += 1
+        if self._size_tick >= self.size_sample_every:
+            self._size_tick = 0
+            return True
+        return False
+
+    def record(self, collection: str, operation: str, elapsed_ms: float, documents: int, payload_bytes: Optional[int], shape: Any = None) -> None:
+        """payload_bytes is None for operations whose size wasn't sampled."""
+        stats = self.operations.get((collection, operation))
+        if stats is None:
+            stats = self.operations[(collection, operation)] = OperationStats()
+        stats.latency_ms.observe(elapsed_ms)
+        stats.documents.observe(documents)
+        if payload_bytes is not None:
+            stats.payload_bytes.observe(payload_bytes)
+        if elapsed_ms >= self.slow_threshold_ms:
+            stats.slow += 1
+            self.recent_slow.append({"collection": collection, "operation": operation, "ms": elapsed_ms,
+                                     "documents": documents, "shape": shape, "at": time.time()})
+            size = f", {payload_bytes} bytes" if payload_bytes is not None else ""
+            slow_query_logger.warning(f"Slow query {collection}.{operation} took {elapsed_ms:.1f}ms "
+                                      f"({documents} docs{size}), shape: {shape}")
+
+    def top(self, n: int = 10, by: str = "total") -> List[Tuple[str, str, OperationStats]]:
+        """Heaviest operations, by total time spent ("total"), p95 latency ("p95") or slow count ("slow")."""
+        keys = {
+            "total": lambda s: s.latency_ms.total,
+            "p95": lambda s: s.latency_ms.percentile(0.95),
+            "slow": lambda s: s.slow,
+        }
+        ranked = sorted(self.operations.items(), key=lambda item: keys[by](item[1]), reverse=True)
+        return [(collection, operation, stats) for (collection, operation), stats in ranked[:n]]
+
+    def reset(self) -> None:
+        self.operations.clear()
+        self.recent_slow.clear()
+
+query_stats = QueryStats()
+
+def query_shape(query: Any) -> Any:
+    """The filter with every value replaced by "?": groups queries that differ only in their parameters."""
+    if isinstance(query, dict):
+        return {k: query_shape(v) if (k.startswith("$") or isinstance(v, dict)) else "?" for k, v in query.items()}
+    if isinstance(query, (list, tuple)):
+        shapes = []
+        for item in query:
+            shape = query_shape(item)
+            if shape not in shapes: # [$in values] collapse to ["?"], $or branches keep their distinct shapes
+                shapes.append(shape)
+        return shapes
+    return "?"
+
+def _bson_size(value: Any) -> int:
+    try:
+        return len(bson.encode(value)) if isinstance(value, dict) else 0
+    except Exception: # Non-encodable values (e.g. in-memory backend oddities) just count as 0
+        return 0
+
+class InstrumentedCursor:
+    """Wraps a find()/aggregate() cursor; the time of all fetches (to_list or iteration) is one measurement."""
+
+    def __init__(self, cursor, collection: "InstrumentedCollection", operation: str, shape: Any):
+        self._cursor = cursor
+        self._collection = collection
+        self._operation = operation
+        self._shape = shape
+        self._sized = collection._stats.sample_size() # Decided once per cursor so a sampled result is sized completely
+
+    def __getattr__(self, name: str):
+        attr = getattr(self._cursor, name)
+        if name in ("sort", "skip", "limit", "batch_size"):
+            def chain(*args, **kwargs):
+                attr(*args, **kwargs)
+                return self
+            return chain
+        return attr
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict[str, Any]]:
+        started = time.perf_counter()
+        docs = await self._cursor.to_list(length=length)
+        payload = sum(_bson_size(d) for d in docs) if self._sized else None
+        self._collection._record(self._operation, started, len(docs), payload, self._shape)
+        return docs
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        # Only time spent inside the driver counts, not the consumer's work between documents
+        elapsed = 0.0
+        documents = payload = 0
+        iterator = self._cursor.__aiter__()
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    doc = await iterator.__anext__()
+                except StopAsyncIteration:
+                    elapsed += time.perf_counter() - started
+                    break
+                elapsed += time.perf_counter() - started
+                documents += 1
+                if self._sized:
+                    payload += _bson_size(doc)
+                yield doc
+        finally:
+            # _record measures from a start time: shift "now" back by the accumulated driver time
+            self._collection._record(self._operation, time.perf_counter() - elapsed, documents,
+                                     payload if self._sized else None, self._shape)
+
+class InstrumentedCollection:
+    """
+    Transparent proxy over a Motor (or in-memory) collection that records every call into `stats`.
+    Attributes it doesn't time (name, database, index helpers...) pass through unchanged.
+    """
+
+    def __init__(self, collection, stats: QueryStats = query_stats):
+        self._collection = collection
+        self._stats = stats
+        self.name = collection.name
+
+    def __getattr__(self, name: str):
+        return getattr(self._collection, name)
+
+    def _record(self, operation: str, started: float, documents: int, payload: Optional[int], shape: Any) -> None:
+        self._stats.record(self.name, operation, (time.perf_counter() - started) * 1000, documents, payload, shape)
+
+    def _size(self, *values: Any) -> Optional[int]:
+        """Encoded size of the given documents, or None when this operation isn't sampled."""
+        return sum(_bson_size(v) for v in values) if self._stats.sample_size() else None
+
+    def find(self, filter: Optional[Dict[str, Any]] = None, *args, **kwargs) -> InstrumentedCursor:
+        return InstrumentedCursor(self._collection.find(filter, *args, **kwargs), self, "find", query_shape(filter or {}))
+
+    def aggregate(self, pipeline: List[Dict[str, Any]], *args, **kwargs) -> InstrumentedCursor:
+        shape = [query_shape(stage) if "$match" in stage else next(iter(stage)) for stage in pipeline]
+        return InstrumentedCursor(self._collection.aggregate(pipeline, *args, **kwargs), self, "aggregate", shape)
+
+    async def find_one(self, filter: Optional[Dict[str, Any]] = None, *args, **kwargs):
+        started = time.perf_counter()
+        doc = await self._collection.find_one(filter, *args, **kwargs)
+        self._record("find_one", started, int(doc is not None), self._size(doc), query_shape(filter or {}))
+        return doc
+
+    async def find_one_and_update(self, filter: Dict[str, Any], update: Dict[str, Any], *args, **kwargs):
+        started = time.perf_counter()
+        doc = await self._collection.find_one_and_update(filter, update, *args, **kwargs)
+        self._record("find_one_and_update", started, int(doc is not None), self._size(update, doc), query_shape(filter))
+        return doc
+
+    async def insert_one(self, document: Dict[str, Any], *args, **kwargs):
+        started = time.perf_counter()
+        result = await self._collection.insert_one(document, *args, **kwargs)
+        self._record("insert_one", started, 1, self._size(document), None)
+        return result
+
+    async def update_one(self, filter: Dict[str, Any], update: Dict[str, Any], *args, **kwargs):
+        started = time.perf_counter()
+        result = await self._collection.update_one(filter, update, *args, **kwargs)
+        self._record("update_one", started, result.modified_count, self._size(update), query_shape(filter))
+        return result
+
+    async def update_many(self, filter: Dict[str, Any], update: Dict[str, Any], *args, **kwargs):
+        started = time.perf_counter()
+        result = await self._collection.update_many(filter, update, *args, **kwargs)
+        self._record("update_many", started, result.modified_count, self._size(update), query_shape(filter))
+        return result
+
+    async def delete_one(self, filter: Dict[str, Any], *args, **kwargs):
+        started = time.perf_counter()
+        result = await self._collection.delete_one(filter, *args, **kwargs)
+        self._record("delete_one", started, result.deleted_count, 0, query_shape(filter))
+        return result
+
+    async def count_documents(self, filter: Dict[str, Any], *args, **kwargs) -> int:
+        started = time.perf_counter()
+        count = await self._collection.count_documents(filter, *args, **kwargs)
+        self._record("count_documents", started, 0, 0, query_shape(filter))
+        return count
+
+    async def bulk_write(self, requests: List[Any], *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await self._collection.bulk_write(requests, *args, **kwargs)
+        finally:
+            self._record("bulk_write", started, len(requests), 0, f"{len(requests)} ops")
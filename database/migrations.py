@@ -0,0 +1,219 @@
+# database/migrations.py
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+from pymongo.errors import OperationFailure
+
+from database.repositories import (
+    BaseRepository, UserRepository, OrderRepository, TransactionRepository,
+    PromoCodeRepository, BoosterAccountRepository, FSMStateRepository, BroadcastRepository
+)
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_COLLECTION = "schema_migrations" # One document per migration, _id = version; applied once applied_at is set
+
+# Every repository whose declared `indexes` should exist in the live database
+INDEXED_REPOSITORIES: List[type] = [
+    UserRepository,
+    OrderRepository,
+    TransactionRepository,
+    PromoCodeRepository,
+    BoosterAccountRepository,
+    FSMStateRepository,
+    BroadcastRepository,
+]
+
+class Migration:
+    def __init__(self, version: int, name: str, func: Callable[..., Awaitable[None]], background: bool = False):
+        self.version = version
+        self.name = name
+        self.func = func
+        self.background = background # Runs as a task next to the bot instead of blocking startup
+
+class MigrationProgress:
+    """Checkpoint of a background migration, stored on its schema_migrations document so a restart resumes it."""
+
+    def __init__(self, db, version: int, checkpoint: Any = None):
+        self._collection = db[MIGRATIONS_COLLECTION]
+        self.version = version
+        self.checkpoint = checkpoint
+
+    async def save(self, checkpoint: Any) -> None:
+        self.checkpoint = checkpoint
+        await self._collection.update_one({"_id": self.version}, {"$set": {"checkpoint": checkpoint, "updated_at": datetime.now()}})
+
+MIGRATIONS: List[Migration] = [] # Kept sorted by version
+_BACKGROUND_TASKS: Set[asyncio.Task] = set() # Strong references, so running migrations are not garbage-collected
+
+def migration(version: int, name: str, background: bool = False):
+    """
+    Registers a data migration. Versions must be unique and are applied in ascending order.
+    Background migrations receive a MigrationProgress as second argument and must be idempotent per batch.
+    """
+    def decorator(func: Callable[..., Awaitable[None]]):
+        if any(m.version == version for m in MIGRATIONS):
+            raise ValueError(f"Duplicate migration version: {version}")
+        MIGRATIONS.append(Migration(version, name, func, background))
+        MIGRATIONS.sort(key=lambda m: m.version)
+        return func
+    return decorator
+
+def _declared_indexes(db) -> Dict[str, List[Dict[str, Any]]]:
+    """Collection name -> list of declared index documents ({"name", "key", ...})."""
+    declared: Dict[str, List[Dict[str, Any]]] = {}
+    for repo_cls in INDEXED_REPOSITORIES:
+        repo: BaseRepository = repo_cls(db)
+        declared.setdefault(repo.collection.name, []).extend(index.document for index in repo.indexes)
+    return declared
+
+async def ensure_indexes(db) -> None:
+    """Creates every declared index that is missing. create_indexes is a no-op for existing ones."""
+    for repo_cls in INDEXED_REPOSITORIES:
+        repo: BaseRepository = repo_cls(db)
+        if not repo.indexes:
+            continue
+        try:
+            names = await repo.collection.create_indexes(repo.indexes)
+            logger.info(f"Indexes ensured on '{repo.collection.name}': {', '.join(names)}")
+        except OperationFailure as e:
+            # Usually an index with the same name but different keys/options already exists
+            logger.error(f"Failed to create indexes on '{repo.collection.name}': {e}")
+
+async def index_drift(db) -> Dict[str, Dict[str, List[str]]]:
+    """
+    Compares declared indexes with the live ones.
+    Returns: {collection: {"missing": [...], "changed": [...], "extra": [...]}} for collections with drift only.
+    """
+    drift: Dict[str, Dict[str, List[str]]] = {}
+    for collection_name, declared in _declared_indexes(db).items():
+        live = await db[collection_name].index_information() # {name: {"key": [(field, dir), ...], ...}}
+        live.pop("_id_", None)
+        declared_by_name = {index["name"]: index for index in declared}
+
+        missing = [name for name in declared_by_name if name not in live]
+        changed = [
+            name for name, index in declared_by_name.items()
+            if name in live and list(index["key"].items()) != [tuple(k) for k in live[name]["key"]]
+        ]
+        extra = [name for name in live if name not in declared_by_name]
+
+        if missing or changed or extra:
+            drift[collection_name] = {"missing": missing, "changed": changed, "extra": extra}
+    return drift
+
+# --- Data migrations: append new ones with the next version number ---
+
+@migration(1, "backfill_daily_financials")
+async def _backfill_daily_financials(db) -> None:
+    # Seed the rollups the financial report reads from the existing transaction history
+    await TransactionRepository(db).rebuild_daily_financials()
+
+STRIP_HISTORY_BATCH_SIZE = 1000
+STRIP_HISTORY_PAUSE_SECONDS = 0.05 # Between batches, leaves room for the bot's own queries
+
+@migration(2, "strip_user_history_arrays", background=True)
+async def _strip_user_history_arrays(db, progress: MigrationProgress) -> None:
+    # History now lives in indexed queries on orders/transactions; drop the embedded arrays.
+    # Walks users in _id order from the saved checkpoint, one bounded update_many per batch.
+    users = UserRepository(db).collection
+    has_history = {"$or": [{"order_history_ids": {"$exists": True}}, {"transaction_history_ids": {"$exists": True}}]}
+    stripped = 0
+    while True:
+        query = dict(has_history)
+        if progress.checkpoint is not None:
+            query["_id"] = {"$gt": progress.checkpoint}
+        batch = await users.find(query, {"_id": 1}).sort("_id", 1).limit(STRIP_HISTORY_BATCH_SIZE).to_list(length=None)
+        if not batch:
+            break
+        ids = [doc["_id"] for doc in batch]
+        result = await users.update_many({"_id": {"$in": ids}}, {"$unset": {"order_history_ids": "", "transaction_history_ids": ""}})
+        stripped += result.modified_count
+        await progress.save(ids[-1])
+        await asyncio.sleep(STRIP_HISTORY_PAUSE_SECONDS)
+    logger.info(f"Stripped history arrays from {stripped} users.")
+
+async def _record(db, m: Migration, **fields) -> None:
+    await db[MIGRATIONS_COLLECTION].update_one({"_id": m.version}, {"$set": {"name": m.name, **fields}}, upsert=True)
+
+async def _run_background(db, m: Migration, checkpoint: Any) -> None:
+    if checkpoint is not None:
+        logger.info(f"Resuming background migration {m.version:04d} '{m.name}' after {checkpoint!r}...")
+    else:
+        logger.info(f"Starting background migration {m.version:04d} '{m.name}'...")
+    try:
+        await m.func(db, MigrationProgress(db, m.version, checkpoint))
+    except Exception as e:
+        # Left unapplied: the next start resumes from the last saved checkpoint
+        logger.error(f"Background migration {m.version:04d} '{m.name}' failed: {e}", exc_info=True)
+        return
+    await _record(db, m, applied_at=datetime.now())
+    logger.info(f"Migration {m.version:04d} '{m.name}' applied.")
+
+async def run_migrations(db, wait: bool = False) -> List[int]:
+    """
+    Applies registered migrations that have not been recorded yet. Returns the versions started or applied.
+    Background migrations are scheduled as tasks unless `wait` is set (CLI), in which case they are awaited.
+    """
+    records = {doc["_id"]: doc for doc in await db[MIGRATIONS_COLLECTION].find({}).to_list(length=None)}
+    newly_applied = []
+    background = []
+    for m in MIGRATIONS:
+        record = records.get(m.version) or {}
+        if record.get("applied_at"):
+            continue
+        if m.background:
+            await _record(db, m, started_at=record.get("started_at") or datetime.now())
+            background.append(_run_background(db, m, record.get("checkpoint")))
+        else:
+            logger.info(f"Applying migration {m.version:04d} '{m.name}'...")
+            await m.func(db)
+            await _record(db, m, applied_at=datetime.now())
+            logger.info(f"Migration {m.version:04d} '{m.name}' applied.")
+        newly_applied.append(m.version)
+
+    if wait:
+        for coro in background:
+            await coro
+    else:
+        for coro in background:
+            task = asyncio.create_task(coro)
+            _BACKGROUND_TASKS.add(task)
+            task.add_done_callback(_BACKGROUND_TASKS.discard)
+    return newly_applied
+
+async def migrate(db, wait: bool = False) -> None:
+    """Full bootstrap: indexes first (migrations may rely on them), then data migrations, then drift report."""
+    await ensure_indexes(db)
+    await run_migrations(db, wait=wait)
+    for collection_name, diff in (await index_drift(db)).items():
+        logger.warning(f"Index drift on '{collection_name}': {diff}")
+
+async def _cli(check_only: bool) -> int:
+    from database.db import MongoDB # Local import: db.py imports this module
+
+    mongo = MongoDB()
+    await mongo.connect(migrate=False)
+    try:
+        if not check_only:
+            await migrate(mongo.db, wait=True)
+        drift = await index_drift(mongo.db)
+        for collection_name, diff in drift.items():
+            print(f"{collection_name}: missing={diff['missing']} changed={diff['changed']} extra={diff['extra']}")
+        if not drift:
+            print("No index drift.")
+        return 1 if drift and check_only else 0
+    finally:
+        await mongo.close()
+
+if __name__ == "__main__":
+    # python -m database.migrations          -> build indexes and apply pending migrations
+    # python -m database.migrations --check  -> only report drift (non-zero exit code if any)
+    parser = argparse.ArgumentParser(description="Apply MongoDB indexes/migrations or report index drift.")
+    parser.add_argument("--check", action="store_true", help="Only report drift between declared and live indexes.")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    raise SystemExit(asyncio.run(_cli(args.check)))
@@ -1,7 +1,10 @@
 # database/models.py
 from datetime import datetime
-from typing import List, Optional
-from pydantic import BaseModel, Field, HttpUrl
+from typing import Any, Dict, List, Optional, Union
+from bson import ObjectId
+from pydantic import BaseModel, ConfigDict, Field, HttpUrl
+
+from database.ids import new_id, ORDER, TRANSACTION, BROADCAST
 
 class Channel(BaseModel):
     id: int = Field(alias="_id") # Telegram channel ID, use as MongoDB _id
@@ -16,7 +19,9 @@ class Channel(BaseModel):
     ai_analysis_report: Optional[str] = None # For PRO users
 
 class Order(BaseModel):
-    id: str = Field(default_factory=lambda: datetime.now().strftime("%Y%m%d%H%M%S%f") + "__ORDER", alias="_id") # Unique order ID
+    model_config = ConfigDict(arbitrary_types_allowed=True) # ObjectId _ids
+    # Unique, time-ordered order ID (database/ids.py). ObjectId for orders inserted before IDs were persisted
+    id: Union[str, ObjectId] = Field(default_factory=lambda: new_id(ORDER), alias="_id")
     user_id: int
     channel_id: int # ID of the target channel
     order_type: str = Field(pattern="^(normal|turbo)$") # 'normal' or 'turbo'
@@ -31,7 +36,9 @@ class Order(BaseModel):
     cost_credits: int # Actual credits charged for the order
 
 class Transaction(BaseModel):
-    id: str = Field(default_factory=lambda: datetime.now().strftime("%Y%m%d%H%M%S%f") + "__TXN", alias="_id") # Unique transaction ID
+    model_config = ConfigDict(arbitrary_types_allowed=True) # ObjectId _ids
+    # Unique, time-ordered transaction ID (database/ids.py). ObjectId for transactions inserted before IDs were persisted
+    id: Union[str, ObjectId] = Field(default_factory=lambda: new_id(TRANSACTION), alias="_id")
     user_id: int
     amount_usd: float
     amount_credits: int
@@ -44,6 +51,13 @@ class Transaction(BaseModel):
     expires_at: datetime # When Cryptomus invoice expires (e.g., 15 mins)
     processed_at: Optional[datetime] = None
 
+class DailyFinancials(BaseModel): # Rollup of completed payments per day, maintained incrementally by PaymentService
+    day: str = Field(alias="_id") # YYYY-MM-DD, so _id range queries select a date range
+    revenue_usd: float = 0.0
+    credits_sold: int = 0
+    transactions: int = 0
+    updated_at: datetime = Field(default_factory=datetime.now)
+
 class PromoCode(BaseModel):
     name: str = Field(..., description="Promo code name, e.g., 'START'", alias="_id") # Use name as _id
     credits: int = Field(..., gt=0)
@@ -84,9 +98,13 @@ class User(BaseModel):
     referred_users_paid_count: int = 0 # Count of referred users who made a payment
     earned_referral_credits: int = 0
 
-    # History lists
-    order_history_ids: List[str] = [] # List of Order._id
-    transaction_history_ids: List[str] = [] # List of Transaction._id
+    # Order/transaction history is not embedded: query `orders`/`transactions` by user_id
+    # (OrderRepository.get_user_orders_page)
+
+# Read model: the balance returned by UserRepository.debit_balance, projected from the `users` collection
+class UserBalance(BaseModel):
+    id: int = Field(alias="_id")
+    balance: int = 0
 
 class BoosterAccount(BaseModel): # Represents a Telegram account used for boosting
     phone_number: str = Field(alias="_id") # Use phone_number as MongoDB _id
@@ -97,4 +115,36 @@ class BoosterAccount(BaseModel): # Represents a Telegram account used for boosti
     current_daily_subs: int = 0
     last_daily_reset: datetime = Field(default_factory=datetime.now)
     proxies: Optional[str] = None # Proxy string if any
-    notes: Optional[str] = None
\ No newline at end of file
+    notes: Optional[str] = None
+
+class FSMState(BaseModel): # aiogram FSM state and data of one StorageKey, see database/fsm_storage.py
+    bot_id: int
+    chat_id: int
+    user_id: int
+    thread_id: Optional[int] = None
+    business_connection_id: Optional[str] = None
+    destiny: str = "default"
+    state: Optional[str] = None
+    data: Dict[str, Any] = {}
+    expires_at: datetime # Naive UTC, as the TTL index compares it with the server's UTC clock
+
+class Broadcast(BaseModel): # One mass send, checkpointed by services/broadcast_service.py so a restart resumes it
+    id: str = Field(default_factory=lambda: new_id(BROADCAST), alias="_id") # Unique, time-ordered broadcast ID (database/ids.py)
+    kind: str = Field(pattern="^(broadcast|mailing)$") # Admin /broadcast or a scheduled mailing
+    text: str # HTML; personalized texts may use {user_name} and {channel_name}
+    personalized: bool = False
+    status: str = Field(pattern="^(running|completed|cancelled|failed)$")
+    total: int = 0 # Recipients (non-banned users) when it started
+    sent: int = 0
+    blocked: int = 0 # Bot blocked or chat gone
+    failed: int = 0
+    last_user_id: Optional[int] = None # Checkpoint: every recipient with this _id or a lower one has been handled
+    created_by: Optional[int] = None # Admin who started it
+    report_chat_id: Optional[int] = None # Chat of the progress message edited while it runs
+    report_message_id: Optional[int] = None
+    report_locale: Optional[str] = None
+    owner: Optional[str] = None # Process sending it ("host:pid")
+    lease_until: Optional[datetime] = None # Once this passes without a checkpoint, another process takes it over
+    created_at: datetime = Field(default_factory=datetime.now)
+    updated_at: datetime = Field(default_factory=datetime.now)
+    finished_at: Optional[datetime] = None
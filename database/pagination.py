@@ -0,0 +1,75 @@
+# database/pagination.py
+from datetime import datetime, timedelta
+from typing import Any, Dict, Generic, List, Optional, TypeVar
+
+from bson import ObjectId
+
+T = TypeVar('T')
+
+_EPOCH = datetime(1970, 1, 1) # Mongo returns naive UTC datetimes with millisecond precision
+_OBJECT_ID_MARK = "!" # Prefix of packed ObjectId _ids; neither generated string id format can start with it
+_MIN_OBJECT_ID = ObjectId("0" * 24)
+
+def datetime_to_ms(value: datetime) -> int:
+    return (value - _EPOCH) // timedelta(milliseconds=1)
+
+def ms_to_datetime(value: int) -> datetime:
+    return _EPOCH + timedelta(milliseconds=value)
+
+class PageCursor:
+    """
+    Position of an item in a (sort_field DESC, _id DESC) listing.
+    Compact enough to travel in Telegram callback data (64 bytes): an int and the item _id.
+    """
+
+    def __init__(self, ts: int, item_id: Any):
+        self.ts = ts # sort_field value in epoch milliseconds
+        self.item_id = item_id
+
+    @classmethod
+    def from_item(cls, item: Dict[str, Any], sort_field: str) -> "PageCursor":
+        return cls(datetime_to_ms(item[sort_field]), item["_id"])
+
+    @property
+    def packed_id(self) -> str:
+        """item_id as callback data text. Documents inserted before ids were generated have ObjectId _ids."""
+        if isinstance(self.item_id, ObjectId):
+            return _OBJECT_ID_MARK + str(self.item_id)
+        return str(self.item_id)
+
+    @classmethod
+    def unpack(cls, ts: int, packed_id: str) -> "PageCursor":
+        """Inverse of (ts, packed_id), e.g. from a PageCallback."""
+        if packed_id.startswith(_OBJECT_ID_MARK) and ObjectId.is_valid(packed_id[1:]):
+            return cls(ts, ObjectId(packed_id[1:]))
+        return cls(ts, packed_id)
+
+class Page(Generic[T]):
+    """One page of a keyset-paginated listing, newest first."""
+
+    def __init__(self, items: List[T], has_next: bool, has_prev: bool,
+                 next_cursor: Optional[PageCursor], prev_cursor: Optional[PageCursor]):
+        self.items = items
+        self.has_next = has_next # Older items exist
+        self.has_prev = has_prev # Newer items exist
+        self.next_cursor = next_cursor # Last item on the page: continue after it
+        self.prev_cursor = prev_cursor # First item on the page: go back before it
+
+def keyset_filter(sort_field: str, cursor: PageCursor, backward: bool) -> Dict[str, Any]:
+    """
+    Items strictly after (`backward=False`, older) or before (`backward=True`, newer) the cursor.
+    The outer range on `sort_field` becomes index bounds; the $or only breaks ties on _id.
+    """
+    value = ms_to_datetime(cursor.ts)
+    outer, inner = ("$gte", "$gt") if backward else ("$lte", "$lt")
+    ties = [{"_id": {inner: cursor.item_id}}]
+    # Comparisons only match _ids of the cursor's own type. String ids sort before ObjectIds, so on a
+    # timestamp tie the ids of the other type are all after (or all before) the cursor
+    if isinstance(cursor.item_id, ObjectId) and not backward:
+        ties.append({"_id": {"$gte": ""}}) # Every string id
+    elif not isinstance(cursor.item_id, ObjectId) and backward:
+        ties.append({"_id": {"$gte": _MIN_OBJECT_ID}}) # Every ObjectId
+    return {
+        sort_field: {outer: value},
+        "$or": [{sort_field: {inner: value}}, *ties],
+    }
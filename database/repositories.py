@@ -1,38 +1,112 @@
 # database/repositories.py
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import Optional, List, Dict, Any, Type, TypeVar
+from pymongo import IndexModel, ASCENDING, DESCENDING, ReturnDocument
+from typing import Optional, List, Dict, Any, Type, TypeVar, AsyncIterator, Callable
 from bson import ObjectId
-from datetime import datetime
+from datetime import datetime, date, timedelta, timezone
+from pymongo.errors import DuplicateKeyError
 from pydantic import BaseModel
 
 
-from database.models import User, Channel, Order, Transaction, PromoCode, BoosterAccount
+from config.settings import settings
+from database.cache import TTLCache
+from database.metrics import InstrumentedCollection, query_stats
+from database.pagination import Page, PageCursor, keyset_filter
+from database.models import User, Channel, Order, Transaction, PromoCode, BoosterAccount, DailyFinancials, UserBalance, FSMState, Broadcast
 
 T = TypeVar('T', bound=BaseModel) # Generic type variable for BaseModel
 
+def projection_for(model: Type[BaseModel]) -> Dict[str, int]:
+    """Inclusion projection fetching exactly the fields a (read) model declares."""
+    return {(field.alias or name): 1 for name, field in model.model_fields.items()}
+
+query_stats.slow_threshold_ms = settings.MONGO_SLOW_QUERY_MS
+query_stats.size_sample_every = settings.MONGO_QUERY_SIZE_SAMPLE
+
 class BaseRepository:
+    # Indexes this repository's queries rely on. Synced by database/migrations.py at connect time.
+    indexes: List[IndexModel] = []
+
     def __init__(self, db_client: AsyncIOMotorClient, collection_name: str, model: Type[T]):
-        self.collection = db_client[collection_name]
+        collection = db_client[collection_name]
+        # Timings, document counts and payload sizes per operation for /query_stats. See database/metrics.py
+        self.collection = InstrumentedCollection(collection) if settings.MONGO_QUERY_METRICS else collection
         self.model = model
 
-    async def get_by_id(self, item_id: Any) -> Optional[T]:
-        data = await self.collection.find_one({"_id": item_id})
-        return self.model(**data) if data else None
-
-    async def get_one(self, query: Dict[str, Any]) -> Optional[T]:
-        data = await self.collection.find_one(query)
-        return self.model(**data) if data else None
-
-    async def get_many(self, query: Dict[str, Any], limit: int = 0) -> List[T]:
-        cursor = self.collection.find(query)
+    def _read_options(self, projection: Optional[Dict[str, Any]], model: Optional[Type[BaseModel]]):
+        """
+        Resolves the model to build and the projection to send.
+        A read model without an explicit projection fetches only the fields it declares.
+        """
+        model = model or self.model
+        if projection is None and model is not self.model:
+            projection = projection_for(model)
+        return projection, model
+
+    async def get_by_id(self, item_id: Any, projection: Optional[Dict[str, Any]] = None, model: Optional[Type[BaseModel]] = None) -> Optional[T]:
+        projection, model = self._read_options(projection, model)
+        data = await self.collection.find_one({"_id": item_id}, projection)
+        return model(**data) if data else None
+
+    async def get_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None, model: Optional[Type[BaseModel]] = None) -> Optional[T]:
+        projection, model = self._read_options(projection, model)
+        data = await self.collection.find_one(query, projection)
+        return model(**data) if data else None
+
+    async def get_many(self, query: Dict[str, Any], limit: int = 0, projection: Optional[Dict[str, Any]] = None, model: Optional[Type[BaseModel]] = None, sort: Optional[List[tuple]] = None) -> List[T]:
+        projection, model = self._read_options(projection, model)
+        cursor = self.collection.find(query, projection, sort=sort)
         if limit > 0:
             cursor = cursor.limit(limit)
         data_list = await cursor.to_list(length=None)
-        return [self.model(**item) for item in data_list]
-
-    async def create(self, item: T) -> Optional[T]:
-        data = item.model_dump(by_alias=True, exclude_unset=True)
-        result = await self.collection.insert_one(data)
+        return [model(**item) for item in data_list]
+
+    async def iter_many(self, query: Dict[str, Any], batch_size: int = 500, projection: Optional[Dict[str, Any]] = None, limit: int = 0, model: Optional[Type[BaseModel]] = None, sort: Optional[List[tuple]] = None) -> AsyncIterator[T]:
+        """
+        Streams matching documents as models, fetching `batch_size` documents per round trip.
+        Memory stays bounded by the batch size instead of the collection size.
+        With a projection, every excluded field must have a default on the model.
+        """
+        projection, model = self._read_options(projection, model)
+        cursor = self.collection.find(query, projection, sort=sort).batch_size(batch_size)
+        if limit > 0:
+            cursor = cursor.limit(limit)
+        async for item in cursor:
+            yield model(**item)
+
+    async def get_page(self, query: Dict[str, Any], cursor: Optional[PageCursor] = None, backward: bool = False,
+                       page_size: int = 10, sort_field: str = "created_at") -> Page[T]:
+        """
+        Keyset pagination over (sort_field DESC, _id DESC), newest first.
+        `cursor` is a Page.next_cursor (older items) or, with `backward`, a Page.prev_cursor (newer items).
+        One query of page_size + 1 documents per page, however deep the page is, provided an index
+        on the equality fields of `query` followed by (sort_field, _id) exists.
+        """
+        if cursor is not None:
+            query = {"$and": [query, keyset_filter(sort_field, cursor, backward)]}
+        direction = ASCENDING if backward else DESCENDING
+        docs = await self.collection.find(query, sort=[(sort_field, direction), ("_id", direction)]).limit(page_size + 1).to_list(length=None)
+
+        has_more = len(docs) > page_size # The extra document only tells whether another page exists
+        docs = docs[:page_size]
+        if backward:
+            docs.reverse()
+        return Page(
+            items=[self.model(**doc) for doc in docs],
+            has_next=cursor is not None if backward else has_more,
+            has_prev=has_more if backward else cursor is not None,
+            next_cursor=PageCursor.from_item(docs[-1], sort_field) if docs else None,
+            prev_cursor=PageCursor.from_item(docs[0], sort_field) if docs else None,
+        )
+
+    async def start_session(self):
+        """Client session for multi-document transactions (`async with await repo.start_session() as s`)."""
+        return await self.collection.database.client.start_session()
+
+    async def create(self, item: T, session=None) -> Optional[T]:
+        # Defaults (generated _id, created_at, ...) must be persisted too, so exclude_unset is not used
+        data = item.model_dump(by_alias=True)
+        result = await self.collection.insert_one(data, session=session)
         if result.acknowledged:
             return item
         return None
@@ -53,39 +127,132 @@ class BaseRepository:
         result = await self.collection.update_one(query, {"$inc": {field: value}})
         return result.modified_count
 
+    async def aggregate(self, pipeline: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Runs an aggregation pipeline server-side. Returns raw documents; keep the output small."""
+        return await self.collection.aggregate(pipeline).to_list(length=None)
+
+    async def count(self, query: Dict[str, Any]) -> int:
+        return await self.collection.count_documents(query)
+
 class UserRepository(BaseRepository):
-    def __init__(self, db_client: AsyncIOMotorClient):
+    indexes = [
+        IndexModel([("username", ASCENDING)], name="username", background=True), # AdminService.find_user_by_identifier, /start @referrer
+    ]
+
+    def __init__(self, db_client: AsyncIOMotorClient, cache: Optional[TTLCache] = None):
         super().__init__(db_client, "users", User)
+        # Read-through cache for get_user_by_id. Every mutator below invalidates the touched user.
+        self.cache = cache if cache is not None else TTLCache(settings.USER_CACHE_SIZE, settings.USER_CACHE_TTL_SECONDS)
+        # Told about every invalidation (None: all users). Shard workers use it to make the worker owning the
+        # user drop its cached copy too (utils/sharding.py:PeerCacheInvalidator)
+        self.on_invalidate: Optional[Callable[[Optional[int]], None]] = None
+
+    def invalidate_user(self, user_id: int) -> None:
+        self.cache.invalidate(user_id)
+        if self.on_invalidate:
+            self.on_invalidate(user_id)
+
+    def _clear_cache(self) -> None:
+        self.cache.clear()
+        if self.on_invalidate:
+            self.on_invalidate(None)
+
+    def _invalidate_query(self, query: Dict[str, Any]) -> None:
+        user_id = query.get("_id")
+        if isinstance(user_id, int):
+            self.invalidate_user(user_id)
+        else:
+            self._clear_cache() # Can't tell which users a non-_id filter touches
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
 
     async def get_user_by_id(self, user_id: int) -> Optional[User]:
-        return await self.get_by_id(user_id)
+        cached = self.cache.get(user_id)
+        if cached is not None:
+            return cached.model_copy(deep=True) # Handlers mutate the user in place; keep the cached copy pristine
+        user = await self.get_by_id(user_id)
+        if user:
+            self.cache.set(user_id, user.model_copy(deep=True))
+        return user
+
+    async def get_or_create_user(self, user_id: int, username: Optional[str] = None, first_name: Optional[str] = None, last_name: Optional[str] = None) -> User:
+        user = await self.get_user_by_id(user_id)
+        if user:
+            return user
+        user = User(_id=user_id, username=username, first_name=first_name, last_name=last_name)
+        await self.create_user(user)
+        return user
 
     async def create_user(self, user_data: User) -> Optional[User]:
+        self.invalidate_user(user_data.id)
         return await self.create(user_data)
 
+    # Base mutators are also called directly on user_repo (e.g. increment({"_id": ...}, ...)), so they invalidate too
+    async def update(self, query: Dict[str, Any], update_data: Dict[str, Any]) -> int:
+        modified = await super().update(query, update_data)
+        self._invalidate_query(query)
+        return modified
+
+    async def update_many(self, query: Dict[str, Any], update_data: Dict[str, Any]) -> int:
+        modified = await super().update_many(query, update_data)
+        self._clear_cache()
+        return modified
+
+    async def delete(self, query: Dict[str, Any]) -> int:
+        deleted = await super().delete(query)
+        self._invalidate_query(query)
+        return deleted
+
+    async def increment(self, query: Dict[str, Any], field: str, value: int = 1) -> int:
+        modified = await super().increment(query, field, value)
+        self._invalidate_query(query)
+        return modified
+
     async def update_user(self, user_id: int, update_data: Dict[str, Any]) -> int:
         return await self.update({"_id": user_id}, update_data)
 
     async def increment_balance(self, user_id: int, amount: int) -> int:
         return await self.increment({"_id": user_id}, "balance", amount)
 
+    async def debit_balance(self, user_id: int, amount: int, session=None) -> Optional[UserBalance]:
+        """
+        Atomically deducts `amount` only if the balance covers it (single find_one_and_update).
+        Returns the balance after the debit, or None if the user is missing or funds are insufficient.
+        """
+        data = await self.collection.find_one_and_update(
+            {"_id": user_id, "balance": {"$gte": amount}},
+            {"$inc": {"balance": -amount}},
+            projection=projection_for(UserBalance),
+            return_document=ReturnDocument.AFTER,
+            session=session
+        )
+        self.invalidate_user(user_id) # Inside a transaction the caller should invalidate again after commit
+        return UserBalance(**data) if data else None
+
     async def add_channel_to_user(self, user_id: int, channel: Channel) -> int:
-        return (await self.collection.update_one(
+        modified = (await self.collection.update_one(
             {"_id": user_id},
             {"$push": {"channels": channel.model_dump(by_alias=True, exclude_unset=True)}}
         )).modified_count
+        self.invalidate_user(user_id)
+        return modified
 
     async def remove_channel_from_user(self, user_id: int, channel_id: int) -> int:
-        return (await self.collection.update_one(
+        modified = (await self.collection.update_one(
             {"_id": user_id},
             {"$pull": {"channels": {"id": channel_id}}}
         )).modified_count
+        self.invalidate_user(user_id)
+        return modified
 
     async def add_used_promocode(self, user_id: int, promo_name: str) -> int:
-        return (await self.collection.update_one(
+        modified = (await self.collection.update_one(
             {"_id": user_id},
             {"$addToSet": {"promo_codes_used": promo_name}}
         )).modified_count
+        self.invalidate_user(user_id)
+        return modified
 
     async def has_used_promocode(self, user_id: int, promo_name: str) -> bool:
         user = await self.get_user_by_id(user_id)
@@ -99,26 +266,46 @@ class UserRepository(BaseRepository):
             if "$addToSet" not in update_doc: update_doc["$addToSet"] = {}
             update_doc["$addToSet"]["serial_numbers"] = serial
         if update_doc:
-            return (await self.collection.update_one({"_id": user_id}, update_doc)).modified_count
+            modified = (await self.collection.update_one({"_id": user_id}, update_doc)).modified_count
+            self.invalidate_user(user_id)
+            return modified
         return 0
 
 class OrderRepository(BaseRepository):
+    # Pages are keyed on (created_at, _id), not _id alone: orders inserted before ids were generated have
+    # ObjectId _ids, which sort after every string id
+    indexes = [
+        # _id closes every key so keyset pages (get_page) are served straight from the index order
+        IndexModel([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)], name="user_id_status_created_at_id", background=True), # get_user_orders_page
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id", background=True), # Admin orders report pages
+    ]
+
     def __init__(self, db_client: AsyncIOMotorClient):
         super().__init__(db_client, "orders", Order)
 
     async def get_order_by_id(self, order_id: str) -> Optional[Order]:
         return await self.get_by_id(order_id)
 
-    async def create_order(self, order_data: Order) -> Optional[Order]:
-        return await self.create(order_data)
+    async def create_order(self, order_data: Order, session=None) -> Optional[Order]:
+        return await self.create(order_data, session=session)
 
-    async def get_user_orders(self, user_id: int, status_filter: Optional[str] = None) -> List[Order]:
-        query = {"user_id": user_id}
+    async def order_exists(self, order_id: str) -> bool:
+        return await self.collection.find_one({"_id": order_id}, {"_id": 1}) is not None
+
+    async def get_user_orders_page(self, user_id: int, status_filter: Optional[str] = None, cursor: Optional[PageCursor] = None,
+                                   backward: bool = False, page_size: int = 10) -> Page[Order]:
+        query: Dict[str, Any] = {"user_id": user_id}
         if status_filter:
             query["status"] = status_filter
-        return await self.get_many(query, limit=0)
+        return await self.get_page(query, cursor, backward, page_size)
 
 class TransactionRepository(BaseRepository):
+    indexes = [
+        IndexModel([("cryptomus_uuid", ASCENDING)], name="cryptomus_uuid", unique=True, background=True), # Webhook / status lookups
+        IndexModel([("status", ASCENDING), ("expires_at", ASCENDING)], name="status_expires_at", background=True), # check_pending_payments
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)], name="created_at_id", background=True), # Admin top-ups report pages
+    ]
+
     def __init__(self, db_client: AsyncIOMotorClient):
         super().__init__(db_client, "transactions", Transaction)
 
@@ -134,6 +321,168 @@ class TransactionRepository(BaseRepository):
     async def get_transaction_by_cryptomus_uuid(self, cryptomus_uuid: str) -> Optional[Transaction]:
         return await self.get_one({"cryptomus_uuid": cryptomus_uuid})
 
+    async def rebuild_daily_financials(self, target_collection: str = "daily_financials") -> None:
+        """
+        Recomputes the per-day rollups from the full transaction history, entirely server-side ($group + $merge).
+        Used to backfill the rollup collection; day-to-day it is kept current by PaymentService.
+        """
+        pipeline = [
+            {"$match": {"status": "completed"}},
+            {"$group": {
+                "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$ifNull": ["$processed_at", "$created_at"]}}},
+                "revenue_usd": {"$sum": "$amount_usd"},
+                "credits_sold": {"$sum": "$amount_credits"},
+                "transactions": {"$sum": 1},
+            }},
+            {"$set": {"updated_at": "$$NOW"}},
+            {"$merge": {"into": target_collection, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+        ]
+        await self.collection.aggregate(pipeline).to_list(length=None)
+
+class DailyFinancialsRepository(BaseRepository):
+    def __init__(self, db_client: AsyncIOMotorClient):
+        super().__init__(db_client, "daily_financials", DailyFinancials)
+
+    async def record_payment(self, amount_usd: float, amount_credits: int, day: Optional[date] = None) -> None:
+        """Adds one completed payment to its day's rollup (upsert, single round trip)."""
+        day_key = (day or datetime.now().date()).isoformat()
+        await self.collection.update_one(
+            {"_id": day_key},
+            {
+                "$inc": {"revenue_usd": amount_usd, "credits_sold": amount_credits, "transactions": 1},
+                "$set": {"updated_at": datetime.now()}
+            },
+            upsert=True
+        )
+
+    async def get_totals(self, start: Optional[date] = None, end: Optional[date] = None) -> Dict[str, Any]:
+        """Sums the rollups of the inclusive [start, end] day range (open-ended when None)."""
+        day_filter: Dict[str, Any] = {}
+        if start:
+            day_filter["$gte"] = start.isoformat()
+        if end:
+            day_filter["$lte"] = end.isoformat()
+        pipeline: List[Dict[str, Any]] = [{"$match": {"_id": day_filter}}] if day_filter else []
+        pipeline.append({"$group": {
+            "_id": None,
+            "revenue_usd": {"$sum": "$revenue_usd"},
+            "credits_sold": {"$sum": "$credits_sold"},
+            "transactions": {"$sum": "$transactions"},
+        }})
+        result = await self.aggregate(pipeline)
+        return result[0] if result else {"revenue_usd": 0.0, "credits_sold": 0, "transactions": 0}
+
+class FSMStateRepository(BaseRepository):
+    """Backing collection of MongoStorage. Documents are keyed by the StorageKey fields (see key_document)."""
+    indexes = [
+        IndexModel([("bot_id", ASCENDING), ("chat_id", ASCENDING), ("user_id", ASCENDING), ("thread_id", ASCENDING),
+                    ("business_connection_id", ASCENDING), ("destiny", ASCENDING)], name="storage_key", unique=True, background=True), # Every lookup
+        IndexModel([("expires_at", ASCENDING)], name="expires_at_ttl", expireAfterSeconds=0, background=True), # Reaps abandoned states
+    ]
+
+    def __init__(self, db_client: AsyncIOMotorClient):
+        super().__init__(db_client, "fsm_states", FSMState)
+
+    @staticmethod
+    def utcnow() -> datetime:
+        return datetime.now(timezone.utc).replace(tzinfo=None)
+
+    async def get_record(self, key: Dict[str, Any]) -> Optional[FSMState]:
+        # The TTL monitor only runs once a minute: expired documents it hasn't removed yet count as absent
+        return await self.get_one({**key, "expires_at": {"$gt": self.utcnow()}})
+
+    async def save(self, key: Dict[str, Any], fields: Dict[str, Any], ttl: float) -> FSMState:
+        """Sets `fields` (state and/or data) and pushes expiry `ttl` seconds out. Returns the whole record."""
+        now = self.utcnow()
+        defaults = {k: v for k, v in {"state": None, "data": {}}.items() if k not in fields}
+        update = {"$set": {**fields, "expires_at": now + timedelta(seconds=ttl)}, "$setOnInsert": defaults}
+        for attempt in range(2):
+            try:
+                data = await self.collection.find_one_and_update(
+                    {**key, "expires_at": {"$gt": now}}, update, upsert=True, return_document=ReturnDocument.AFTER
+                )
+                return FSMState(**data)
+            except DuplicateKeyError:
+                if attempt:
+                    raise
+                # An expired record not reaped yet: its leftovers must not leak into the new state, drop it and insert fresh
+                await self.collection.delete_one({**key, "expires_at": {"$lte": now}})
+
+    async def delete_if_empty(self, key: Dict[str, Any]) -> None:
+        """Removes a cleared record (no state, no data) instead of keeping it around until it expires."""
+        await self.collection.delete_one({**key, "state": None, "data": {}})
+
+class BroadcastRepository(BaseRepository):
+    """
+    Broadcast progress. A running broadcast belongs to the process holding its lease; every checkpoint
+    extends the lease, and a broadcast whose lease ran out (its process died) can be claimed by another.
+    """
+    indexes = [
+        IndexModel([("status", ASCENDING), ("lease_until", ASCENDING)], name="status_lease_until", background=True), # claim_abandoned
+        IndexModel([("created_at", DESCENDING)], name="created_at", background=True), # get_recent
+    ]
+
+    def __init__(self, db_client: AsyncIOMotorClient):
+        super().__init__(db_client, "broadcasts", Broadcast)
+
+    async def get_broadcast(self, broadcast_id: str) -> Optional[Broadcast]:
+        return await self.get_by_id(broadcast_id)
+
+    async def create_broadcast(self, broadcast: Broadcast) -> Optional[Broadcast]:
+        return await self.create(broadcast)
+
+    async def get_recent(self, limit: int = 5) -> List[Broadcast]:
+        return await self.get_many({}, limit=limit, sort=[("created_at", DESCENDING)])
+
+    async def claim_abandoned(self, owner: str, lease_seconds: float) -> Optional[Broadcast]:
+        """Takes over one running broadcast whose lease has expired. None if there is none."""
+        now = datetime.now()
+        data = await self.collection.find_one_and_update(
+            {"status": "running", "lease_until": {"$lt": now}},
+            {"$set": {"owner": owner, "lease_until": now + timedelta(seconds=lease_seconds), "updated_at": now}},
+            sort=[("created_at", ASCENDING)],
+            return_document=ReturnDocument.AFTER
+        )
+        return Broadcast(**data) if data else None
+
+    async def checkpoint(self, broadcast_id: str, owner: str, progress: Dict[str, Any], lease_seconds: float) -> bool:
+        """
+        Saves progress and extends the lease. False if the broadcast is no longer this owner's to send:
+        cancelled, or taken over after the lease lapsed. The caller must stop sending then.
+        """
+        now = datetime.now()
+        result = await self.collection.update_one(
+            {"_id": broadcast_id, "owner": owner, "status": "running"},
+            {"$set": {**progress, "lease_until": now + timedelta(seconds=lease_seconds), "updated_at": now}}
+        )
+        return result.matched_count > 0
+
+    async def finish(self, broadcast_id: str, owner: str, status: str, progress: Dict[str, Any]) -> bool:
+        """Records the final status and counts. A cancelled broadcast can still get its final counts."""
+        now = datetime.now()
+        result = await self.collection.update_one(
+            {"_id": broadcast_id, "owner": owner, "status": {"$in": ["running", status]}},
+            {"$set": {**progress, "status": status, "lease_until": None, "updated_at": now, "finished_at": now}}
+        )
+        return result.matched_count > 0
+
+    async def release(self, broadcast_id: str, owner: str, progress: Dict[str, Any]) -> None:
+        """Saves progress and lets the lease lapse now, so the next process to look resumes it right away."""
+        now = datetime.now()
+        await self.collection.update_one(
+            {"_id": broadcast_id, "owner": owner, "status": "running"},
+            {"$set": {**progress, "lease_until": now, "updated_at": now}}
+        )
+
+    async def cancel(self, broadcast_id: str) -> bool:
+        """Marks a running broadcast cancelled; its sender notices at its next checkpoint."""
+        now = datetime.now()
+        result = await self.collection.update_one(
+            {"_id": broadcast_id, "status": "running"},
+            {"$set": {"status": "cancelled", "lease_until": None, "updated_at": now, "finished_at": now}}
+        )
+        return result.modified_count > 0
+
 class PromoCodeRepository(BaseRepository):
     def __init__(self, db_client: AsyncIOMotorClient):
         super().__init__(db_client, "promo_codes", PromoCode)
@@ -151,6 +500,10 @@ class PromoCodeRepository(BaseRepository):
         return await self.increment({"_id": name.upper()}, "activations_used")
 
 class BoosterAccountRepository(BaseRepository):
+    indexes = [
+        IndexModel([("status", ASCENDING)], name="status", background=True), # get_all_active_booster_accounts, pool stats
+    ]
+
     def __init__(self, db_client: AsyncIOMotorClient):
         super().__init__(db_client, "booster_accounts", BoosterAccount)
 
@@ -162,3 +515,19 @@ class BoosterAccountRepository(BaseRepository):
 
     async def get_all_active_booster_accounts(self) -> List[BoosterAccount]:
         return await self.get_many({"status": "active"}, limit=0)
+
+    async def get_status_stats(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Per-status pool statistics in one server-side pass; no account documents leave the database.
+        Returns: {status: {"count", "total_daily_subs", "avg_daily_subs", "total_daily_limit"}}; absent statuses are omitted.
+        """
+        pipeline = [
+            {"$group": {
+                "_id": "$status",
+                "count": {"$sum": 1},
+                "total_daily_subs": {"$sum": "$current_daily_subs"},
+                "avg_daily_subs": {"$avg": "$current_daily_subs"},
+                "total_daily_limit": {"$sum": "$daily_subs_limit"},
+            }},
+        ]
+        return {doc.pop("_id"): doc for doc in await self.aggregate(pipeline)}
@@ -0,0 +1,129 @@
+# database/write_behind.py
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Hashable, List, Optional
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError, PyMongoError
+
+logger = logging.getLogger(__name__)
+
+
+class _PendingUpdate:
+    """Coalesced writes for one document: latest timestamp per field ($max) and summed counters ($inc)."""
+    __slots__ = ("max", "inc")
+
+    def __init__(self):
+        self.max: Dict[str, datetime] = {}
+        self.inc: Dict[str, int] = {}
+
+    def merge(self, other: "_PendingUpdate") -> None:
+        for field, value in other.max.items():
+            if field not in self.max or value > self.max[field]:
+                self.max[field] = value
+        for field, value in other.inc.items():
+            self.inc[field] = self.inc.get(field, 0) + value
+
+    def to_update(self) -> Dict[str, Any]:
+        update: Dict[str, Any] = {}
+        if self.max:
+            update["$max"] = self.max # $max: a late flush never moves a timestamp backwards
+        if self.inc:
+            update["$inc"] = self.inc
+        return update
+
+
+class WriteBehindBuffer:
+    """
+    Coalesces frequent, loss-tolerant writes (activity timestamps, small counters) in memory
+    and flushes them periodically as one unordered bulk_write. Any number of touches of the
+    same document between two flushes costs a single UpdateOne.
+    Writes buffered since the last flush are lost if the process dies without stop().
+    """
+
+    def __init__(self, collection, flush_interval: float = 5.0, max_pending: int = 10000):
+        self.collection = collection
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending # Flush early once this many documents are pending
+        self._pending: Dict[Hashable, _PendingUpdate] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+
+    def _entry(self, doc_id: Hashable) -> _PendingUpdate:
+        entry = self._pending.get(doc_id)
+        if entry is None:
+            entry = self._pending[doc_id] = _PendingUpdate()
+            if len(self._pending) >= self.max_pending:
+                self._wakeup.set()
+        return entry
+
+    def touch(self, doc_id: Hashable, field: str = "last_activity_at", when: Optional[datetime] = None) -> None:
+        """Records that `field` of the document should become at least `when` (default: now)."""
+        when = when or datetime.now()
+        entry = self._entry(doc_id)
+        if field not in entry.max or when > entry.max[field]:
+            entry.max[field] = when
+
+    def increment(self, doc_id: Hashable, field: str, value: int = 1) -> None:
+        entry = self._entry(doc_id)
+        entry.inc[field] = entry.inc.get(field, 0) + value
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    async def flush(self) -> int:
+        """Writes everything buffered so far. Returns the number of documents sent."""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {} # Swap first: touches during the write go to the next batch
+            doc_ids = list(batch)
+            requests: List[UpdateOne] = [UpdateOne({"_id": doc_id}, batch[doc_id].to_update()) for doc_id in doc_ids]
+            try:
+                await self.collection.bulk_write(requests, ordered=False)
+            except BulkWriteError as e:
+                # Unordered: everything but the reported writes was applied; retrying those would double $inc
+                failed = [doc_ids[err["index"]] for err in e.details.get("writeErrors", [])]
+                logger.error(f"Write-behind flush to '{self.collection.name}': {len(failed)} of {len(requests)} updates failed: {e}")
+                self._requeue({doc_id: batch[doc_id] for doc_id in failed})
+                return len(requests) - len(failed)
+            except PyMongoError as e:
+                logger.error(f"Write-behind flush of {len(requests)} documents to '{self.collection.name}' failed: {e}")
+                self._requeue(batch)
+                return 0
+            return len(requests)
+
+    def _requeue(self, batch: Dict[Hashable, _PendingUpdate]) -> None:
+        """Puts unwritten updates back, merged with touches made since, so the next flush retries them."""
+        for doc_id, entry in batch.items():
+            newer = self._pending.get(doc_id)
+            if newer is not None:
+                entry.merge(newer)
+            self._pending[doc_id] = entry
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stops the periodic flush and writes out what is still buffered."""
+        if self._task is not None:
+            # Not cancelled: a flush in progress would lose its already swapped-out batch
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
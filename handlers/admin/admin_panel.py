@@ -2,22 +2,35 @@
 from aiogram import Router, F, Bot
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from typing import Callable, Optional
+from typing import Callable, Optional, TYPE_CHECKING
 from datetime import datetime, date
+import html
 
 from database.models import User
-from services.admin_service import AdminService
-from services.mailing_service import MailingService
-from utils.keyboards import get_admin_main_menu_kb, get_admin_broadcast_cancel_kb, get_admin_reports_kb, get_main_menu_kb
+from database.repositories import UserRepository
+from database.pagination import Page, PageCursor
+from database.metrics import query_stats
+from utils.keyboards import get_admin_main_menu_kb, get_admin_broadcast_cancel_kb, get_admin_reports_kb, get_main_menu_kb, get_pagination_kb
+from utils.keyboard_cache import keyboard_cache
 from utils.filters import AdminFilter
 from utils.states import Form
-from utils.callbacks import AdminCallback, AdminReportCallback
+from utils.callbacks import AdminCallback, AdminReportCallback, PageCallback
 from utils.misc import format_datetime
+from utils.ordered_executor import OrderedExecutor
+
+if TYPE_CHECKING: # Only for annotations: services are built (and their modules imported) on first use
+    from services.admin_service import AdminService
+    from services.broadcast_service import BroadcastService
+    from services.mailing_service import MailingService
 
 router = Router()
 router.message.filter(AdminFilter()) # Apply admin filter to all messages in this router
 router.callback_query.filter(AdminFilter()) # Apply admin filter to all callbacks in this router
 
+QUERY_STATS_TOP = 10 # Operations listed by /query_stats
+QUERY_STATS_RECENT_SLOW = 5 # Slow-query log entries shown below them
+RECENT_BROADCASTS = 5 # Listed by /broadcasts
+
 
 @router.message(F.text == "/admin")
 async def cmd_admin_panel(message: Message, state: FSMContext, _: Callable[[str], str]):
@@ -29,7 +42,7 @@ async def cmd_admin_commands(message: Message, _: Callable[[str], str]):
     await message.answer(_("admin_panel.commands_list"))
 
 @router.message(F.text.startswith("/ban "))
-async def cmd_ban_user(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_ban_user(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     args = message.text.split(maxsplit=1)
     if len(args) < 2:
         await message.answer("Usage: `/ban [id|@username]`")
@@ -43,7 +56,7 @@ async def cmd_ban_user(message: Message, admin_service: AdminService, _: Callabl
         await message.answer(_("admin_panel.user_not_found"))
 
 @router.message(F.text.startswith("/unban "))
-async def cmd_unban_user(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_unban_user(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     args = message.text.split(maxsplit=1)
     if len(args) < 2:
         await message.answer("Usage: `/unban [id|@username]`")
@@ -57,7 +70,7 @@ async def cmd_unban_user(message: Message, admin_service: AdminService, _: Calla
         await message.answer(_("admin_panel.user_not_found"))
 
 @router.message(F.text.startswith("/check "))
-async def cmd_check_user(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_check_user(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     args = message.text.split(maxsplit=1)
     if len(args) < 2:
         await message.answer("Usage: `/check [id|@username]`")
@@ -90,7 +103,7 @@ async def cmd_check_user(message: Message, admin_service: AdminService, _: Calla
         await message.answer(_("admin_panel.user_not_found"))
 
 @router.message(F.text.startswith("/set_balance "))
-async def cmd_set_balance(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_set_balance(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     args = message.text.split()
     if len(args) < 3:
         await message.answer("Usage: `/set_balance [user_id] [amount]`")
@@ -110,7 +123,7 @@ async def cmd_set_balance(message: Message, admin_service: AdminService, _: Call
         await message.answer(_("admin_panel.user_not_found"))
 
 @router.message(F.text.startswith("/set_slots "))
-async def cmd_set_slots(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_set_slots(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     args = message.text.split()
     if len(args) < 3:
         await message.answer("Usage: `/set_slots [user_id] [amount]`")
@@ -131,7 +144,7 @@ async def cmd_set_slots(message: Message, admin_service: AdminService, _: Callab
 
 
 @router.message(F.text == "/promo")
-async def cmd_promo_list(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_promo_list(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     promos = await admin_service.get_all_promo_codes()
     if not promos:
         await message.answer("No promo codes found.")
@@ -151,7 +164,7 @@ async def cmd_promo_list(message: Message, admin_service: AdminService, _: Calla
 
 
 @router.message(F.text.startswith("/add_promo "))
-async def cmd_add_promo(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_add_promo(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     # /add_promo NAME CREDITS ACTIVATIONS [YYYY-MM-DD] [one_per_ip_serial:F|T]
     args = message.text.split()
     if len(args) < 4:
@@ -176,7 +189,7 @@ async def cmd_add_promo(message: Message, admin_service: AdminService, _: Callab
         await message.answer(_("admin_panel.promo_exists").format(name=name)) # Or invalid date
 
 @router.message(F.text.startswith("/del_promo "))
-async def cmd_del_promo(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_del_promo(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     args = message.text.split(maxsplit=1)
     if len(args) < 2:
         await message.answer("Usage: `/del_promo NAME`")
@@ -195,10 +208,31 @@ async def cmd_broadcast_start(message: Message, state: FSMContext, _: Callable[[
     await state.set_state(Form.admin_broadcast)
 
 @router.message(Form.admin_broadcast)
-async def cmd_broadcast_message(message: Message, state: FSMContext, mailing_service: MailingService, _: Callable[[str], str]):
-    sent_count, total_count = await mailing_service.send_broadcast(message.html_text) # Use html_text for formatting
-    await message.answer(_("admin_panel.broadcast_success").format(sent=sent_count, total=total_count), reply_markup=get_admin_main_menu_kb(_))
+async def cmd_broadcast_message(message: Message, state: FSMContext, user: User, mailing_service: "MailingService", _: Callable[[str], str]):
     await state.clear()
+    # Runs in the background; the progress message it sends here is kept up to date until it finishes
+    await mailing_service.send_broadcast(message.html_text, created_by=user.id, report_chat_id=message.chat.id, report_locale=user.lang_code) # Use html_text for formatting
+
+@router.callback_query(AdminCallback.filter(F.action == "stop_broadcast"))
+async def cmd_broadcast_stop_callback(call: CallbackQuery, callback_data: AdminCallback, broadcast_service: "BroadcastService", _: Callable[[str], str]):
+    if callback_data.broadcast_id and await broadcast_service.cancel(callback_data.broadcast_id):
+        await call.answer(_("admin_panel.broadcast_stop_requested"))
+    else:
+        await call.answer(_("admin_panel.broadcast_not_running"), show_alert=True)
+
+@router.message(F.text == "/broadcasts")
+async def cmd_broadcasts(message: Message, broadcast_service: "BroadcastService", _: Callable[[str], str]):
+    broadcasts = await broadcast_service.broadcast_repo.get_recent(RECENT_BROADCASTS)
+    if not broadcasts:
+        await message.answer(_("admin_panel.broadcasts_empty"))
+        return
+    lines = [_("admin_panel.broadcasts_pacing").format(**broadcast_service.stats()), "", _("admin_panel.broadcasts_title")]
+    for broadcast in broadcasts:
+        lines.append(_("admin_panel.broadcasts_line").format(
+            id=broadcast.id, status=broadcast.status, done=broadcast.sent + broadcast.blocked + broadcast.failed,
+            total=broadcast.total, created_at=format_datetime(broadcast.created_at)
+        ))
+    await message.answer("\n".join(lines))
 
 @router.callback_query(AdminCallback.filter(F.action == "cancel_broadcast"), Form.admin_broadcast)
 async def cmd_broadcast_cancel_callback(call: CallbackQuery, state: FSMContext, _: Callable[[str], str]):
@@ -208,22 +242,80 @@ async def cmd_broadcast_cancel_callback(call: CallbackQuery, state: FSMContext,
 
 
 @router.message(F.text == "/account_stats")
-async def cmd_account_stats(message: Message, admin_service: AdminService, _: Callable[[str], str]):
+async def cmd_account_stats(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
     stats = await admin_service.get_booster_accounts_stats()
     stats_text = _("admin_panel.account_stats").format(
         active_count=stats["active_count"],
         idle_count=stats["idle_count"],
         banned_count=stats["banned_count"],
-        avg_speed=stats["average_daily_subs_per_account"]
+        sleeping_count=stats["sleeping_count"],
+        offline_count=stats["offline_count"],
+        total_accounts=stats["total_accounts"],
+        avg_speed=stats["average_daily_subs_per_account"],
+        generated_at=format_datetime(stats["generated_at"])
     )
     await message.answer(stats_text)
 
+@router.message(F.text == "/cache_stats")
+async def cmd_cache_stats(message: Message, user_repo: UserRepository, _: Callable[[str], str]):
+    stats = user_repo.cache_stats()
+    keyboards = keyboard_cache.stats()
+    await message.answer(
+        f"<b>User cache:</b> {stats['size']}/{stats['maxsize']} entries\n"
+        f"Hits: {stats['hits']} | Misses: {stats['misses']} | Hit rate: {stats['hit_rate']:.1%}\n"
+        f"Evictions: {stats['evictions']}\n"
+        f"<b>Keyboard cache:</b> {keyboards['size']}/{keyboards['maxsize']} entries | Hit rate: {keyboards['hit_rate']:.1%}",
+        parse_mode='HTML'
+    )
+
+@router.message(F.text == "/update_stats")
+async def cmd_update_stats(message: Message, update_executor: OrderedExecutor, _: Callable[[str], str]):
+    stats = update_executor.stats()
+    await message.answer(
+        f"<b>Update executor:</b> {stats['running']}/{stats['max_concurrency']} running, {stats['pending']} pending "
+        f"(peak {stats['peak_pending']})\n"
+        f"Users with queued updates: {stats['active_keys']} | Deepest user queue: {stats['deepest_queue']}\n"
+        f"Processed: {stats['processed']} | Failed: {stats['failed']} | Avg queue wait: {stats['avg_wait_ms']:.1f}ms",
+        parse_mode='HTML'
+    )
+
+@router.message(F.text.startswith("/query_stats"))
+async def cmd_query_stats(message: Message, _: Callable[[str], str]):
+    args = message.text.split()
+    order = args[1] if len(args) > 1 else "total"
+    if order == "reset":
+        query_stats.reset()
+        await message.answer("Query stats reset.")
+        return
+    if order not in ("total", "p95", "slow"):
+        await message.answer("Usage: `/query_stats [total|p95|slow|reset]`")
+        return
+
+    top = query_stats.top(QUERY_STATS_TOP, by=order)
+    if not top:
+        await message.answer("No queries recorded yet.")
+        return
+    lines = [f"<b>Top queries by {order}</b> (slow ≥ {query_stats.slow_threshold_ms:g}ms)"]
+    for collection, operation, stats in top:
+        latency = stats.latency_ms
+        lines.append(
+            f"<code>{collection}.{operation}</code>: {latency.count} calls, {latency.total / 1000:.1f}s total\n"
+            f"  p50 ≤{latency.percentile(0.5):g}ms | p95 ≤{latency.percentile(0.95):g}ms | max {latency.max:.1f}ms | slow {stats.slow}\n"
+            f"  avg {stats.documents.mean:.1f} docs, {stats.payload_bytes.mean / 1024:.1f} KB"
+        )
+    if query_stats.recent_slow:
+        lines.append("\n<b>Recent slow queries:</b>")
+        for entry in list(query_stats.recent_slow)[-QUERY_STATS_RECENT_SLOW:]:
+            lines.append(f"{entry['ms']:.0f}ms <code>{entry['collection']}.{entry['operation']}</code> "
+                         f"<code>{html.escape(str(entry['shape']))[:200]}</code>")
+    await message.answer("\n".join(lines), parse_mode='HTML')
+
 @router.message(F.text == "/reports")
 async def cmd_reports_menu(message: Message, _: Callable[[str], str]):
     await message.answer(_("admin_panel.reports_menu_title"), reply_markup=get_admin_reports_kb(_)) # Need reports_menu_title in locale
 
 @router.callback_query(AdminReportCallback.filter(F.action == "financial"))
-async def show_financial_report(call: CallbackQuery, admin_service: AdminService, _: Callable[[str], str]):
+async def show_financial_report(call: CallbackQuery, admin_service: "AdminService", _: Callable[[str], str]):
     report = await admin_service.get_financial_report()
     report_text = _("admin_panel.reports_menu.financial_report_msg").format(
         total_revenue_usd=report["total_revenue_usd"],
@@ -234,18 +326,61 @@ async def show_financial_report(call: CallbackQuery, admin_service: AdminService
     await call.message.edit_text(report_text, reply_markup=get_admin_reports_kb(_))
     await call.answer()
 
-@router.callback_query(AdminReportCallback.filter(F.action == "orders"))
-async def show_orders_report(call: CallbackQuery, admin_service: AdminService, _: Callable[[str], str]):
-    orders = await admin_service.get_orders_report()
-    orders_list_str = "\n".join([f"ID: {o.id} | User: {o.user_id} | Channel: {o.channel_id} | Status: {o.status} | Subs: {o.fulfilled_subscribers}/{o.requested_subscribers}" for o in orders[:10]]) # Show first 10
-    report_text = _("admin_panel.reports_menu.orders_report_msg").format(orders_list=orders_list_str if orders_list_str else "No orders.")
-    await call.message.edit_text(report_text, reply_markup=get_admin_reports_kb(_))
+@router.message(F.text.startswith("/financial"))
+async def cmd_financial_report(message: Message, admin_service: "AdminService", _: Callable[[str], str]):
+    # /financial [FROM YYYY-MM-DD] [TO YYYY-MM-DD] - both ends inclusive, open-ended when omitted
+    args = message.text.split()
+    if args[0] != "/financial" or len(args) > 3:
+        await message.answer("Usage: `/financial [YYYY-MM-DD] [YYYY-MM-DD]`")
+        return
+    try:
+        start = datetime.strptime(args[1], "%Y-%m-%d").date() if len(args) > 1 else None
+        end = datetime.strptime(args[2], "%Y-%m-%d").date() if len(args) > 2 else None
+    except ValueError:
+        await message.answer("Dates must be in YYYY-MM-DD format.")
+        return
+
+    report = await admin_service.get_financial_report(start, end)
+    report_text = _("admin_panel.reports_menu.financial_report_msg").format(
+        total_revenue_usd=report["total_revenue_usd"],
+        total_credits_sold=report["total_credits_sold"],
+        completed_transactions=report["completed_transactions"],
+        average_check_usd=report["average_check_usd"]
+    )
+    await message.answer(report_text)
+
+@router.callback_query(AdminReportCallback.filter(F.action == "menu"))
+async def show_reports_menu(call: CallbackQuery, _: Callable[[str], str]):
+    # Back target of the paginated reports
+    await call.message.edit_text(_("admin_panel.reports_menu_title"), reply_markup=get_admin_reports_kb(_))
     await call.answer()
 
-@router.callback_query(AdminReportCallback.filter(F.action == "topups"))
-async def show_topups_report(call: CallbackQuery, admin_service: AdminService, _: Callable[[str], str]):
-    topups = await admin_service.get_top_ups_report()
-    topups_list_str = "\n".join([f"ID: {t.id} | User: {t.user_id} | Amount: {t.amount_usd} ({t.amount_credits} cr) | Status: {t.status}" for t in topups[:10]]) # Show first 10
-    report_text = _("admin_panel.reports_menu.topups_report_msg").format(topups_list=topups_list_str if topups_list_str else "No top-ups.")
-    await call.message.edit_text(report_text, reply_markup=get_admin_reports_kb(_))
+def _orders_report_text(page: Page, _: Callable[[str], str]) -> str:
+    orders_list_str = "\n".join([f"ID: {o.id} | User: {o.user_id} | Channel: {o.channel_id} | Status: {o.status} | Subs: {o.fulfilled_subscribers}/{o.requested_subscribers}" for o in page.items])
+    return _("admin_panel.reports_menu.orders_report_msg").format(orders_list=orders_list_str if orders_list_str else "No orders.")
+
+def _topups_report_text(page: Page, _: Callable[[str], str]) -> str:
+    topups_list_str = "\n".join([f"ID: {t.id} | User: {t.user_id} | Amount: {t.amount_usd} ({t.amount_credits} cr) | Status: {t.status}" for t in page.items])
+    return _("admin_panel.reports_menu.topups_report_msg").format(topups_list=topups_list_str if topups_list_str else "No top-ups.")
+
+# listing -> (AdminService page loader, formatter); pages are 10 items, newest first
+_REPORT_LISTINGS = {
+    "orders": ("get_orders_page", _orders_report_text),
+    "topups": ("get_top_ups_page", _topups_report_text),
+}
+
+@router.callback_query(AdminReportCallback.filter(F.action.in_(_REPORT_LISTINGS)))
+async def show_listing_report(call: CallbackQuery, callback_data: AdminReportCallback, admin_service: "AdminService", _: Callable[[str], str]):
+    loader, report_text = _REPORT_LISTINGS[callback_data.action]
+    page = await getattr(admin_service, loader)()
+    back = AdminReportCallback(action="menu").pack()
+    await call.message.edit_text(report_text(page, _), reply_markup=get_pagination_kb(_, callback_data.action, page, back))
+    await call.answer()
+
+@router.callback_query(PageCallback.filter(F.listing.in_(_REPORT_LISTINGS)))
+async def paginate_listing_report(call: CallbackQuery, callback_data: PageCallback, admin_service: "AdminService", _: Callable[[str], str]):
+    loader, report_text = _REPORT_LISTINGS[callback_data.listing]
+    page = await getattr(admin_service, loader)(PageCursor.unpack(callback_data.ts, callback_data.item_id), callback_data.backward)
+    back = AdminReportCallback(action="menu").pack()
+    await call.message.edit_text(report_text(page, _), reply_markup=get_pagination_kb(_, callback_data.listing, page, back))
     await call.answer()
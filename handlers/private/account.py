@@ -2,15 +2,17 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from typing import Callable
+from typing import Callable, TYPE_CHECKING
 
 from database.models import User
-from services.user_service import UserService
 from utils.keyboards import get_account_menu_kb, get_promocode_menu_kb, get_main_menu_kb
 from utils.callbacks import MainMenuCallback, PromocodeCallback
 from utils.states import Form
 import logging
 
+if TYPE_CHECKING: # Only for annotations: services are built (and their modules imported) on first use
+    from services.user_service import UserService
+
 logger = logging.getLogger(__name__)
 
 router = Router()
@@ -27,7 +29,7 @@ async def input_promocode(call: CallbackQuery, state: FSMContext, _: Callable[[s
     await call.answer()
 
 @router.message(Form.input_promocode, F.text)
-async def process_promocode_input(message: Message, state: FSMContext, user: User, user_service: UserService, _: Callable[[str], str]):
+async def process_promocode_input(message: Message, state: FSMContext, user: User, user_service: "UserService", _: Callable[[str], str]):
     promocode_text = message.text.strip().upper()
 
     promo = await user_service.apply_promo_code(user, promocode_text)
@@ -2,15 +2,18 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from typing import Callable, Optional
+from typing import Callable, List, Optional, TYPE_CHECKING
 
 from database.models import User, Channel, Order
-from services.channel_service import ChannelService
-from services.order_service import OrderService
-from utils.keyboards import get_boosting_menu_kb, get_boost_type_kb, get_channel_selection_kb, get_order_confirmation_kb, get_main_menu_kb, get_channel_manage_kb
-from utils.callbacks import MainMenuCallback, BoostOrderCallback, ChannelCallback
+from database.pagination import Page, PageCursor
+from utils.keyboards import get_boosting_menu_kb, get_boost_type_kb, get_channel_selection_kb, get_order_confirmation_kb, get_main_menu_kb, get_channel_manage_kb, get_pagination_kb
+from utils.callbacks import MainMenuCallback, BoostOrderCallback, ChannelCallback, PageCallback
 from utils.states import Form
 
+if TYPE_CHECKING: # Only for annotations: services are built (and their modules imported) on first use
+    from services.channel_service import ChannelService
+    from services.order_service import OrderService
+
 router = Router()
 
 @router.callback_query(MainMenuCallback.filter(F.action == "new_boost"))
@@ -86,7 +89,7 @@ async def new_boost_enter_subscribers(message: Message, state: FSMContext, user:
     await state.set_state(Form.boosting_confirm_order)
 
 @router.callback_query(BoostOrderCallback.filter(F.action == "confirm"), Form.boosting_confirm_order)
-async def new_boost_confirm_order(call: CallbackQuery, state: FSMContext, user: User, order_service: OrderService, _: Callable[[str], str]):
+async def new_boost_confirm_order(call: CallbackQuery, state: FSMContext, user: User, order_service: "OrderService", _: Callable[[str], str]):
     data = await state.get_data()
     order_type = data["order_type"]
     requested_subscribers = data["requested_subscribers"]
@@ -114,45 +117,65 @@ async def new_boost_cancel_order(call: CallbackQuery, state: FSMContext, _: Call
     await state.clear()
     await call.answer(_("common.cancel"))
 
-@router.callback_query(MainMenuCallback.filter(F.action == "active_boosts"))
-async def show_active_boosts(call: CallbackQuery, user: User, order_service: OrderService, _: Callable[[str], str]):
-    active_orders = await order_service.get_active_orders(user.id)
-    if not active_orders:
-        await call.message.answer(_("boosting_menu.no_active_boosts")) # Need to add this key
+def _format_active_orders(orders: List[Order], user: User, _: Callable[[str], str]) -> str:
+    # Example table format: Название чата | @username | Заказано | Выполнено | Ошибки | ETA | .log
+    response_text = "<b>" + _("boosting_menu.active_orders") + "</b>\n\n"
+    for order in orders:
+        channel = next((c for c in user.channels if c.id == order.channel_id), None)
+        channel_name = channel.title if channel else f"ID: {order.channel_id}"
+
+        response_text += (
+            f"<b>{channel_name}</b> (@{channel.username if channel else 'N/A'})\n"
+            f"Заказано: {order.requested_subscribers} | Выполнено: {order.fulfilled_subscribers} "
+            f"| Ошибки: {order.errors}\n"
+            f"ETA: {order.eta.strftime('%Y-%m-%d %H:%M') if order.eta else 'N/A'} | Статус: {order.status}\n\n"
+        )
+    return response_text
+
+def _format_boost_history(orders: List[Order], user: User, _: Callable[[str], str]) -> str:
+    response_text = "<b>" + _("boosting_menu.order_history") + "</b>\n\n"
+    for order in orders:
+        channel = next((c for c in user.channels if c.id == order.channel_id), None)
+        channel_name = channel.title if channel else f"ID: {order.channel_id}"
+
+        response_text += (
+            f"<b>{channel_name}</b> ({order.order_type.capitalize()})\n"
+            f"Заказано: {order.requested_subscribers} | Выполнено: {order.fulfilled_subscribers}\n"
+            f"Стоимость: {order.cost_credits} кредитов | Завершено: {order.updated_at.strftime('%Y-%m-%d %H:%M')}\n\n"
+        )
+    return response_text
+
+# listing -> (OrderService page loader, formatter, empty-listing text key)
+_ORDER_LISTINGS = {
+    "active": ("get_active_orders_page", _format_active_orders, "boosting_menu.no_active_boosts"),
+    "history": ("get_order_history_page", _format_boost_history, "boosting_menu.no_boost_history"),
+}
+
+def _orders_page_kb(_: Callable[[str], str], listing: str, page: Page):
+    return get_pagination_kb(_, listing, page, MainMenuCallback(action="boosting").pack())
+
+@router.callback_query(MainMenuCallback.filter(F.action.in_({"active_boosts", "boost_history"})))
+async def show_orders_listing(call: CallbackQuery, callback_data: MainMenuCallback, user: User, order_service: "OrderService", _: Callable[[str], str]):
+    # First page of active boosts / boost history; further pages are loaded by paginate_orders_listing
+    listing = "active" if callback_data.action == "active_boosts" else "history"
+    loader, format_orders, empty_key = _ORDER_LISTINGS[listing]
+    page = await getattr(order_service, loader)(user.id)
+    if not page.items:
+        await call.message.answer(_(empty_key)) # Need to add this key
     else:
-        # Format and display active orders
-        # Example table format: Название чата | @username | Заказано | Выполнено | Ошибки | ETA | .log
-        response_text = "<b>" + _("boosting_menu.active_orders") + "</b>\n\n"
-        for order in active_orders:
-            channel = next((c for c in user.channels if c.id == order.channel_id), None)
-            channel_name = channel.title if channel else f"ID: {order.channel_id}"
-            
-            response_text += (
-                f"<b>{channel_name}</b> (@{channel.username if channel else 'N/A'})\n"
-                f"Заказано: {order.requested_subscribers} | Выполнено: {order.fulfilled_subscribers} "
-                f"| Ошибки: {order.errors}\n"
-                f"ETA: {order.eta.strftime('%Y-%m-%d %H:%M') if order.eta else 'N/A'} | Статус: {order.status}\n\n"
-            )
-        await call.message.answer(response_text, parse_mode='HTML', reply_markup=get_boosting_menu_kb(_))
+        await call.message.answer(format_orders(page.items, user, _), parse_mode='HTML', reply_markup=_orders_page_kb(_, listing, page))
     await call.answer()
 
-@router.callback_query(MainMenuCallback.filter(F.action == "boost_history"))
-async def show_boost_history(call: CallbackQuery, user: User, order_service: OrderService, _: Callable[[str], str]):
-    completed_orders = await order_service.get_order_history(user.id)
-    if not completed_orders:
-        await call.message.answer(_("boosting_menu.no_boost_history")) # Need to add this key
-    else:
-        response_text = "<b>" + _("boosting_menu.order_history") + "</b>\n\n"
-        for order in completed_orders:
-            channel = next((c for c in user.channels if c.id == order.channel_id), None)
-            channel_name = channel.title if channel else f"ID: {order.channel_id}"
-            
-            response_text += (
-                f"<b>{channel_name}</b> ({order.order_type.capitalize()})\n"
-                f"Заказано: {order.requested_subscribers} | Выполнено: {order.fulfilled_subscribers}\n"
-                f"Стоимость: {order.cost_credits} кредитов | Завершено: {order.updated_at.strftime('%Y-%m-%d %H:%M')}\n\n"
-            )
-        await call.message.answer(response_text, parse_mode='HTML', reply_markup=get_boosting_menu_kb(_))
+@router.callback_query(PageCallback.filter(F.listing.in_(_ORDER_LISTINGS)))
+async def paginate_orders_listing(call: CallbackQuery, callback_data: PageCallback, user: User, order_service: "OrderService", _: Callable[[str], str]):
+    loader, format_orders, empty_key = _ORDER_LISTINGS[callback_data.listing]
+    cursor = PageCursor.unpack(callback_data.ts, callback_data.item_id)
+    page = await getattr(order_service, loader)(user.id, cursor, callback_data.backward)
+    if not page.items:
+        # Orders moved out of this listing since the page was rendered
+        await call.answer(_(empty_key), show_alert=True)
+        return
+    await call.message.edit_text(format_orders(page.items, user, _), parse_mode='HTML', reply_markup=_orders_page_kb(_, callback_data.listing, page))
     await call.answer()
 
 @router.callback_query(MainMenuCallback.filter(F.action == "my_channels"))
@@ -180,7 +203,7 @@ async def show_my_channels(call: CallbackQuery, user: User, _: Callable[[str], s
     await call.answer()
 
 @router.callback_query(ChannelCallback.filter(F.action == "manage"))
-async def manage_single_channel(call: CallbackQuery, callback_data: ChannelCallback, user: User, channel_service: ChannelService, _: Callable[[str], str]):
+async def manage_single_channel(call: CallbackQuery, callback_data: ChannelCallback, user: User, channel_service: "ChannelService", _: Callable[[str], str]):
     channel_id = callback_data.channel_id
     selected_channel = next((c for c in user.channels if c.id == channel_id), None)
     if not selected_channel:
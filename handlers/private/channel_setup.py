@@ -2,20 +2,22 @@
 from aiogram import Router, F
 from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
-from typing import Callable, Any
+from typing import Callable, Any, TYPE_CHECKING
 
 from database.models import User, Channel
-from services.channel_service import ChannelService
 from utils.states import Form
 from utils.keyboards import get_main_menu_kb
 import logging
 
+if TYPE_CHECKING: # Only for annotations: services are built (and their modules imported) on first use
+    from services.channel_service import ChannelService
+
 logger = logging.getLogger(__name__)
 
 router = Router()
 
 @router.message(Form.channel_link_input, F.text)
-async def process_channel_link(message: Message, state: FSMContext, user: User, channel_service: ChannelService, _: Callable[[str], str]):
+async def process_channel_link(message: Message, state: FSMContext, user: User, channel_service: "ChannelService", _: Callable[[str], str]):
     channel_link = message.text.strip()
 
     # Pass the user object to the service method
@@ -2,28 +2,31 @@
 from aiogram import Router, F
 from aiogram.types import CallbackQuery
 from aiogram.fsm.context import FSMContext
-from typing import Callable
+from typing import Callable, TYPE_CHECKING
 
 from database.models import User # For type hinting User
-from services.user_service import UserService
+from i18n import YamlI18n
 from utils.keyboards import get_main_menu_kb
 from utils.callbacks import LanguageCallback
 from utils.states import Form
 import logging
 
+if TYPE_CHECKING: # Only for annotations: services are built (and their modules imported) on first use
+    from services.user_service import UserService
+
 logger = logging.getLogger(__name__)
 
 router = Router()
 
 @router.callback_query(LanguageCallback.filter(), Form.lang_selection)
-async def select_language(call: CallbackQuery, callback_data: LanguageCallback, state: FSMContext, user: User, user_service: UserService, _: Callable[[str], str]):
+async def select_language(call: CallbackQuery, callback_data: LanguageCallback, state: FSMContext, user: User, user_service: "UserService", i18n: YamlI18n, _: Callable[[str], str]):
     lang_code = callback_data.lang_code
     
     if await user_service.update_user_language(user.id, lang_code):
         user.lang_code = lang_code # Update in-memory user object
         
         # Reload translation function for the current language immediately
-        _ = await data["i18n"].set_locale(lang_code)
+        _ = i18n.translator(lang_code)
 
         await call.message.edit_text(_("language_selection.selected"))
         
@@ -7,42 +7,59 @@ from typing import Callable
 from database.models import User
 from utils.keyboards import get_main_menu_kb, get_boosting_menu_kb, get_account_menu_kb, get_wallet_menu_kb, get_offers_menu_kb
 from utils.callbacks import MainMenuCallback
+from utils.dispatch import reply_button_index
 import logging
 
 logger = logging.getLogger(__name__)
 
 router = Router()
 
+MAIN_MENU_BUTTONS = reply_button_index("main_menu.buttons") # Button text in any locale -> button key
+
+async def _show_boosting_menu(message: Message, user: User, _: Callable[[str], str]):
+    await message.answer(_("main_menu.buttons.boosting"), reply_markup=get_boosting_menu_kb(_))
+
+async def _show_account_menu(message: Message, user: User, _: Callable[[str], str]):
+    # This duplicates logic in callbacks.py but ensures direct button press works
+    pro_status_text = _("my_account_menu.pro_status_inactive")
+    if user.is_pro:
+        pro_status_text = _("my_account_menu.pro_status_active")
+        if user.pro_expires_at:
+            pro_status_text += _("my_account_menu.pro_expires").format(date=user.pro_expires_at.strftime("%Y-%m-%d"))
+
+    user_info = _("my_account_menu.user_info").format(
+        id=user.id,
+        username=user.username or "N/A",
+        first_name=user.first_name or "",
+        last_name=user.last_name or "",
+        lang_code=user.lang_code or "N/A",
+        registered_at=user.registered_at.strftime("%Y-%m-%d %H:%M"),
+        last_activity_at=user.last_activity_at.strftime("%Y-%m-%d %H:%M"),
+        balance=user.balance,
+        pro_status_text=pro_status_text
+    )
+    await message.answer(user_info, reply_markup=get_account_menu_kb(_))
+
+async def _show_wallet_menu(message: Message, user: User, _: Callable[[str], str]):
+    await message.answer(_("wallet_menu.current_balance").format(balance=user.balance), reply_markup=get_wallet_menu_kb(_))
+
+async def _show_offers_menu(message: Message, user: User, _: Callable[[str], str]):
+    await message.answer(_("offers_menu.offers_title"), reply_markup=get_offers_menu_kb(_))
+
+_MAIN_MENU_ACTIONS = {
+    "boosting": _show_boosting_menu,
+    "my_account": _show_account_menu,
+    "wallet": _show_wallet_menu,
+    "offers": _show_offers_menu,
+}
+
 @router.message(F.text)
 async def handle_main_menu_buttons(message: Message, state: FSMContext, user: User, _: Callable[[str], str]):
     await state.clear() # Clear FSM state when returning to main menu
 
-    if message.text == _("main_menu.buttons.boosting"):
-        await message.answer(_("main_menu.buttons.boosting"), reply_markup=get_boosting_menu_kb(_))
-    elif message.text == _("main_menu.buttons.my_account"):
-        # This duplicates logic in callbacks.py but ensures direct button press works
-        pro_status_text = _("my_account_menu.pro_status_inactive")
-        if user.is_pro:
-            pro_status_text = _("my_account_menu.pro_status_active")
-            if user.pro_expires_at:
-                pro_status_text += _("my_account_menu.pro_expires").format(date=user.pro_expires_at.strftime("%Y-%m-%d"))
-
-        user_info = _("my_account_menu.user_info").format(
-            id=user.id,
-            username=user.username or "N/A",
-            first_name=user.first_name or "",
-            last_name=user.last_name or "",
-            lang_code=user.lang_code or "N/A",
-            registered_at=user.registered_at.strftime("%Y-%m-%d %H:%M"),
-            last_activity_at=user.last_activity_at.strftime("%Y-%m-%d %H:%M"),
-            balance=user.balance,
-            pro_status_text=pro_status_text
-        )
-        await message.answer(user_info, reply_markup=get_account_menu_kb(_))
-    elif message.text == _("main_menu.buttons.wallet"):
-        await message.answer(_("wallet_menu.current_balance").format(balance=user.balance), reply_markup=get_wallet_menu_kb(_))
-    elif message.text == _("main_menu.buttons.offers"):
-        await message.answer(_("offers_menu.offers_title"), reply_markup=get_offers_menu_kb(_))
+    action = _MAIN_MENU_ACTIONS.get(MAIN_MENU_BUTTONS.get(message.text))
+    if action:
+        await action(message, user, _)
     else:
         # Fallback for unrecognized text commands
-        await message.answer(_("main_menu.greeting").format(user_name=message.from_user.first_name or message.from_user.username), reply_markup=get_main_menu_kb(_))
\ No newline at end of file
+        await message.answer(_("main_menu.greeting").format(user_name=message.from_user.first_name or message.from_user.username), reply_markup=get_main_menu_kb(_))
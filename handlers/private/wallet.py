@@ -2,27 +2,29 @@
 from aiogram import Router, F
 from aiogram.types import Message, CallbackQuery
 from aiogram.fsm.context import FSMContext
-from typing import Callable
+from typing import Callable, TYPE_CHECKING
 from datetime import datetime
 
 from database.models import User, Transaction
-from services.payment_service import PaymentService
 from utils.keyboards import get_wallet_menu_kb, get_cryptomus_prices_kb, get_payment_status_kb
 from utils.callbacks import MainMenuCallback, WalletCallback
 import logging
 
+if TYPE_CHECKING: # Only for annotations: services are built (and their modules imported) on first use
+    from services.payment_service import PaymentService
+
 logger = logging.getLogger(__name__)
 
 router = Router()
 
 @router.callback_query(WalletCallback.filter(F.action == "buy"))
-async def buy_credits_menu(call: CallbackQuery, payment_service: PaymentService, _: Callable[[str], str]):
+async def buy_credits_menu(call: CallbackQuery, payment_service: "PaymentService", _: Callable[[str], str]):
     prices = payment_service.get_price_options()
     await call.message.edit_text(_("wallet_menu.select_amount_to_buy"), reply_markup=get_cryptomus_prices_kb(_, prices))
     await call.answer()
 
 @router.callback_query(WalletCallback.filter(F.action == "select_amount"))
-async def process_selected_amount(call: CallbackQuery, callback_data: WalletCallback, user: User, payment_service: PaymentService, _: Callable[[str], str]):
+async def process_selected_amount(call: CallbackQuery, callback_data: WalletCallback, user: User, payment_service: "PaymentService", _: Callable[[str], str]):
     credits = callback_data.credits
     usd_amount = callback_data.usd_amount
     
@@ -72,7 +74,7 @@ async def process_selected_amount(call: CallbackQuery, callback_data: WalletCall
     await call.answer()
 
 @router.callback_query(WalletCallback.filter(F.action == "check_payment"))
-async def check_payment_status_callback(call: CallbackQuery, callback_data: WalletCallback, user: User, payment_service: PaymentService, _: Callable[[str], str]):
+async def check_payment_status_callback(call: CallbackQuery, callback_data: WalletCallback, user: User, payment_service: "PaymentService", _: Callable[[str], str]):
     invoice_uuid = callback_data.invoice_uuid
     if not invoice_uuid:
         await call.message.answer(_("error.default"), reply_markup=get_wallet_menu_kb(_))
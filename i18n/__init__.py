@@ -1,9 +1,7 @@
 # i18n/__init__.py
 
-from aiogram_i18n.middleware import I18nMiddleware
+from config.settings import settings
+from i18n.core import YamlI18n, Translator
 
-i18n_manager = I18nMiddleware(
-    path="i18n/locales",  # или './i18n/locales', если путь от корня проекта
-    default_locale="ru",
-    use_locale_path=True
-)
+# Locales are compiled on first use (see YamlI18n), so importing this is cheap
+i18n_manager = YamlI18n(path=settings.LOCALES_DIR, default_locale=settings.DEFAULT_LOCALE)
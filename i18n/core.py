@@ -0,0 +1,123 @@
+# i18n/core.py
+import keyword
+import logging
+import string
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+import yaml
+
+logger = logging.getLogger(__name__)
+
+_KEY_SEPARATOR = "."
+
+def _compile_renderer(text: str) -> Optional[Callable[..., str]]:
+    """
+    Turns a str.format template into a function building the same string with one f-string, parsed once.
+    None for templates that only str.format can render: positional ({} / {0}), attribute or index fields
+    ({user.name}, {items[0]}) and nested format specs.
+    """
+    pieces, fields = [], []
+    for literal, field, format_spec, conversion in string.Formatter().parse(text):
+        if literal:
+            pieces.append("f" + repr(literal.replace("{", "{{").replace("}", "}}")))
+        if field is None:
+            continue
+        if not field.isidentifier() or keyword.iskeyword(field) or "{" in (format_spec or ""):
+            return None
+        if field not in fields:
+            fields.append(field)
+        pieces.append("f" + repr("{" + field + (f"!{conversion}" if conversion else "") + (f":{format_spec}" if format_spec else "") + "}"))
+    # Adjacent f-string literals compile to a single BUILD_STRING; unused keyword arguments are ignored like str.format does
+    return eval(f"lambda {', '.join(fields + ['**_unused'])}: {' '.join(pieces)}", {"__builtins__": {}}) # Only our own locale files get here
+
+class Template(str):
+    """
+    A translated string. Still a plain str to callers, but .format() runs the renderer compiled from it
+    at load time instead of parsing the template on every call.
+    """
+
+    def __new__(cls, text: str) -> "Template":
+        template = super().__new__(cls, text)
+        template._render = _compile_renderer(text) if "{" in text else None
+        return template
+
+    def format(self, *args: Any, **kwargs: Any) -> str:
+        if self._render is None or args:
+            return str.format(self, *args, **kwargs)
+        try:
+            return self._render(**kwargs)
+        except TypeError: # Missing field: let str.format raise its usual KeyError
+            return str.format(self, **kwargs)
+
+def _flatten(node: Dict[str, Any], prefix: str = "") -> Iterator[Tuple[str, Any]]:
+    for key, value in node.items():
+        full_key = f"{prefix}{key}"
+        if isinstance(value, dict):
+            yield from _flatten(value, full_key + _KEY_SEPARATOR)
+        elif value is not None:
+            yield full_key, value
+
+def compile_locale(path: Path) -> Dict[str, Template]:
+    """Reads one locale file into a flat "section.key" -> Template table."""
+    with open(path, encoding="utf-8") as f:
+        tree = yaml.safe_load(f) or {}
+    return {key: Template(value if isinstance(value, str) else str(value)) for key, value in _flatten(tree)}
+
+class Translator:
+    """The `_` handlers receive: _("key") or _("key", name=value) in one locale, falling back to the default locale, then to the key."""
+    __slots__ = ("locale", "_table")
+
+    def __init__(self, locale: str, table: Dict[str, Template]):
+        self.locale = locale
+        self._table = table
+
+    def __call__(self, key: str, **kwargs: Any) -> str:
+        template = self._table.get(key)
+        if template is None:
+            return key
+        return template.format(**kwargs) if kwargs else template
+
+class YamlI18n:
+    """
+    Translation catalogs from `path`/*.yml (nested YAML, dotted keys). A locale is compiled the first time
+    a translator for it is asked for: its file is parsed, flattened over the default locale's table (so a
+    missing key costs no second lookup) and every template pre-parsed. Locales nobody uses are never loaded.
+    """
+
+    def __init__(self, path: Path, default_locale: str):
+        self.path = Path(path)
+        self.default_locale = default_locale
+        self.available = {file.stem for file in self.path.glob("*.yml")} # File names only, nothing parsed yet
+        if default_locale not in self.available:
+            raise ValueError(f"Default locale '{default_locale}' has no {default_locale}.yml in {self.path}")
+        self._translators: Dict[str, Translator] = {}
+
+    def resolve(self, locale: Optional[str]) -> str:
+        """Best available locale for a user's lang_code or Telegram language_code ("en", "pt-br", "zh-hans")."""
+        if locale:
+            locale = locale.lower()
+            if locale in self.available:
+                return locale
+            base = locale.split("-", 1)[0]
+            if base in self.available:
+                return base
+        return self.default_locale
+
+    def translator(self, locale: Optional[str] = None) -> Translator:
+        locale = self.resolve(locale)
+        translator = self._translators.get(locale)
+        if translator is None:
+            table = compile_locale(self.path / f"{locale}.yml")
+            if locale != self.default_locale:
+                table = {**self.translator(self.default_locale)._table, **table}
+            translator = self._translators[locale] = Translator(locale, table)
+            logger.info(f"Loaded locale '{locale}': {len(table)} keys")
+        return translator
+
+    def get(self, key: str, locale: Optional[str] = None, **kwargs: Any) -> str:
+        return self.translator(locale)(key, **kwargs)
+
+    @property
+    def loaded(self) -> Tuple[str, ...]:
+        return tuple(self._translators)
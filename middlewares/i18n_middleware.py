@@ -1,12 +1,30 @@
-from aiogram_i18n.middleware import I18nMiddleware
+# middlewares/i18n_middleware.py
+from aiogram import BaseMiddleware
 from typing import Callable, Awaitable, Dict, Any
 from aiogram.types import TelegramObject
 
+from i18n.core import YamlI18n
 
-class UserI18nMiddleware(I18nMiddleware):
-    async def get_locale(
-        self,
-        event: TelegramObject,
-        data: Dict[str, Any]
-    ) -> str:
-        return "ru"  # Или 'en', если хочешь по умолчанию английский
+
+class UserI18nMiddleware(BaseMiddleware):
+    """
+    Gives handlers `_`, the translator for the user's language (User.lang_code, else the Telegram
+    client's language, else the default locale), and `i18n`, the catalogs themselves.
+    Must run after UserMiddleware, which puts `user` in the data.
+    """
+
+    def __init__(self, i18n: YamlI18n):
+        super().__init__()
+        self.i18n = i18n
+
+    async def __call__(self,
+                       handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject,
+                       data: Dict[str, Any]) -> Any:
+        user = data.get("user")
+        locale = user.lang_code if user and user.lang_code else None
+        if locale is None and data.get("event_from_user"):
+            locale = data["event_from_user"].language_code
+        data["i18n"] = self.i18n
+        data["_"] = self.i18n.translator(locale)
+        return await handler(event, data)
@@ -2,21 +2,35 @@
 
 from aiogram import BaseMiddleware
 from aiogram.types import TelegramObject
-from typing import Callable, Dict, Any, Awaitable
+from typing import Callable, Dict, Any, Awaitable, Optional
 from database.repositories import UserRepository
+from database.write_behind import WriteBehindBuffer
 
 
 class UserMiddleware(BaseMiddleware):
-    def __init__(self, user_repo: UserRepository):
+    def __init__(self, user_repo: Optional[UserRepository] = None, activity_buffer: Optional[WriteBehindBuffer] = None):
         super().__init__()
+        # Repositories are created in on_startup, after middlewares are registered,
+        # so by default the repo and buffer are taken from the dispatcher's workflow data.
         self.user_repo = user_repo
+        self.activity_buffer = activity_buffer
 
     async def __call__(self,
                        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
                        event: TelegramObject,
                        data: Dict[str, Any]) -> Any:
         telegram_user = data.get("event_from_user")
-        if telegram_user:
-            user = await self.user_repo.get_or_create_user(user_id=telegram_user.id)
+        user_repo = self.user_repo or data.get("user_repo")
+        if telegram_user and user_repo:
+            # Served from UserRepository's read-through cache on most updates
+            user = await user_repo.get_or_create_user(
+                user_id=telegram_user.id,
+                username=telegram_user.username,
+                first_name=telegram_user.first_name,
+                last_name=telegram_user.last_name
+            )
             data["user"] = user
+            activity_buffer = self.activity_buffer or data.get("activity_buffer")
+            if activity_buffer:
+                activity_buffer.touch(user.id) # last_activity_at, written in the next bulk flush
         return await handler(event, data)
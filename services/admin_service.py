@@ -1,24 +1,33 @@
 # services/admin_service.py
 from typing import Optional, List, Dict
 from datetime import datetime, date
-from database.repositories import UserRepository, OrderRepository, TransactionRepository, PromoCodeRepository, BoosterAccountRepository
+from config.settings import settings
+from database.cache import TTLCache
+from database.repositories import UserRepository, OrderRepository, TransactionRepository, PromoCodeRepository, BoosterAccountRepository, DailyFinancialsRepository
 from database.models import User, PromoCode, Order, Transaction, BoosterAccount
+from database.pagination import Page, PageCursor
 import logging
 
 logger = logging.getLogger(__name__)
 
+BOOSTER_STATUSES = ("active", "idle", "banned", "sleeping", "offline") # Mirrors BoosterAccount.status pattern
+
 class AdminService:
     def __init__(self,
                  user_repo: UserRepository,
                  order_repo: OrderRepository,
                  transaction_repo: TransactionRepository,
                  promo_repo: PromoCodeRepository,
-                 booster_account_repo: BoosterAccountRepository):
+                 booster_account_repo: BoosterAccountRepository,
+                 daily_financials_repo: DailyFinancialsRepository):
         self.user_repo = user_repo
         self.order_repo = order_repo
         self.transaction_repo = transaction_repo
         self.promo_repo = promo_repo
         self.booster_account_repo = booster_account_repo
+        self.daily_financials_repo = daily_financials_repo
+        # Single-entry snapshot of the booster pool stats; /account_stats reads it instead of scanning the pool
+        self._booster_stats = TTLCache(maxsize=1, ttl=settings.BOOSTER_STATS_TTL_SECONDS)
 
     async def find_user_by_identifier(self, identifier: str) -> Optional[User]:
         if identifier.isdigit():
@@ -115,29 +124,24 @@ class AdminService:
     async def get_all_promo_codes(self) -> List[PromoCode]:
         return await self.promo_repo.get_many({}, limit=0)
 
-    async def get_financial_report(self) -> dict:
-        total_revenue_usd = 0.0
-        total_credits_sold = 0
-        transactions = await self.transaction_repo.get_many({"status": "completed"}) # Only completed ones
-        
-        for tx in transactions:
-            total_revenue_usd += tx.amount_usd
-            total_credits_sold += tx.amount_credits
-
-        average_check = total_revenue_usd / len(transactions) if transactions else 0
+    async def get_financial_report(self, start: Optional[date] = None, end: Optional[date] = None) -> dict:
+        """Totals for completed payments in the inclusive [start, end] day range, summed from the daily rollups."""
+        totals = await self.daily_financials_repo.get_totals(start, end)
+        completed_transactions = totals["transactions"]
+        average_check = totals["revenue_usd"] / completed_transactions if completed_transactions else 0
 
         return {
-            "total_revenue_usd": total_revenue_usd,
-            "total_credits_sold": total_credits_sold,
-            "completed_transactions": len(transactions),
+            "total_revenue_usd": totals["revenue_usd"],
+            "total_credits_sold": totals["credits_sold"],
+            "completed_transactions": completed_transactions,
             "average_check_usd": average_check
         }
 
-    async def get_orders_report(self) -> List[Order]:
-        return await self.order_repo.get_many({}, limit=0) # Return all orders
+    async def get_orders_page(self, cursor: Optional[PageCursor] = None, backward: bool = False, page_size: int = 10) -> Page[Order]:
+        return await self.order_repo.get_page({}, cursor, backward, page_size)
 
-    async def get_top_ups_report(self) -> List[Transaction]:
-        return await self.transaction_repo.get_many({}, limit=0) # Return all transactions
+    async def get_top_ups_page(self, cursor: Optional[PageCursor] = None, backward: bool = False, page_size: int = 10) -> Page[Transaction]:
+        return await self.transaction_repo.get_page({}, cursor, backward, page_size)
 
     async def add_booster_account(self, phone_number: str, session_file_path: str, proxy: Optional[str] = None) -> Optional[BoosterAccount]:
         account_data = BoosterAccount(
@@ -146,23 +150,39 @@ class AdminService:
             proxies=proxy,
             status="active" # Assuming active upon addition
         )
-        return await self.booster_account_repo.create_booster_account(account_data)
-
-    async def get_booster_accounts_stats(self) -> dict:
-        active_accounts = await self.booster_account_repo.get_many({"status": "active"}, limit=0)
-        idle_accounts = await self.booster_account_repo.get_many({"status": "idle"}, limit=0)
-        banned_accounts = await self.booster_account_repo.get_many({"status": "banned"}, limit=0)
-        
-        # Calculate average speed (conceptual, needs real data from boosting activity)
-        # For now, if current_daily_subs is logged, we can use it.
-        total_speed = sum(a.current_daily_subs for a in active_accounts)
-        avg_speed = total_speed / len(active_accounts) if active_accounts else 0
+        account = await self.booster_account_repo.create_booster_account(account_data)
+        self._booster_stats.clear() # Pool changed, next /account_stats recomputes
+        return account
+
+    async def get_booster_accounts_stats(self, refresh: bool = False) -> dict:
+        """
+        Booster pool statistics by status. Served from a snapshot that is at most
+        BOOSTER_STATS_TTL_SECONDS old; `refresh` forces a new aggregation.
+        """
+        stats = None if refresh else self._booster_stats.get("snapshot")
+        if stats is None:
+            stats = await self._compute_booster_accounts_stats()
+            self._booster_stats.set("snapshot", stats)
+        return stats
+
+    async def _compute_booster_accounts_stats(self) -> dict:
+        by_status = await self.booster_account_repo.get_status_stats()
+        empty = {"count": 0, "total_daily_subs": 0, "avg_daily_subs": 0.0, "total_daily_limit": 0}
+        for status in BOOSTER_STATUSES:
+            by_status.setdefault(status, dict(empty))
+
+        # Speed is measured on active accounts only: current_daily_subs of the others is stale
+        avg_speed = by_status["active"]["avg_daily_subs"] or 0.0
 
         return {
-            "active_count": len(active_accounts),
-            "idle_count": len(idle_accounts),
-            "banned_count": len(banned_accounts),
-            "total_accounts": len(active_accounts) + len(idle_accounts) + len(banned_accounts),
+            "active_count": by_status["active"]["count"],
+            "idle_count": by_status["idle"]["count"],
+            "banned_count": by_status["banned"]["count"],
+            "sleeping_count": by_status["sleeping"]["count"],
+            "offline_count": by_status["offline"]["count"],
+            "total_accounts": sum(s["count"] for s in by_status.values()),
             "average_daily_subs_per_account": avg_speed,
+            "by_status": by_status,
+            "generated_at": datetime.now(),
             "optimization_suggestions": "Monitor daily performance, replace banned accounts, optimize proxy usage." # Placeholder
         }
@@ -0,0 +1,326 @@
+# services/broadcast_service.py
+import asyncio
+import html
+import logging
+import os
+import socket
+import time
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from aiogram import Bot
+from aiogram.exceptions import TelegramBadRequest, TelegramForbiddenError
+
+from config.settings import settings
+from database.models import Broadcast, User
+from database.repositories import BroadcastRepository, UserRepository
+from i18n import i18n_manager
+from utils.keyboards import get_broadcast_progress_kb
+from utils.rate_limit import AimdController, OutboundLane, outbound_lane, send_feedback
+
+logger = logging.getLogger(__name__)
+
+RECIPIENTS = {"is_banned": False}
+RATE_WINDOW_SECONDS = 30.0 # Throughput shown in the progress message is averaged over this long
+
+def _format_duration(seconds: float) -> str:
+    return str(timedelta(seconds=int(seconds)))
+
+class _BroadcastRun:
+    """Progress of one broadcast this process is sending."""
+
+    def __init__(self, broadcast: Broadcast):
+        self.broadcast = broadcast
+        self.sent = broadcast.sent
+        self.blocked = broadcast.blocked
+        self.failed = broadcast.failed
+        self.last_user_id = broadcast.last_user_id
+        self.stopping = False # Set by cancel(), a lost lease or shutdown; the producer and workers wind down
+        self.shutdown = False # Stopped by BroadcastService.stop(): hand it over instead of finishing it
+        self.lease_lost = False
+        self.task: Optional[asyncio.Task] = None
+        self._in_flight: "OrderedDict[int, Optional[str]]" = OrderedDict() # Queued recipient -> outcome once handled, in _id order
+        # Counters up to last_user_id, the only ones checkpointed: recipients handled past it are sent again
+        # on resume, so counting them in the checkpoint too would count them twice
+        self._confirmed = {"sent": broadcast.sent, "blocked": broadcast.blocked, "failed": broadcast.failed}
+        self._samples: Deque[Tuple[float, int]] = deque() # (monotonic time, handled) for the rate
+
+    @property
+    def handled(self) -> int:
+        return self.sent + self.blocked + self.failed
+
+    def queued(self, user_id: int) -> None:
+        self._in_flight[user_id] = None
+
+    def done(self, user_id: int, outcome: str) -> None:
+        setattr(self, outcome, getattr(self, outcome) + 1) # Live counters, for the progress message
+        self._in_flight[user_id] = outcome
+        # Workers finish out of order: the checkpoint only moves past a recipient once every lower _id is handled
+        while self._in_flight:
+            first_id, first_outcome = next(iter(self._in_flight.items()))
+            if first_outcome is None:
+                break
+            self._in_flight.popitem(last=False)
+            self._confirmed[first_outcome] += 1
+            self.last_user_id = first_id
+
+    def progress(self, final: bool = False) -> Dict[str, Any]:
+        """
+        What is saved to the broadcast: counters consistent with last_user_id, for a resume to continue from.
+        `final` saves the live counters instead, for a broadcast that is finished and won't be resumed.
+        """
+        counters = {"sent": self.sent, "blocked": self.blocked, "failed": self.failed} if final else self._confirmed
+        return {**counters, "last_user_id": self.last_user_id}
+
+    def rate(self) -> float:
+        """Messages handled per second over the last RATE_WINDOW_SECONDS."""
+        now = time.monotonic()
+        self._samples.append((now, self.handled))
+        while len(self._samples) > 2 and now - self._samples[0][0] > RATE_WINDOW_SECONDS:
+            self._samples.popleft()
+        start, handled = self._samples[0]
+        return (self.handled - handled) / (now - start) if now > start else 0.0
+
+class BroadcastService:
+    """
+    Sends one message to every non-banned user. Recipients are streamed from Mongo in _id order to a pool
+    of BROADCAST_CONCURRENCY workers. An AIMD controller, shared by all broadcasts of the process, paces
+    them by how Telegram responds, below the outbound rate limiter's budget; their sends queue in the
+    broadcast (or scheduled) lane there. Progress is checkpointed to the broadcasts collection together with a
+    lease, so a broadcast whose process died is picked up by the watchdog of another and resumed after the
+    last recipient it had confirmed. Sends that were in flight at the crash may be repeated.
+    """
+
+    def __init__(self, bot: Bot, user_repo: UserRepository, broadcast_repo: BroadcastRepository):
+        self.bot = bot
+        self.user_repo = user_repo
+        self.broadcast_repo = broadcast_repo
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._runs: Dict[str, _BroadcastRun] = {}
+        self._watchdog: Optional[asyncio.Task] = None
+        self.pacing = AimdController(
+            settings.BROADCAST_AIMD_INITIAL_RATE,
+            min_rate=settings.BROADCAST_AIMD_MIN_RATE,
+            max_rate=settings.OUTBOUND_RATE_LIMIT,
+            increase=settings.BROADCAST_AIMD_INCREASE,
+            decrease=settings.BROADCAST_AIMD_DECREASE,
+            max_concurrency=settings.BROADCAST_CONCURRENCY,
+            latency_target=settings.BROADCAST_LATENCY_TARGET_MS / 1000
+        )
+
+    async def start(self, text: str, kind: str = "broadcast", personalized: bool = False, created_by: Optional[int] = None,
+                    report_chat_id: Optional[int] = None, report_locale: Optional[str] = None) -> Broadcast:
+        """Starts sending `text` in the background and returns the broadcast; progress goes to `report_chat_id`."""
+        broadcast = Broadcast(
+            kind=kind,
+            text=text,
+            personalized=personalized,
+            status="running",
+            total=await self.user_repo.count(RECIPIENTS),
+            created_by=created_by,
+            report_chat_id=report_chat_id,
+            report_locale=report_locale,
+            owner=self.owner,
+            lease_until=datetime.now() + timedelta(seconds=settings.BROADCAST_LEASE_SECONDS)
+        )
+        run = _BroadcastRun(broadcast)
+        if report_chat_id is not None:
+            _ = i18n_manager.translator(report_locale)
+            message = await self.bot.send_message(report_chat_id, self._progress_text(run, _), reply_markup=get_broadcast_progress_kb(_, broadcast.id))
+            broadcast.report_message_id = message.message_id
+        await self.broadcast_repo.create_broadcast(broadcast)
+        logger.info(f"Starting {kind} {broadcast.id} to {broadcast.total} users.")
+        self._spawn(run)
+        return broadcast
+
+    async def cancel(self, broadcast_id: str) -> bool:
+        """Stops a running broadcast, wherever it runs: the process sending it notices at its next checkpoint."""
+        if not await self.broadcast_repo.cancel(broadcast_id):
+            return False
+        run = self._runs.get(broadcast_id)
+        if run is not None:
+            run.stopping = True # Sent here: no need to wait for the checkpoint
+        return True
+
+    async def resume_abandoned(self) -> int:
+        """Takes over every running broadcast whose lease has lapsed. Returns how many were resumed."""
+        resumed = 0
+        while (broadcast := await self.broadcast_repo.claim_abandoned(self.owner, settings.BROADCAST_LEASE_SECONDS)) is not None:
+            if broadcast.id in self._runs:
+                continue # Ours already; its lease only lapsed because a checkpoint was late
+            logger.info(f"Resuming {broadcast.kind} {broadcast.id} after user {broadcast.last_user_id} ({broadcast.sent + broadcast.blocked + broadcast.failed}/{broadcast.total} done).")
+            self._spawn(_BroadcastRun(broadcast))
+            resumed += 1
+        return resumed
+
+    async def _watch(self) -> None:
+        while True:
+            try:
+                await self.resume_abandoned()
+            except Exception as e:
+                logger.error(f"Looking for abandoned broadcasts failed: {e}")
+            await asyncio.sleep(settings.BROADCAST_RESUME_INTERVAL_SECONDS)
+
+    def start_watchdog(self) -> None:
+        if self._watchdog is None:
+            self._watchdog = asyncio.create_task(self._watch())
+
+    async def stop(self) -> None:
+        """Shutdown: lets in-flight sends finish and releases every broadcast at its last handled recipient."""
+        if self._watchdog is not None:
+            self._watchdog.cancel()
+            self._watchdog = None
+        runs = list(self._runs.values())
+        for run in runs:
+            run.shutdown = run.stopping = True
+        await asyncio.gather(*(run.task for run in runs), return_exceptions=True)
+
+    def _spawn(self, run: _BroadcastRun) -> None:
+        self._runs[run.broadcast.id] = run
+        run.task = asyncio.create_task(self._run(run))
+
+    async def _run(self, run: _BroadcastRun) -> None:
+        broadcast = run.broadcast
+        lane = OutboundLane.SCHEDULED if broadcast.kind == "mailing" else OutboundLane.BROADCAST
+        monitor = asyncio.create_task(self._monitor(run))
+        status = "completed"
+        try:
+            with outbound_lane(lane), send_feedback(self.pacing): # Workers inherit both: interactive replies overtake them
+                await self._send_all(run)
+        except Exception as e:
+            logger.exception(f"Broadcast {broadcast.id} failed: {e}")
+            status = "failed"
+        finally:
+            monitor.cancel()
+            self._runs.pop(broadcast.id, None)
+
+        if run.shutdown:
+            await self.broadcast_repo.release(broadcast.id, self.owner, run.progress())
+            logger.info(f"Broadcast {broadcast.id} released at user {run.last_user_id} for another process to resume.")
+            return
+        if run.lease_lost:
+            logger.warning(f"Broadcast {broadcast.id} was taken over by another process, stopped sending here.")
+            return
+        if run.stopping:
+            status = "cancelled"
+        if not await self.broadcast_repo.finish(broadcast.id, self.owner, status, run.progress(final=True)):
+            if status != "completed":
+                return # No longer ours
+            status = "cancelled" # Stopped while the last sends went out
+            if not await self.broadcast_repo.finish(broadcast.id, self.owner, status, run.progress(final=True)):
+                return
+        logger.info(f"Broadcast {broadcast.id} {status}: sent to {run.sent}/{broadcast.total} users "
+                    f"(blocked: {run.blocked}, failed: {run.failed}).")
+        await self._report(run, final_status=status)
+
+    async def _send_all(self, run: _BroadcastRun) -> None:
+        broadcast = run.broadcast
+        queue: asyncio.Queue = asyncio.Queue(maxsize=settings.BROADCAST_CONCURRENCY * 2)
+        workers = [asyncio.create_task(self._worker(run, queue)) for _ in range(settings.BROADCAST_CONCURRENCY)]
+        try:
+            query: Dict[str, Any] = dict(RECIPIENTS)
+            if broadcast.last_user_id is not None:
+                query["_id"] = {"$gt": broadcast.last_user_id} # Resume after the checkpoint
+            projection = {"_id": 1, "first_name": 1, "username": 1, "channels": 1} if broadcast.personalized else {"_id": 1}
+            users = self.user_repo.iter_many(query, batch_size=settings.BROADCAST_BATCH_SIZE, projection=projection, sort=[("_id", 1)])
+            async for user in users:
+                if run.stopping:
+                    break
+                run.queued(user.id)
+                await queue.put(user)
+        finally:
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+
+    async def _worker(self, run: _BroadcastRun, queue: asyncio.Queue) -> None:
+        while (user := await queue.get()) is not None:
+            if run.stopping: # Drain: unsent recipients stay after the checkpoint
+                continue
+            try:
+                async with self.pacing.slot():
+                    outcome = await self._send(run.broadcast, user)
+            except Exception as e: # A dead worker would leave _send_all blocked on the full queue
+                logger.error(f"Broadcast {run.broadcast.id} to user {user.id} failed: {e}")
+                outcome = "failed"
+            run.done(user.id, outcome)
+
+    async def _send(self, broadcast: Broadcast, user: User) -> str:
+        """Sends to one user; returns which counter it goes to."""
+        try:
+            text = broadcast.text
+            if broadcast.personalized: # A stray brace in the admin's text fails here, counted like any failed send
+                text = text.format(
+                    user_name=html.escape(user.first_name or user.username or "there"),
+                    channel_name=html.escape(user.channels[0].title if user.channels else "your channel")
+                )
+            await self.bot.send_message(user.id, text)
+            return "sent"
+        except TelegramForbiddenError:
+            return "blocked" # Blocked the bot or deactivated
+        except TelegramBadRequest as e:
+            if "chat not found" in e.message.lower():
+                return "blocked"
+            logger.warning(f"Failed to send broadcast {broadcast.id} to user {user.id}: {e}")
+            return "failed"
+        except Exception as e:
+            logger.warning(f"Failed to send broadcast {broadcast.id} to user {user.id}: {e}")
+            return "failed"
+
+    async def _monitor(self, run: _BroadcastRun) -> None:
+        """Checkpoints progress (and extends the lease) and refreshes the progress message, until cancelled."""
+        broadcast = run.broadcast
+        last_report = time.monotonic()
+        while True:
+            await asyncio.sleep(settings.BROADCAST_CHECKPOINT_SECONDS)
+            try:
+                if not await self.broadcast_repo.checkpoint(broadcast.id, self.owner, run.progress(), settings.BROADCAST_LEASE_SECONDS):
+                    current = await self.broadcast_repo.get_broadcast(broadcast.id)
+                    run.lease_lost = current is not None and current.owner != self.owner
+                    run.stopping = True
+                    return
+            except Exception as e:
+                logger.error(f"Checkpoint of broadcast {broadcast.id} failed: {e}") # The lease has some slack; try again next time
+            if time.monotonic() - last_report >= settings.BROADCAST_PROGRESS_SECONDS:
+                last_report = time.monotonic()
+                await self._report(run)
+
+    def _progress_text(self, run: _BroadcastRun, _: Any) -> str:
+        broadcast = run.broadcast
+        done = run.handled
+        total = max(broadcast.total, done) # Users who joined since it started
+        rate = run.rate()
+        return _("admin_panel.broadcast_progress",
+                 id=broadcast.id, done=done, total=total, percent=done * 100 / total if total else 100.0,
+                 sent=run.sent, blocked=run.blocked, failed=run.failed,
+                 rate=rate, limit=self.pacing.rate, eta=_format_duration((total - done) / rate) if rate > 0 else "—")
+
+    async def _report(self, run: _BroadcastRun, final_status: Optional[str] = None) -> None:
+        """Edits the progress message: live numbers while running, the summary once `final_status` is known."""
+        broadcast = run.broadcast
+        if broadcast.report_chat_id is None or broadcast.report_message_id is None:
+            return
+        _ = i18n_manager.translator(broadcast.report_locale)
+        reply_markup = None
+        if final_status is None:
+            text = self._progress_text(run, _)
+            reply_markup = get_broadcast_progress_kb(_, broadcast.id)
+        else:
+            key = "admin_panel.broadcast_finished" if final_status == "completed" else "admin_panel.broadcast_stopped"
+            text = _(key, id=broadcast.id, duration=_format_duration((datetime.now() - broadcast.created_at).total_seconds()),
+                     sent=run.sent, total=max(broadcast.total, run.handled), blocked=run.blocked, failed=run.failed)
+        try:
+            with outbound_lane(OutboundLane.INTERACTIVE): # The admin is watching it; not queued behind the broadcast itself
+                await self.bot.edit_message_text(text, chat_id=broadcast.report_chat_id, message_id=broadcast.report_message_id, reply_markup=reply_markup)
+        except TelegramBadRequest as e:
+            if "message is not modified" not in e.message:
+                logger.warning(f"Could not update progress of broadcast {broadcast.id}: {e}")
+        except Exception as e:
+            logger.warning(f"Could not update progress of broadcast {broadcast.id}: {e}")
+
+    def running(self) -> List[Broadcast]:
+        return [run.broadcast for run in self._runs.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.pacing.stats(), "running": len(self._runs)}
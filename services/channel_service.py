@@ -91,7 +91,7 @@ class ChannelService:
                 subscribers_count=subscribers_count # Use directly from chat object
             )
 
-            success = await self.user_repo.add_channel_to_user(user, new_channel)
+            success = await self.user_repo.add_channel_to_user(user.id, new_channel)
             if success:
                 logger.info(f"User {user.id} added channel {new_channel.title} ({new_channel.id}).")
                 return new_channel, "success", None
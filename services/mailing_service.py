@@ -1,11 +1,11 @@
 # services/mailing_service.py
-import asyncio
 from datetime import datetime, time, timedelta
 import random
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from aiogram import Bot
+from database.models import Broadcast
 from database.repositories import UserRepository
-from utils.misc import safe_send_message # Custom helper for robust sending
+from services.broadcast_service import BroadcastService
 import logging
 
 logger = logging.getLogger(__name__)
@@ -39,61 +39,28 @@ MAILING_TEMPLATES = {
 }
 
 class MailingService:
-    def __init__(self, bot: Bot, user_repo: UserRepository):
+    def __init__(self, bot: Bot, user_repo: UserRepository, broadcast_service: BroadcastService):
         self.bot = bot
         self.user_repo = user_repo
+        self.broadcast_service = broadcast_service
 
-    async def send_random_mailing(self, template_type: str):
-        """Sends a random message from a given template type to all active users."""
+    async def send_random_mailing(self, template_type: str) -> Optional[Broadcast]:
+        """Starts sending a random message from a given template type to all active users."""
         if template_type not in MAILING_TEMPLATES:
             logger.warning(f"Unknown mailing template type: {template_type}")
-            return
+            return None
 
         template_messages = MAILING_TEMPLATES[template_type]
         if not template_messages:
             logger.warning(f"No messages found for template type: {template_type}")
-            return
+            return None
 
         message_text = random.choice(template_messages)
-        users = await self.user_repo.get_many({"is_banned": False}, limit=0) 
+        logger.info(f"Starting mailing '{template_type}'.")
+        # Placeholders ({user_name}, {channel_name}) are filled in per recipient by the broadcast engine
+        return await self.broadcast_service.start(message_text, kind="mailing", personalized=True)
 
-        sent_count = 0
-        total_users = len(users)
-        logger.info(f"Starting mailing '{template_type}' to {total_users} users.")
-
-        for user_item in users:
-            # Personalize message if placeholders are present
-            first_channel_name = user_item.channels[0].title if user_item.channels else "your channel"
-            final_message = message_text.format(
-                user_name=user_item.first_name or user_item.username or "there",
-                channel_name=first_channel_name
-            )
-
-            try:
-                await safe_send_message(self.bot, user_item.id, final_message)
-                sent_count += 1
-                await asyncio.sleep(0.05) # Small delay to avoid hitting Telegram API limits
-            except Exception as e:
-                # safe_send_message will handle TelegramBadRequest, other exceptions re-raised or logged
-                logger.warning(f"Failed to send mailing to user {user_item.id}: {e}")
-            
-        logger.info(f"Finished mailing '{template_type}'. Sent to {sent_count}/{total_users} users.")
-        return sent_count, total_users
-
-    async def send_broadcast(self, text: str):
-        """Sends a broadcast message to all non-banned users."""
-        users = await self.user_repo.get_many({"is_banned": False}, limit=0)
-        sent_count = 0
-        total_users = len(users)
-        logger.info(f"Starting broadcast to {total_users} users.")
-
-        for user_item in users:
-            try:
-                await safe_send_message(self.bot, user_item.id, text)
-                sent_count += 1
-                await asyncio.sleep(0.05)
-            except Exception as e:
-                logger.warning(f"Failed to send broadcast to user {user_item.id}: {e}")
-        
-        logger.info(f"Finished broadcast. Sent to {sent_count}/{total_users} users.")
-        return sent_count, total_users
\ No newline at end of file
+    async def send_broadcast(self, text: str, created_by: Optional[int] = None, report_chat_id: Optional[int] = None,
+                             report_locale: Optional[str] = None) -> Broadcast:
+        """Starts sending a broadcast message to all non-banned users; progress is reported to `report_chat_id`."""
+        return await self.broadcast_service.start(text, created_by=created_by, report_chat_id=report_chat_id, report_locale=report_locale)
@@ -1,16 +1,19 @@
 # services/order_service.py
 from datetime import datetime
-from typing import Optional, List
+from typing import Optional
 from database.models import User, Channel, Order
 from database.repositories import OrderRepository, UserRepository
+from database.pagination import Page, PageCursor
+from pymongo.errors import DuplicateKeyError
 import logging
 
 logger = logging.getLogger(__name__)
 
 class OrderService:
-    def __init__(self, order_repo: OrderRepository, user_repo: UserRepository):
+    def __init__(self, order_repo: OrderRepository, user_repo: UserRepository, use_transactions: bool = True):
         self.order_repo = order_repo
         self.user_repo = user_repo
+        self.use_transactions = use_transactions # False on a standalone MongoDB (MongoDB.supports_transactions)
 
     async def create_boost_order(self, user: User, channel: Channel, order_type: str, requested_subscribers: int) -> Optional[Order]:
         cost_per_subscriber = 1 # Normal mode
@@ -19,19 +22,6 @@ class OrderService:
 
         total_cost = requested_subscribers * cost_per_subscriber
 
-        if user.balance < total_cost:
-            return None # Insufficient funds (handled outside)
-
-        # Deduct balance first to avoid race conditions with order creation
-        # Important: Pass the user object to deduct_user_balance so its in-memory balance updates
-        if not await self.user_repo.increment_balance(user.id, -total_cost):
-            logger.error(f"Failed to deduct balance for user {user.id} for order.")
-            return None
-
-        # Update user's in-memory object (balance)
-        user.balance -= total_cost
-
-
         new_order = Order(
             user_id=user.id,
             channel_id=channel.id,
@@ -40,27 +30,71 @@ class OrderService:
             cost_credits=total_cost,
             status="pending"
         )
-        created_order = await self.order_repo.create_order(new_order)
-        if created_order:
-            logger.info(f"Order {created_order.id} created for user {user.id} on channel {channel.id}. Cost: {total_cost}")
-            # Also update user's order history (list of order IDs)
-            user_update_success = await self.user_repo.update({"_id": user.id}, {"$push": {"order_history_ids": created_order.id}})
-            if not user_update_success:
-                logger.warning(f"Failed to append order ID {created_order.id} to user {user.id}'s history.")
-            return created_order
-        else:
-            # If order creation fails, try to refund user (important!)
-            await self.user_repo.increment_balance(user.id, total_cost)
-            # Rollback user's in-memory balance
-            user.balance += total_cost
-            logger.error(f"Failed to record order in DB for user {user.id}. Funds refunded.")
+
+        async def debit_and_insert(session) -> Optional[int]:
+            # Conditional debit: the balance >= cost filter makes concurrent confirms unable to overdraw.
+            # The order insert commits or aborts together with it.
+            balance_view = await self.user_repo.debit_balance(user.id, total_cost, session=session)
+            if balance_view is None:
+                return None # Insufficient funds (handled outside); nothing was written
+            await self.order_repo.create_order(new_order, session=session)
+            return balance_view.balance
+
+        async def refund(reason: Exception) -> None:
+            await self.user_repo.increment_balance(user.id, total_cost) # Compensating refund
+            logger.warning(f"Order {new_order.id} of user {user.id} was not inserted ({reason!r}): refunded {total_cost} credits.")
+
+        async def debit_then_insert() -> Optional[int]:
+            # No transactions: the debit alone is still atomic and can't overdraw. A failed insert is refunded, but only
+            # once the order is known not to exist: a timeout or network error may come after the write was applied
+            balance_view = await self.user_repo.debit_balance(user.id, total_cost)
+            if balance_view is None:
+                return None
+            try:
+                if await self.order_repo.create_order(new_order) is not None:
+                    return balance_view.balance
+                failure: Exception = RuntimeError("order insert not acknowledged")
+            except DuplicateKeyError as e: # Definitely not written
+                await refund(e)
+                raise
+            except Exception as e:
+                failure = e
+            try:
+                applied = await self.order_repo.order_exists(new_order.id)
+            except Exception as e:
+                logger.error(f"Order {new_order.id} of user {user.id}: insert outcome unknown ({failure!r}) and the check failed ({e!r}). "
+                             f"{total_cost} credits stay debited until reconciled.")
+                raise failure
+            if applied:
+                logger.warning(f"Order {new_order.id} of user {user.id} was inserted despite {failure!r}; keeping it.")
+                return balance_view.balance
+            await refund(failure)
+            raise failure
+
+        try:
+            if self.use_transactions:
+                async with await self.order_repo.start_session() as session:
+                    new_balance = await session.with_transaction(debit_and_insert)
+            else:
+                new_balance = await debit_then_insert()
+        except Exception as e:
+            logger.error(f"Failed to create order for user {user.id}: {e}. Order not created.", exc_info=True)
             return None
 
-    async def get_active_orders(self, user_id: int) -> List[Order]:
-        return await self.order_repo.get_user_orders(user_id, status_filter="running")
+        self.user_repo.invalidate_user(user.id) # A read racing the commit may have cached the pre-debit balance
+        if new_balance is None:
+            logger.info(f"User {user.id} has insufficient funds for order costing {total_cost}.")
+            return None
 
-    async def get_order_history(self, user_id: int) -> List[Order]:
-        return await self.order_repo.get_user_orders(user_id, status_filter="completed")
+        user.balance = new_balance # Keep the in-memory user in sync with the committed balance
+        logger.info(f"Order {new_order.id} created for user {user.id} on channel {channel.id}. Cost: {total_cost}")
+        return new_order
+
+    async def get_active_orders_page(self, user_id: int, cursor: Optional[PageCursor] = None, backward: bool = False) -> Page[Order]:
+        return await self.order_repo.get_user_orders_page(user_id, "running", cursor, backward)
+
+    async def get_order_history_page(self, user_id: int, cursor: Optional[PageCursor] = None, backward: bool = False) -> Page[Order]:
+        return await self.order_repo.get_user_orders_page(user_id, "completed", cursor, backward)
     
     # In a real system, you'd have methods here to interact with the actual boosting mechanism
     # e.g., send_order_to_booster_system(order_id), receive_booster_update(order_id, fulfilled, errors)
@@ -72,7 +106,7 @@ import httpx
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any, List
 from database.models import User, Transaction
-from database.repositories import UserRepository, TransactionRepository
+from database.repositories import UserRepository, TransactionRepository, DailyFinancialsRepository
 from config.settings import settings
 import logging
 import hashlib
@@ -81,9 +115,10 @@ import uuid # For unique transaction ID
 logger = logging.getLogger(__name__)
 
 class PaymentService:
-    def __init__(self, user_repo: UserRepository, transaction_repo: TransactionRepository):
+    def __init__(self, user_repo: UserRepository, transaction_repo: TransactionRepository, daily_financials_repo: Optional[DailyFinancialsRepository] = None):
         self.user_repo = user_repo
         self.transaction_repo = transaction_repo
+        self.daily_financials_repo = daily_financials_repo # Per-day revenue rollups read by the admin financial report
         self.CRYPTOMUS_API_BASE_URL = "https://api.cryptomus.com/v1"
         self.HEADERS = {
             "Content-Type": "application/json",
@@ -311,6 +346,13 @@ class PaymentService:
         success = await self.user_repo.increment_balance(user.id, transaction.amount_credits)
         if not success:
             return False
+
+        if self.daily_financials_repo:
+            try:
+                await self.daily_financials_repo.record_payment(transaction.amount_usd, transaction.amount_credits)
+            except Exception as e:
+                # The user is already credited; a missed rollup is fixed by rebuilding from transactions
+                logger.error(f"Failed to update daily financials for transaction {transaction.id}: {e}", exc_info=True)
         
         # Handle referral bonuses
         if user.referrer_id:
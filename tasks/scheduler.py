@@ -72,13 +72,16 @@ async def check_pending_payments(payment_service: PaymentService):
     transaction_repo = TransactionRepository(mongo_db.db)
     
     # Get pending transactions that are not past their expiration
-    pending_transactions = await transaction_repo.get_many(
+    # Streamed: the batch in memory stays small however many invoices are open
+    pending_transactions = transaction_repo.iter_many(
         {"status": "pending", "expires_at": {"$gt": datetime.now()}},
-        limit=0
+        batch_size=100
     )
 
+    pending_count = 0
     checked_count = 0
-    for tx in pending_transactions:
+    async for tx in pending_transactions:
+        pending_count += 1
         try:
             # Cryptomus check_status already updates DB and returns status
             updated_tx = await payment_service.check_cryptomus_payment_status(tx.cryptomus_uuid)
@@ -90,7 +93,7 @@ async def check_pending_payments(payment_service: PaymentService):
                  checked_count += 1
         except Exception as e:
             logger.error(f"Error checking status for transaction {tx.id}: {e}", exc_info=True)
-    logger.info(f"Finished checking {len(pending_transactions)} pending payments. {checked_count} updated.")
+    logger.info(f"Finished checking {pending_count} pending payments. {checked_count} updated.")
 
 2.24 handlers/__init__.py
 # handlers/__init__.py
@@ -0,0 +1,69 @@
+# tests/test_broadcast.py
+import asyncio
+
+from aiogram import Bot
+
+from database.memory import MemoryClient
+from database.models import Broadcast, User
+from database.repositories import BroadcastRepository, UserRepository
+from services.broadcast_service import BroadcastService, _BroadcastRun
+
+def _broadcast(**fields) -> Broadcast:
+    return Broadcast(**{"kind": "broadcast", "text": "Hello", "status": "running", **fields})
+
+def test_checkpoint_only_covers_contiguous_recipients():
+    """Out-of-order completions move last_user_id only past recipients whose lower _ids are all handled."""
+    run = _BroadcastRun(_broadcast(total=5))
+    for user_id in (1, 2, 3, 4, 5):
+        run.queued(user_id)
+
+    run.done(1, "sent")
+    run.done(3, "sent")
+    run.done(4, "blocked")
+    assert run.progress() == {"sent": 1, "blocked": 0, "failed": 0, "last_user_id": 1}
+    assert (run.sent, run.blocked, run.failed) == (2, 1, 0) # Live counters include 3 and 4
+
+    run.done(2, "failed")
+    assert run.progress() == {"sent": 2, "blocked": 1, "failed": 1, "last_user_id": 4}
+
+    run.done(5, "sent")
+    assert run.progress() == run.progress(final=True) == {"sent": 3, "blocked": 1, "failed": 1, "last_user_id": 5}
+
+def test_resume_from_checkpoint_counts_each_recipient_once():
+    """Recipients handled past the checkpoint are sent again on resume and counted only then."""
+    run = _BroadcastRun(_broadcast(total=5))
+    for user_id in (1, 2, 3, 4, 5):
+        run.queued(user_id)
+    run.done(1, "sent")
+    run.done(3, "sent")
+    run.done(4, "blocked")
+
+    resumed = _BroadcastRun(_broadcast(total=5, **run.progress())) # What another process claims
+    assert resumed.last_user_id == 1
+    for user_id in (2, 3, 4, 5):
+        resumed.queued(user_id)
+    for user_id in (5, 2, 4, 3):
+        resumed.done(user_id, "sent")
+    final = resumed.progress(final=True)
+    assert final["last_user_id"] == 5
+    assert final["sent"] + final["blocked"] + final["failed"] == 5
+
+def test_bad_template_fails_sends_instead_of_hanging():
+    """A personalized text that doesn't format counts every recipient as failed; the broadcast still finishes."""
+    async def run():
+        db = MemoryClient()["test"]
+        user_repo = UserRepository(db)
+        for user_id in range(1, 31):
+            await user_repo.create_user(User(_id=user_id, first_name="Test"))
+        bot = Bot(token="42:TEST")
+        try:
+            service = BroadcastService(bot, user_repo, BroadcastRepository(db))
+            broadcast_run = _BroadcastRun(_broadcast(text="Hi {user_name}, {oops", personalized=True, total=30))
+            await asyncio.wait_for(service._send_all(broadcast_run), timeout=5)
+        finally:
+            await bot.session.close()
+        return broadcast_run
+
+    broadcast_run = asyncio.run(run())
+    assert (broadcast_run.sent, broadcast_run.blocked, broadcast_run.failed) == (0, 0, 30)
+    assert broadcast_run.progress()["last_user_id"] == 30
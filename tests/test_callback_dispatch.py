@@ -0,0 +1,76 @@
+# tests/test_callback_dispatch.py
+import asyncio
+from typing import List, Optional
+
+from aiogram import Bot
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import StorageKey
+
+import utils.dispatch
+from benchmarks.bench_callback_dispatch import QUERIES, build_dispatcher, _update
+from utils.callbacks import (
+    LanguageCallback, ChannelCallback, BoostOrderCallback, PromocodeCallback, AdminCallback, AdminReportCallback, PageCallback
+)
+from utils.dispatch import CallbackDispatchTable
+from utils.states import Form
+
+# The handlers package can't be imported on its own (it pulls in the whole bot), so the router tree is
+# the benchmark's mirror of handlers/: same CallbackData classes, rules, FSM states and include order
+QUERIES = QUERIES + [
+    LanguageCallback(lang_code="en").pack(),
+    ChannelCallback(action="select", channel_id=-1001).pack(),
+    BoostOrderCallback(action="type_select", order_type="normal").pack(),
+    BoostOrderCallback(action="cancel").pack(),
+    PromocodeCallback(action="input").pack(),
+    AdminCallback(action="cancel_broadcast").pack(),
+    AdminReportCallback(action="financial").pack(),
+    AdminReportCallback(action="menu").pack(),
+    PageCallback(listing="topups", backward=True, ts=1718000000000, item_id="!" + "0" * 24).pack(),
+    PageCallback(listing="unknown", ts=1, item_id="x").pack(),
+]
+STATES: List[Optional[State]] = [
+    None, Form.lang_selection, Form.boosting_choose_type, Form.boosting_choose_channel,
+    Form.boosting_confirm_order, Form.admin_broadcast,
+]
+
+def _route_all(indexed: bool) -> List[str]:
+    """Handler picked for every query in every FSM state ("-" when unhandled)."""
+    calls: List[str] = []
+
+    async def run():
+        bot = Bot(token="42:TEST")
+        dp = build_dispatcher(indexed, calls)
+        key = StorageKey(bot_id=bot.id, chat_id=42, user_id=42)
+        try:
+            update_id = 0
+            for state in STATES:
+                await dp.storage.set_state(key, state)
+                for data in QUERIES:
+                    update_id += 1
+                    before = len(calls)
+                    await dp.feed_update(bot, _update(update_id, data, bot))
+                    if len(calls) == before:
+                        calls.append("-")
+        finally:
+            await bot.session.close()
+
+    asyncio.run(run())
+    return calls
+
+def test_table_routes_like_aiogram():
+    """Every query, in every state, reaches the handler aiogram's router scan picks."""
+    scan = _route_all(indexed=False)
+    assert len(scan) == len(QUERIES) * len(STATES)
+    assert set(scan) != {"-"}
+    assert _route_all(indexed=True) == scan
+
+def test_table_disables_itself_on_unknown_internals(monkeypatch):
+    """A magic-filter whose rules no longer look as expected turns the table off; aiogram routes instead."""
+    def changed(rule):
+        raise AttributeError("'MagicFilter' object has no attribute '_operations'")
+
+    monkeypatch.setattr(utils.dispatch, "_indexable_rule", changed)
+    calls: List[str] = []
+    table = CallbackDispatchTable(build_dispatcher(False, calls))
+    assert not table.enabled
+    assert _route_all(indexed=True) == _route_all(indexed=False)
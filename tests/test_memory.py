@@ -0,0 +1,177 @@
+# tests/test_memory.py
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
+
+from database.memory import MemoryClient, matches, sort_documents
+from database.migrations import ensure_indexes
+from database.models import Order, Transaction, User
+from database.repositories import OrderRepository, TransactionRepository, UserRepository
+
+def _db():
+    return MemoryClient()["test"]
+
+def test_cross_type_ordering():
+    """Mixed types sort in BSON order: null < numbers < strings < objects < arrays < ObjectId < bool < date."""
+    oid = ObjectId()
+    when = datetime(2024, 1, 1)
+    docs = [{"v": when}, {"v": True}, {"v": oid}, {"v": [1]}, {"v": {"a": 1}}, {"v": "a"}, {"v": 2.5}, {"v": 1}, {"v": None}, {}]
+    ordered = [d.get("v", "missing") for d in sort_documents(docs, [("v", 1)])]
+    assert ordered[:2] in ([None, "missing"], ["missing", None]) # A missing field sorts as null
+    assert ordered[2:] == [1, 2.5, "a", {"a": 1}, [1], oid, True, when]
+    assert [d.get("v") for d in sort_documents(docs, [("v", -1)])][0] == when
+
+def test_null_matches_missing():
+    """{f: None} matches both null and missing fields; $exists tells them apart."""
+    null, missing = {"_id": 1, "f": None}, {"_id": 2}
+    assert matches(null, {"f": None}) and matches(missing, {"f": None})
+    assert matches(null, {"f": {"$exists": True}})
+    assert not matches(missing, {"f": {"$exists": True}})
+    assert not matches(null, {"f": {"$ne": None}}) and not matches(missing, {"f": {"$ne": None}})
+
+def test_array_fan_out():
+    """A dotted path through an array matches if any element matches."""
+    user = {"_id": 1, "channels": [{"id": 10, "title": "a"}, {"id": 20, "title": "b"}], "tags": ["x", "y"]}
+    assert matches(user, {"channels.id": 20})
+    assert not matches(user, {"channels.id": 30})
+    assert matches(user, {"channels.id": {"$gt": 15}})
+    assert matches(user, {"tags": "y"})
+
+def test_upsert_seeds_from_equality_filter():
+    """An upsert starts from the filter's equality fields; $setOnInsert applies only on insert."""
+    async def run():
+        coll = _db()["stats"]
+        await coll.update_one({"_id": "2024-01-01", "kind": {"$eq": "day"}, "n": {"$gt": 0}},
+                              {"$inc": {"n": 1}, "$setOnInsert": {"created": 1}}, upsert=True)
+        first = await coll.find_one({"_id": "2024-01-01"})
+        await coll.update_one({"_id": "2024-01-01"}, {"$inc": {"n": 1}, "$setOnInsert": {"created": 2}}, upsert=True)
+        return first, await coll.find_one({"_id": "2024-01-01"})
+
+    first, second = asyncio.run(run())
+    assert first == {"_id": "2024-01-01", "kind": "day", "n": 1, "created": 1}
+    assert second == {"_id": "2024-01-01", "kind": "day", "n": 2, "created": 1}
+
+def test_aggregate_merge():
+    """$merge inserts unmatched documents and merges fields into matched ones."""
+    async def run():
+        db = _db()
+        await db["payments"].insert_many([{"day": "d1", "usd": 1.0}, {"day": "d1", "usd": 2.0}, {"day": "d2", "usd": 5.0}])
+        await db["totals"].insert_one({"_id": "d1", "usd": 0.0, "note": "kept"})
+        await db["payments"].aggregate([
+            {"$group": {"_id": "$day", "usd": {"$sum": "$usd"}}},
+            {"$merge": {"into": "totals", "whenMatched": "merge", "whenNotMatched": "insert"}},
+        ]).to_list(length=None)
+        return await db["totals"].find({}, sort=[("_id", 1)]).to_list(length=None)
+
+    assert asyncio.run(run()) == [{"_id": "d1", "usd": 3.0, "note": "kept"}, {"_id": "d2", "usd": 5.0}]
+
+def test_with_transaction_undoes_writes_on_error():
+    """Inserts, updates and deletes made with the session are rolled back; other writes stay."""
+    async def run():
+        db = _db()
+        coll = db["accounts"]
+        await coll.insert_many([{"_id": 1, "balance": 100}, {"_id": 2, "balance": 5}])
+
+        async def callback(session):
+            await coll.update_one({"_id": 1}, {"$inc": {"balance": -50}}, session=session)
+            await coll.update_one({"_id": 1}, {"$inc": {"balance": -10}}, session=session)
+            await coll.delete_one({"_id": 2}, session=session)
+            await coll.insert_one({"_id": 3, "balance": 60}, session=session)
+            await coll.insert_one({"_id": 4, "balance": 0}) # Outside the transaction
+            raise RuntimeError("abort")
+
+        async with await db.client.start_session() as session:
+            with pytest.raises(RuntimeError):
+                await session.with_transaction(callback)
+        return await coll.find({}, sort=[("_id", 1)]).to_list(length=None)
+
+    assert asyncio.run(run()) == [{"_id": 1, "balance": 100}, {"_id": 2, "balance": 5}, {"_id": 4, "balance": 0}]
+
+def test_keyset_pages_newest_first():
+    """get_page walks (created_at, _id) newest first both ways, across string and ObjectId _ids and equal timestamps."""
+    async def run():
+        db = _db()
+        repo = OrderRepository(db)
+        base = datetime(2024, 1, 1)
+        docs = []
+        for i in range(7):
+            order = Order(user_id=1, channel_id=1, order_type="normal", requested_subscribers=1,
+                          status="pending", cost_credits=1, created_at=base + timedelta(minutes=i // 2))
+            doc = order.model_dump(by_alias=True)
+            if i % 3 == 0:
+                doc["_id"] = ObjectId() # Inserted before ids were generated
+            docs.append(doc)
+        await db["orders"].insert_many([dict(d) for d in docs])
+        expected = [d["_id"] for d in sort_documents(docs, [("created_at", -1), ("_id", -1)])]
+
+        pages = [await repo.get_user_orders_page(1, page_size=3)]
+        while pages[-1].has_next:
+            pages.append(await repo.get_user_orders_page(1, cursor=pages[-1].next_cursor, page_size=3))
+        back = await repo.get_user_orders_page(1, cursor=pages[-1].prev_cursor, backward=True, page_size=3)
+        return expected, pages, back
+
+    expected, pages, back = asyncio.run(run())
+    assert [len(p.items) for p in pages] == [3, 3, 1]
+    assert [o.id for p in pages for o in p.items] == expected
+    assert [(p.has_prev, p.has_next) for p in pages] == [(False, True), (True, True), (True, False)]
+    assert [o.id for o in back.items] == [o.id for o in pages[1].items]
+    assert back.has_next and back.has_prev
+
+def test_debit_balance_is_conditional():
+    """debit_balance deducts only when the balance covers the amount."""
+    async def run():
+        repo = UserRepository(_db())
+        await repo.create_user(User(_id=1, balance=100))
+        ok = await repo.debit_balance(1, 70)
+        refused = await repo.debit_balance(1, 70)
+        missing = await repo.debit_balance(2, 1)
+        return ok, refused, missing, await repo.get_user_by_id(1)
+
+    ok, refused, missing, user = asyncio.run(run())
+    assert ok.balance == 30
+    assert refused is None and missing is None
+    assert user.balance == 30
+
+def test_unique_index_rejects_duplicates():
+    """Unique indexes created by ensure_indexes raise DuplicateKeyError, as does a duplicate _id."""
+    async def run():
+        db = _db()
+        await ensure_indexes(db)
+        repo = TransactionRepository(db)
+        tx = dict(user_id=1, amount_usd=1.0, amount_credits=10, status="pending", expires_at=datetime(2024, 1, 1))
+        first = await repo.create_transaction(Transaction(cryptomus_uuid="u1", **tx))
+        with pytest.raises(DuplicateKeyError):
+            await repo.create_transaction(Transaction(cryptomus_uuid="u1", **tx))
+        with pytest.raises(DuplicateKeyError):
+            await repo.create_transaction(first)
+        await repo.create_transaction(Transaction(cryptomus_uuid="u2", **tx))
+        # An update colliding with another document's key is refused too
+        with pytest.raises(DuplicateKeyError):
+            await repo.update_transaction(first.id, {"cryptomus_uuid": "u2"})
+        return await repo.count({})
+
+    assert asyncio.run(run()) == 2
+
+def test_transaction_rollback_restores_unique_index():
+    """A rolled back insert frees its unique key again."""
+    async def run():
+        db = _db()
+        await ensure_indexes(db)
+        repo = TransactionRepository(db)
+        tx = Transaction(user_id=1, amount_usd=1.0, amount_credits=10, cryptomus_uuid="u1", status="pending",
+                         expires_at=datetime(2024, 1, 1))
+
+        async def callback(session):
+            await repo.collection.insert_one(tx.model_dump(by_alias=True), session=session)
+            raise RuntimeError("abort")
+
+        async with await repo.start_session() as session:
+            with pytest.raises(RuntimeError):
+                await session.with_transaction(callback)
+        await repo.create_transaction(tx)
+        return await repo.count({"cryptomus_uuid": "u1"})
+
+    assert asyncio.run(run()) == 1
@@ -0,0 +1,93 @@
+# tests/test_ordered_dispatcher.py
+import asyncio
+import time
+
+from aiogram import Bot, F, Router
+from aiogram.filters import Command
+from aiogram.fsm.context import FSMContext
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.types import Message, Update
+
+from utils.ordered_dispatcher import OrderedDispatcher
+from utils.ordered_executor import OrderedExecutor
+
+class S(StatesGroup):
+    x = State()
+
+def _message_update(bot: Bot, update_id: int, user_id: int, text: str) -> Update:
+    return Update.model_validate({
+        "update_id": update_id,
+        "message": {
+            "message_id": update_id,
+            "date": int(time.time()),
+            "chat": {"id": user_id, "type": "private"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Test"},
+            "text": text,
+        },
+    }, context={"bot": bot})
+
+def test_state_set_by_previous_update_is_seen():
+    """/go sets S.x; the "42" fed right behind it must be matched by the S.x handler, not the stateless one."""
+    handled = []
+    router = Router()
+
+    @router.message(Command("go"))
+    async def go(message: Message, state: FSMContext):
+        await asyncio.sleep(0.05) # The next update is already queued while this one runs
+        await state.set_state(S.x)
+        handled.append("go")
+
+    @router.message(S.x, F.text == "42")
+    async def answer(message: Message, state: FSMContext):
+        await state.clear()
+        handled.append("in_state")
+
+    @router.message()
+    async def fallback(message: Message):
+        handled.append("no_state")
+
+    async def run():
+        bot = Bot(token="42:TEST")
+        executor = OrderedExecutor(max_concurrency=10)
+        dp = OrderedDispatcher(executor, storage=MemoryStorage())
+        dp.include_router(router)
+        try:
+            # Back to back, as the polling loop or the webhook workers feed them
+            await dp.feed_update(bot, _message_update(bot, 1, 1001, "/go"))
+            await dp.feed_update(bot, _message_update(bot, 2, 1001, "42"))
+            assert await executor.join(timeout=5)
+        finally:
+            await bot.session.close()
+
+    asyncio.run(run())
+    assert handled == ["go", "in_state"]
+
+def test_users_are_processed_in_parallel():
+    """A slow update of one user doesn't hold up another user's."""
+    finished = []
+    router = Router()
+
+    @router.message(F.text == "slow")
+    async def slow(message: Message):
+        await asyncio.sleep(0.2)
+        finished.append(message.from_user.id)
+
+    @router.message(F.text == "fast")
+    async def fast(message: Message):
+        finished.append(message.from_user.id)
+
+    async def run():
+        bot = Bot(token="42:TEST")
+        executor = OrderedExecutor(max_concurrency=10)
+        dp = OrderedDispatcher(executor, storage=MemoryStorage())
+        dp.include_router(router)
+        try:
+            await dp.feed_update(bot, _message_update(bot, 1, 1001, "slow"))
+            await dp.feed_update(bot, _message_update(bot, 2, 1002, "fast"))
+            assert await executor.join(timeout=5)
+        finally:
+            await bot.session.close()
+
+    asyncio.run(run())
+    assert finished == [1002, 1001]
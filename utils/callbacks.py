@@ -27,9 +27,16 @@ class PromocodeCallback(CallbackData, prefix="promocode"):
     action: str # "input", "apply"
 
 class AdminCallback(CallbackData, prefix="admin_cmd"):
-    action: str # e.g., "ban", "check", "set_balance", "set_slots", "add_promo", "del_promo", "broadcast"
+    action: str # e.g., "ban", "check", "set_balance", "set_slots", "add_promo", "del_promo", "broadcast", "stop_broadcast"
     user_id: Optional[int] = None # For specific user actions
     promo_name: Optional[str] = None # For promo actions
+    broadcast_id: Optional[str] = None # For "stop_broadcast"
 
 class AdminReportCallback(CallbackData, prefix="admin_report"):
     action: str # "financial", "orders", "topups"
+
+class PageCallback(CallbackData, prefix="page"): # Keep short: packed data must fit Telegram's 64 bytes
+    listing: str # "active", "history" (user); "orders", "topups" (admin)
+    backward: bool = False # True pages towards newer items
+    ts: int # PageCursor.ts of the anchor item
+    item_id: str # PageCursor.packed_id of the anchor item (string id, or "!" + ObjectId hex)
@@ -0,0 +1,82 @@
+# utils/container.py
+import importlib
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+from aiogram import BaseMiddleware, Router
+from aiogram.types import TelegramObject
+
+logger = logging.getLogger(__name__)
+
+class ServiceContainer:
+    """
+    Services by name, each built on first use. A service is registered as "module:Class" plus the names of
+    the services/instances its constructor takes, so neither its module nor its constructor runs until a
+    handler (or a job) actually asks for it: admin-only services stay unbuilt on most workers.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Tuple[str, Tuple[str, ...]]] = {}
+        self._instances: Dict[str, Any] = {}
+        self.build_times: Dict[str, float] = {} # Milliseconds spent importing and constructing each built service
+
+    def add_instance(self, name: str, instance: Any) -> None:
+        self._instances[name] = instance
+
+    def add(self, name: str, target: str, *dependencies: str) -> None:
+        """Registers `name` as target ("package.module:Class") called with the named dependencies, in order."""
+        if ":" not in target:
+            raise ValueError(f"Service target must be 'module:attribute', got '{target}'")
+        self._factories[name] = (target, dependencies)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._instances or name in self._factories
+
+    def names(self) -> Tuple[str, ...]:
+        return tuple({**self._factories, **self._instances})
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is not None or name in self._instances:
+            return instance
+        target, dependencies = self._factories[name]
+        arguments = [self.get(dependency) for dependency in dependencies] # Resolved first, so build_times stay per service
+        start = time.perf_counter()
+        module_name, attribute = target.split(":", 1)
+        instance = getattr(importlib.import_module(module_name), attribute)(*arguments)
+        self.build_times[name] = (time.perf_counter() - start) * 1000
+        self._instances[name] = instance
+        logger.info(f"Service '{name}' built on first use in {self.build_times[name]:.1f}ms")
+        return instance
+
+    def built(self) -> Tuple[str, ...]:
+        return tuple(name for name in self._instances if name in self._factories)
+
+class ServiceResolverMiddleware(BaseMiddleware):
+    """
+    Inner middleware putting into handler data only the services the matched handler declares as parameters,
+    building them on first use. Handlers taking **kwargs get every service, as with workflow data.
+    """
+
+    def __init__(self, container: ServiceContainer):
+        super().__init__()
+        self.container = container
+
+    async def __call__(self,
+                       handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject,
+                       data: Dict[str, Any]) -> Any:
+        handler_object = data.get("handler")
+        if handler_object is not None:
+            names = self.container.names() if handler_object.varkw else handler_object.params
+            for name in names:
+                if name not in data and name in self.container:
+                    data[name] = self.container.get(name)
+        return await handler(event, data)
+
+    def setup(self, router: Router) -> None:
+        """Registers on every event type of `router`; inner middlewares apply to its sub-routers' handlers too."""
+        for event_name, observer in router.observers.items():
+            if event_name != "update": # The update observer's only handler is the dispatcher's own propagation
+                observer.middleware(self)
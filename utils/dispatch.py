@@ -0,0 +1,233 @@
+# utils/dispatch.py
+import logging
+import operator
+from collections import Counter
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple, Type
+
+import yaml
+from aiogram import BaseMiddleware, Router
+from aiogram.dispatcher.event.bases import UNHANDLED, SkipHandler
+from aiogram.dispatcher.event.handler import HandlerObject
+from aiogram.dispatcher.event.telegram import TelegramEventObserver
+from aiogram.filters.callback_data import CallbackData, CallbackQueryFilter
+from aiogram.types import CallbackQuery, TelegramObject
+from magic_filter import MagicFilter
+from magic_filter.operations.comparator import ComparatorOperation
+from magic_filter.operations.function import FunctionOperation
+from magic_filter.operations.getattr import GetAttributeOperation
+from magic_filter.util import in_op
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Private attributes of magic-filter and aiogram the table relies on (see requirements.txt for the tested versions)
+_PRIVATE_API = ((MagicFilter, "_operations"), (TelegramEventObserver, "_resolve_middlewares"))
+
+def _indexable_rule(rule: Optional[MagicFilter]) -> Optional[Tuple[str, List[Any]]]:
+    """(field, values) for rules of the form F.field == value and F.field.in_(values); None for anything else."""
+    if rule is None:
+        return None
+    operations = rule._operations
+    if len(operations) != 2 or not isinstance(operations[0], GetAttributeOperation):
+        return None
+    field, test = operations[0].name, operations[1]
+    if isinstance(test, ComparatorOperation) and test.comparator is operator.eq and not isinstance(test.right, MagicFilter):
+        return field, [test.right]
+    if isinstance(test, FunctionOperation) and test.function is in_op and len(test.args) == 1 and not test.kwargs:
+        values = test.args[0]
+        if isinstance(values, (set, frozenset, list, tuple, dict)):
+            return field, list(values)
+    return None
+
+class _Entry:
+    """One callback_query handler, with what routing it by hand needs."""
+    __slots__ = ("position", "handler", "router", "observer", "chain", "callback_data", "rule", "filters", "key")
+
+    def __init__(self, position: int, handler: HandlerObject, router: Router, chain: List[TelegramEventObserver]):
+        self.position = position # Order in which aiogram would try it: first match wins
+        self.handler = handler
+        self.router = router
+        self.observer = router.callback_query
+        self.chain = chain # Observers from the root down to `router`: their router-level filters apply too
+        self.callback_data: Optional[Type[CallbackData]] = None
+        self.rule: Optional[MagicFilter] = None # Left to check after unpacking (None when the index already proved it)
+        self.filters = list(handler.filters or [])
+        self.key: Optional[Tuple[str, List[Any]]] = None
+        for i, filter_object in enumerate(self.filters):
+            if isinstance(filter_object.callback, CallbackQueryFilter):
+                self.callback_data = filter_object.callback.callback_data
+                self.rule = filter_object.callback.rule
+                self.key = _indexable_rule(self.rule)
+                del self.filters[i] # Replaced by the single unpack in CallbackDispatchTable
+                break
+
+def _walk(router: Router, chain: List[TelegramEventObserver]) -> Iterator[Tuple[HandlerObject, Router, List[TelegramEventObserver]]]:
+    chain = chain + [router.callback_query]
+    for handler in router.callback_query.handlers:
+        yield handler, router, chain
+    for sub_router in router.sub_routers:
+        yield from _walk(sub_router, chain)
+
+class CallbackDispatchTable(BaseMiddleware):
+    """
+    Outer callback_query middleware on the Dispatcher replacing aiogram's linear scan over every
+    router and handler (each CallbackData filter unpacking the string again) with one table lookup.
+
+    Built once, after all routers are included: handlers filtered with XCallback.filter(F.field == v)
+    or F.field.in_({...}) are indexed by (prefix, value of the prefix's most used field). A query is
+    unpacked once and only the handlers indexed under its value, plus those the index can't narrow
+    (other rules, no CallbackData filter), are tried, in aiogram's order and with the same router-level
+    filters, FSM state filters, inner middlewares and SkipHandler semantics.
+    Routers with their own outer callback_query middlewares can't be entered this way; if there are
+    any, or the magic-filter / aiogram internals it reads have changed, the table disables itself and
+    aiogram routes as before.
+    """
+
+    def __init__(self, root: Router):
+        self.enabled = True
+        self.classes: Dict[str, Type[CallbackData]] = {}
+        self.fields: Dict[str, str] = {} # Indexed field per prefix
+        self.unprefixed: List[_Entry] = [] # Can match any query, always candidates
+        # prefix -> (field value -> handlers to try, handlers to try for any other value), each in aiogram's order
+        self.table: Dict[str, Tuple[Dict[Any, List[_Entry]], List[_Entry]]] = {}
+        self.separators: Set[str] = set()
+        try:
+            missing = [f"{owner.__name__}.{name}" for owner, name in _PRIVATE_API if not hasattr(owner, name)]
+            if missing:
+                raise AttributeError(", ".join(missing))
+            self._build(root)
+        except (AttributeError, TypeError) as e:
+            logger.warning(f"Unsupported aiogram / magic-filter internals ({e!r}), indexed callback dispatch disabled")
+            self.enabled = False
+            self.table.clear()
+
+    def _build(self, root: Router) -> None:
+        entries: List[_Entry] = []
+        for handler, router, chain in _walk(root, []):
+            if router is not root and router.callback_query.outer_middleware:
+                logger.warning(f"Router {router.name} has outer callback_query middlewares, indexed callback dispatch disabled")
+                self.enabled = False
+            entries.append(_Entry(len(entries), handler, router, chain))
+
+        fields: Dict[str, Counter] = {}
+        for entry in entries:
+            if entry.callback_data is None:
+                continue
+            prefix = entry.callback_data.__prefix__
+            if self.classes.setdefault(prefix, entry.callback_data) is not entry.callback_data:
+                logger.warning(f"Several CallbackData classes use prefix '{prefix}', indexed callback dispatch disabled")
+                self.enabled = False
+            if entry.key:
+                fields.setdefault(prefix, Counter())[entry.key[0]] += 1
+        self.fields = {prefix: counter.most_common(1)[0][0] for prefix, counter in fields.items()}
+
+        self.unprefixed = [e for e in entries if e.callback_data is None]
+        for prefix in self.classes:
+            field = self.fields.get(prefix)
+            own = [e for e in entries if e.callback_data is not None and e.callback_data.__prefix__ == prefix]
+            indexed = [e for e in own if e.key and e.key[0] == field]
+            generic = sorted([e for e in own if e not in indexed] + self.unprefixed, key=lambda e: e.position)
+            by_value: Dict[Any, List[_Entry]] = {}
+            for entry in indexed:
+                entry.rule = None # Being looked up by its value is the rule check
+                for value in entry.key[1]:
+                    by_value.setdefault(value, []).append(entry)
+            self.table[prefix] = (
+                {value: sorted(handlers + generic, key=lambda e: e.position) for value, handlers in by_value.items()},
+                generic
+            )
+        self.separators = {cls.__separator__ for cls in self.classes.values()}
+        logger.info(f"Callback dispatch table: {len(entries)} handlers under {len(self.table)} prefixes")
+
+    def candidates(self, data: Optional[str]) -> Tuple[Optional[CallbackData], List[_Entry]]:
+        """Unpacks `data` once. Returns it (None if no known prefix parses) and the handlers to try, in order."""
+        if data:
+            for separator in self.separators:
+                prefix = data.split(separator, 1)[0]
+                slot = self.table.get(prefix)
+                if slot is None:
+                    continue
+                try:
+                    callback_data = self.classes[prefix].unpack(data)
+                except (TypeError, ValueError):
+                    break
+                by_value, generic = slot
+                field = self.fields.get(prefix)
+                return callback_data, by_value.get(getattr(callback_data, field), generic) if field else generic
+        return None, self.unprefixed
+
+    async def __call__(self,
+                       handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: CallbackQuery,
+                       data: Dict[str, Any]) -> Any:
+        if not self.enabled:
+            return await handler(event, data) # aiogram's own routing
+        callback_data, candidates = self.candidates(event.data)
+        routed: Dict[int, Optional[Dict[str, Any]]] = {} # Per observer: data after its router-level filters, None if rejected
+        for entry in candidates:
+            kwargs = await self._enter(entry.chain, event, data, routed)
+            if kwargs is None:
+                continue
+            kwargs = dict(kwargs)
+            kwargs["handler"] = entry.handler
+            if entry.callback_data is not None:
+                if entry.rule is not None and not entry.rule.resolve(callback_data):
+                    continue
+                kwargs["callback_data"] = callback_data
+            if not await self._check(entry, event, kwargs):
+                continue
+            observer = entry.observer
+            wrapped = observer.outer_middleware.wrap_middlewares(observer._resolve_middlewares(), entry.handler.call)
+            try:
+                return await wrapped(event, kwargs)
+            except SkipHandler:
+                continue
+        return UNHANDLED
+
+    @staticmethod
+    async def _enter(chain: List[TelegramEventObserver], event: CallbackQuery, data: Dict[str, Any],
+                     routed: Dict[int, Optional[Dict[str, Any]]]) -> Optional[Dict[str, Any]]:
+        """Applies the router-level filters from the root down, like Router.propagate_event; memoized per query."""
+        kwargs = data
+        for observer in chain:
+            key = id(observer)
+            if key not in routed:
+                result, checked = await observer.check_root_filters(event, **{**kwargs, "event_router": observer.router})
+                routed[key] = checked if result else None
+            kwargs = routed[key]
+            if kwargs is None:
+                return None
+        return kwargs
+
+    @staticmethod
+    async def _check(entry: _Entry, event: CallbackQuery, kwargs: Dict[str, Any]) -> bool:
+        for filter_object in entry.filters:
+            result = await filter_object.call(event, **kwargs)
+            if not result:
+                return False
+            if isinstance(result, dict):
+                kwargs.update(result)
+        return True
+
+_SECTION_SEPARATOR = "."
+
+def reply_button_index(section: str, locales_dir: Path = settings.LOCALES_DIR) -> Dict[str, str]:
+    """
+    Reply keyboard button text, in every locale, -> button key for the keys under `section`
+    (e.g. "main_menu.buttons": {"🚀 Boosting": "boosting", "🚀 Бустинг": "boosting", ...}).
+    Lets a text handler find the pressed button with one dict lookup instead of translating and comparing each.
+    """
+    index: Dict[str, str] = {}
+    for path in sorted(locales_dir.glob("*.yml")):
+        with open(path, encoding="utf-8") as f:
+            node: Any = yaml.safe_load(f) or {}
+        for part in section.split(_SECTION_SEPARATOR):
+            node = node.get(part, {}) if isinstance(node, dict) else {}
+        for key, text in node.items():
+            if isinstance(text, str):
+                previous = index.setdefault(text, key)
+                if previous != key:
+                    logger.warning(f"Button text '{text}' is both {section}.{previous} and {section}.{key} ({path.name})")
+    return index
@@ -0,0 +1,73 @@
+# utils/keyboard_cache.py
+import functools
+import inspect
+import logging
+from typing import Any, Callable, Hashable, Optional, TypeVar
+
+from config.settings import settings
+from database.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+LOCALE_KEY = "language_code" # Top-level key in every i18n/locales/*.yml holding the locale's own code
+
+keyboard_cache = TTLCache(maxsize=settings.KEYBOARD_CACHE_SIZE) # (builder, locale, args) -> markup
+
+KeyboardBuilder = TypeVar("KeyboardBuilder", bound=Callable[..., Any])
+
+def translator_locale(_: Callable[[str], str]) -> Optional[str]:
+    """
+    Locale a translation function renders, or None if it can't be told.
+    Uses the translator's (or its bound object's) `locale` when it has one, else asks it for LOCALE_KEY.
+    """
+    locale = getattr(_, "locale", None) or getattr(getattr(_, "__self__", None), "locale", None)
+    if isinstance(locale, str):
+        return locale
+    locale = _(LOCALE_KEY)
+    return locale if isinstance(locale, str) and locale != LOCALE_KEY else None # Echoed key: not translated
+
+def _freeze(value: Any) -> Hashable:
+    """Hashable stand-in for a builder argument; dicts and lists keep their order, it shows in the keyboard."""
+    if isinstance(value, dict):
+        return ("dict",) + tuple((k, _freeze(v)) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return (type(value).__name__,) + tuple(_freeze(v) for v in value)
+    hash(value) # Unhashable arguments raise TypeError here, and the call isn't cached
+    return value
+
+def _copy(markup: Any) -> Any:
+    return markup.model_copy(deep=True) if hasattr(markup, "model_copy") else markup
+
+def cached_keyboard(key: Optional[Callable[..., Hashable]] = None) -> Callable[[KeyboardBuilder], KeyboardBuilder]:
+    """
+    Memoizes a keyboard builder on (builder, locale, arguments other than the translator `_`).
+    Markups are mutable pydantic models (handlers may append a row), so every call gets its own deep copy
+    and the cached instance is never handed out; copying still skips the builder's translation lookups.
+    `key` maps the builder's arguments (without `_`) to the cache key when only some of them shape the
+    keyboard, e.g. lambda channel: channel.id.
+    Only for keyboards with a handful of distinct argument values: builders over per-user data
+    (channel lists, payment ids, page cursors) are left undecorated and build every time.
+    The undecorated builder stays reachable as `builder.__wrapped__`.
+    """
+    def decorator(builder: KeyboardBuilder) -> KeyboardBuilder:
+        signature = inspect.signature(builder)
+
+        @functools.wraps(builder)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            arguments = signature.bind(*args, **kwargs).arguments # Positional or keyword, same key
+            translator = arguments.pop("_", None)
+            locale = translator_locale(translator) if translator is not None else ""
+            if locale is None:
+                return builder(*args, **kwargs) # Can't tell which language it would render in
+            try:
+                cache_key = (builder, locale, key(**arguments) if key else _freeze(tuple(arguments.values())))
+                hash(cache_key)
+            except TypeError:
+                return builder(*args, **kwargs) # Unhashable arguments: build as if undecorated
+            markup = keyboard_cache.get(cache_key)
+            if markup is None:
+                markup = builder(*args, **kwargs)
+                keyboard_cache.set(cache_key, markup)
+            return _copy(markup)
+        return wrapper # type: ignore[return-value]
+    return decorator
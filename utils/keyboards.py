@@ -1,11 +1,14 @@
 # utils/keyboards.py
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, ReplyKeyboardMarkup, KeyboardButton, WebAppInfo
 from aiogram.utils.keyboard import InlineKeyboardBuilder, ReplyKeyboardBuilder
-from utils.callbacks import LanguageCallback, ChannelCallback, BoostOrderCallback, MainMenuCallback, WalletCallback, PromocodeCallback, AdminCallback, AdminReportCallback
+from utils.callbacks import LanguageCallback, ChannelCallback, BoostOrderCallback, MainMenuCallback, WalletCallback, PromocodeCallback, AdminCallback, AdminReportCallback, PageCallback
 from typing import List, Optional, Callable, Dict, Any
 from database.models import Channel
+from database.pagination import Page
 from config.settings import settings # Import settings
+from utils.keyboard_cache import cached_keyboard
 
+@cached_keyboard()
 def get_language_kb():
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -15,6 +18,7 @@ def get_language_kb():
     )
     return builder.as_markup()
 
+@cached_keyboard()
 def get_main_menu_kb(_: Callable[[str], str]) -> ReplyKeyboardMarkup: # _ is the translation function
     builder = ReplyKeyboardBuilder()
     builder.row(KeyboardButton(text=_("main_menu.buttons.boosting")))
@@ -25,6 +29,7 @@ def get_main_menu_kb(_: Callable[[str], str]) -> ReplyKeyboardMarkup: # _ is the
     builder.row(KeyboardButton(text=_("main_menu.buttons.offers")))
     return builder.as_markup(resize_keyboard=True)
 
+@cached_keyboard()
 def get_boosting_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("boosting_menu.active_orders"), callback_data=MainMenuCallback(action="active_boosts").pack()))
@@ -34,6 +39,7 @@ def get_boosting_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text=_("common.back_to_main"), callback_data=MainMenuCallback(action="main_menu").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_boost_type_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -43,6 +49,7 @@ def get_boost_type_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=MainMenuCallback(action="boosting").pack()))
     return builder.as_markup()
 
+# Not cached: built from the user's own channel list
 def get_channel_selection_kb(channels: List[Channel], _: Callable[[str], str]) -> Optional[InlineKeyboardMarkup]:
     builder = InlineKeyboardBuilder()
     if not channels:
@@ -55,6 +62,7 @@ def get_channel_selection_kb(channels: List[Channel], _: Callable[[str], str]) -
     builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=MainMenuCallback(action="boosting").pack()))
     return builder.as_markup()
 
+@cached_keyboard(key=lambda channel: channel.id) # Only the id shows in the keyboard
 def get_channel_manage_kb(channel: Channel, _: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("my_channels.view_stats"), callback_data=ChannelCallback(action="stats", channel_id=channel.id).pack()))
@@ -64,6 +72,7 @@ def get_channel_manage_kb(channel: Channel, _: Callable[[str], str]) -> InlineKe
     return builder.as_markup()
 
 
+@cached_keyboard()
 def get_order_confirmation_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(
@@ -73,6 +82,7 @@ def get_order_confirmation_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=MainMenuCallback(action="boosting").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_account_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("my_account_menu.promocode"), callback_data=MainMenuCallback(action="promocode").pack()))
@@ -82,6 +92,7 @@ def get_account_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text=_("common.back_to_main"), callback_data=MainMenuCallback(action="main_menu").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_wallet_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("wallet_menu.buy_credits"), callback_data=WalletCallback(action="buy").pack()))
@@ -89,6 +100,7 @@ def get_wallet_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text=_("common.back_to_main"), callback_data=MainMenuCallback(action="main_menu").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_cryptomus_prices_kb(_: Callable[[str], str], prices: Dict[int, float]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     for credits, usd in prices.items():
@@ -96,18 +108,21 @@ def get_cryptomus_prices_kb(_: Callable[[str], str], prices: Dict[int, float]) -
     builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=MainMenuCallback(action="wallet").pack()))
     return builder.as_markup()
 
+# Not cached: one keyboard per invoice
 def get_payment_status_kb(_: Callable[[str], str], invoice_uuid: str) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("wallet_menu.payment_check_status"), callback_data=WalletCallback(action="check_payment", invoice_uuid=invoice_uuid).pack()))
     builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=MainMenuCallback(action="wallet").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_promocode_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("my_account_menu.enter_promocode"), callback_data=PromocodeCallback(action="input").pack()))
     builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=MainMenuCallback(action="my_account").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_offers_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("offers_menu.become_pro"), callback_data=MainMenuCallback(action="become_pro").pack()))
@@ -115,6 +130,7 @@ def get_offers_menu_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder.row(InlineKeyboardButton(text=_("common.back_to_main"), callback_data=MainMenuCallback(action="main_menu").pack()))
     return builder.as_markup()
 
+@cached_keyboard()
 def get_admin_main_menu_kb(_: Callable[[str], str]) -> ReplyKeyboardMarkup:
     builder = ReplyKeyboardBuilder()
     builder.row(KeyboardButton(text=_("admin_panel.add_accounts")), KeyboardButton(text=_("admin_panel.account_stats")))
@@ -122,11 +138,35 @@ def get_admin_main_menu_kb(_: Callable[[str], str]) -> ReplyKeyboardMarkup:
     builder.row(KeyboardButton(text=_("admin_panel.commands_list_btn"))) # Button to list commands
     return builder.as_markup(resize_keyboard=True)
 
+@cached_keyboard()
 def get_admin_broadcast_cancel_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("common.cancel"), callback_data=AdminCallback(action="cancel_broadcast").pack()))
     return builder.as_markup()
 
+# Not cached: one per broadcast
+def get_broadcast_progress_kb(_: Callable[[str], str], broadcast_id: str) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    builder.row(InlineKeyboardButton(text=_("admin_panel.broadcast_stop_button"), callback_data=AdminCallback(action="stop_broadcast", broadcast_id=broadcast_id).pack()))
+    return builder.as_markup()
+
+# Not cached: cursors differ for every page
+def get_pagination_kb(_: Callable[[str], str], listing: str, page: Page, back_callback_data: str) -> InlineKeyboardMarkup:
+    """Newer/older buttons for a keyset page (only the directions that have items), then a back button."""
+    builder = InlineKeyboardBuilder()
+    nav_buttons = []
+    if page.has_prev:
+        nav_buttons.append(InlineKeyboardButton(text=_("common.prev_page"), callback_data=PageCallback(
+            listing=listing, backward=True, ts=page.prev_cursor.ts, item_id=page.prev_cursor.packed_id).pack()))
+    if page.has_next:
+        nav_buttons.append(InlineKeyboardButton(text=_("common.next_page"), callback_data=PageCallback(
+            listing=listing, ts=page.next_cursor.ts, item_id=page.next_cursor.packed_id).pack()))
+    if nav_buttons:
+        builder.row(*nav_buttons)
+    builder.row(InlineKeyboardButton(text=_("common.back"), callback_data=back_callback_data))
+    return builder.as_markup()
+
+@cached_keyboard()
 def get_admin_reports_kb(_: Callable[[str], str]) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
     builder.row(InlineKeyboardButton(text=_("admin_panel.reports_menu.financial"), callback_data=AdminReportCallback(action="financial").pack()))
@@ -0,0 +1,42 @@
+# utils/ordered_dispatcher.py
+import logging
+from typing import Any, Hashable
+
+from aiogram import Bot, Dispatcher
+from aiogram.dispatcher.middlewares.user_context import UserContextMiddleware
+from aiogram.methods import TelegramMethod
+from aiogram.types import Update
+
+from utils.ordered_executor import OrderedExecutor
+
+logger = logging.getLogger(__name__)
+
+def update_key(update: Update) -> Hashable:
+    """Sender of the update (user, else chat); senderless updates get a key of their own and are unordered."""
+    context = UserContextMiddleware.resolve_event_context(update)
+    if context.user_id is not None:
+        return context.user_id
+    if context.chat_id is not None:
+        return context.chat_id
+    return ("update", update.update_id)
+
+class OrderedDispatcher(Dispatcher):
+    """
+    Dispatcher whose feed_update queues the whole update on an OrderedExecutor keyed by the sender and
+    returns right away, so one slow handler no longer holds up the polling loop, the webhook workers or
+    other users. The job runs aiogram's complete pipeline, its own outer middlewares included: the FSM
+    state is read when the update's turn comes, after the previous update of the same user has finished,
+    so state transitions see each other.
+    """
+
+    def __init__(self, executor: OrderedExecutor, **kwargs: Any):
+        super().__init__(**kwargs)
+        self.executor = executor
+
+    async def feed_update(self, bot: Bot, update: Update, **kwargs: Any) -> Any:
+        async def job() -> None:
+            response = await Dispatcher.feed_update(self, bot, update, **kwargs)
+            if isinstance(response, TelegramMethod): # What polling does with a handler's returned method
+                await self.silent_call_request(bot=bot, result=response)
+
+        await self.executor.submit(update_key(update), job)
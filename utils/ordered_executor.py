@@ -0,0 +1,95 @@
+# utils/ordered_executor.py
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Job = Callable[[], Awaitable[Any]]
+
+class OrderedExecutor:
+    """
+    Runs jobs with the same key strictly one after another, in submission order, and jobs with
+    different keys in parallel, at most `max_concurrency` at a time overall.
+    Each key with queued jobs has one drain task; idle keys cost nothing.
+    submit() waits while `max_pending` jobs are queued or running, which pushes back on the update source.
+    """
+
+    def __init__(self, max_concurrency: int = 100, max_pending: int = 10000):
+        self.max_concurrency = max_concurrency
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._queues: Dict[Hashable, Deque[Tuple[float, Job]]] = {}
+        self._tasks: Set[asyncio.Task] = set() # Strong references to the drain tasks
+        self._has_space = asyncio.Event()
+        self._has_space.set()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        # Metrics
+        self.pending = 0 # Queued + running
+        self.running = 0
+        self.peak_pending = 0
+        self.processed = 0
+        self.failed = 0
+        self._wait_total = 0.0 # Seconds jobs spent queued, over `processed`
+
+    async def submit(self, key: Hashable, job: Job) -> None:
+        while self.pending >= self.max_pending:
+            self._has_space.clear()
+            await self._has_space.wait()
+
+        self.pending += 1
+        self.peak_pending = max(self.peak_pending, self.pending)
+        self._idle.clear()
+        queue = self._queues.get(key)
+        if queue is None:
+            queue = self._queues[key] = deque()
+            task = asyncio.create_task(self._drain(key, queue))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        queue.append((time.monotonic(), job))
+
+    async def _drain(self, key: Hashable, queue: Deque[Tuple[float, Job]]) -> None:
+        while queue:
+            submitted_at, job = queue.popleft()
+            async with self._semaphore:
+                self._wait_total += time.monotonic() - submitted_at
+                self.running += 1
+                try:
+                    await job()
+                except Exception as e:
+                    self.failed += 1
+                    logger.error(f"Job for key {key} failed: {e}", exc_info=True)
+                finally:
+                    self.running -= 1
+                    self.processed += 1
+                    self.pending -= 1
+                    self._has_space.set()
+        # No await between the empty check and this: a submit() for the key either landed in `queue` or starts a new task
+        del self._queues[key]
+        if not self.pending:
+            self._idle.set()
+
+    async def join(self, timeout: float = 30.0) -> bool:
+        """Waits until every submitted job has finished. False if `timeout` ran out first."""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=timeout)
+            return True
+        except asyncio.TimeoutError:
+            logger.warning(f"{self.pending} jobs still pending after {timeout}s")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": self.pending,
+            "running": self.running,
+            "max_concurrency": self.max_concurrency,
+            "active_keys": len(self._queues),
+            "deepest_queue": max((len(q) for q in self._queues.values()), default=0), # Waiting jobs of the most backed-up key
+            "peak_pending": self.peak_pending,
+            "processed": self.processed,
+            "failed": self.failed,
+            "avg_wait_ms": self._wait_total / self.processed * 1000 if self.processed else 0.0,
+        }
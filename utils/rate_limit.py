@@ -0,0 +1,343 @@
+# utils/rate_limit.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from enum import IntEnum
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Union
+
+from aiogram import Bot
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware, NextRequestMiddlewareType
+from aiogram.exceptions import TelegramNetworkError, TelegramRetryAfter, TelegramServerError
+from aiogram.methods import TelegramMethod
+from aiogram.methods.base import Response, TelegramType
+
+logger = logging.getLogger(__name__)
+
+class TokenBucket:
+    """`rate` tokens per second, bursts of up to `capacity`. The rate can be changed while in use."""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self.acquired = 0 # Total tokens handed out
+        self.waiting = 0 # Callers currently blocked in acquire()
+
+    def set_rate(self, rate: float, capacity: Optional[float] = None) -> None:
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity or max(rate, 1.0)
+        self._tokens = min(self._tokens, self.capacity)
+
+    def pause(self, seconds: float) -> None:
+        """Hands out nothing for `seconds` (a flood wait), then restarts from an empty bucket instead of a full burst."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+        self._updated = self._paused_until
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + max(now - self._updated, 0.0) * self.rate)
+        self._updated = max(now, self._updated)
+
+    def _delay(self) -> float:
+        """Seconds until the next token could be available."""
+        return max(self._paused_until - time.monotonic(), 0.0) + max(1 - self._tokens, 0.0) / self.rate
+
+    def _try_take(self) -> bool:
+        self._refill()
+        if self._tokens >= 1:
+            self._tokens -= 1
+            self.acquired += 1
+            return True
+        return False
+
+    async def acquire(self) -> None:
+        self.waiting += 1
+        try:
+            while not self._try_take():
+                await asyncio.sleep(self._delay())
+        finally:
+            self.waiting -= 1
+
+class OutboundLane(IntEnum):
+    """Outgoing message classes, served in this order when the global budget is short."""
+    INTERACTIVE = 0 # Replies to the user's own updates
+    SCHEDULED = 1 # Jobs: reminders, daily mailings
+    BROADCAST = 2 # Admin broadcasts
+
+_current_lane: ContextVar[OutboundLane] = ContextVar("outbound_lane", default=OutboundLane.INTERACTIVE)
+
+@contextmanager
+def outbound_lane(lane: OutboundLane) -> Iterator[None]:
+    """Sends made inside the block (and in tasks started from it) queue in `lane`."""
+    token = _current_lane.set(lane)
+    try:
+        yield
+    finally:
+        _current_lane.reset(token)
+
+class PriorityTokenBucket(TokenBucket):
+    """
+    TokenBucket whose waiters queue per lane: every token goes to the oldest waiter of the most urgent lane
+    that has one. A single pump task hands tokens out, so thousands of queued broadcast sends cost no
+    wake-ups, and an interactive reply waits at most for the next token, not behind the broadcast queue.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        super().__init__(rate, capacity)
+        self._lanes: List[Deque[asyncio.Future]] = [deque() for _ in OutboundLane]
+        self._lane_paused_until = [0.0 for _ in OutboundLane]
+        self._pump_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+
+    def pause(self, seconds: float, lane: OutboundLane = OutboundLane.INTERACTIVE) -> None:
+        """Holds `lane` and every less urgent lane for `seconds`; more urgent lanes keep being served."""
+        if lane == OutboundLane.INTERACTIVE:
+            super().pause(seconds)
+        until = time.monotonic() + seconds
+        for paused in range(lane, len(self._lanes)):
+            self._lane_paused_until[paused] = max(self._lane_paused_until[paused], until)
+
+    async def acquire(self, lane: OutboundLane = OutboundLane.INTERACTIVE) -> None:
+        if not any(self._lanes) and time.monotonic() >= self._lane_paused_until[lane] and self._try_take():
+            return # Nobody queued: no need to go through the pump
+        future = asyncio.get_running_loop().create_future()
+        self._lanes[lane].append(future)
+        self.waiting += 1
+        if self._pump_task is None or self._pump_task.done():
+            self._pump_task = asyncio.create_task(self._pump())
+        else:
+            self._wakeup.set() # The pump may be sleeping out a pause of some other lane
+        try:
+            await future
+        finally:
+            self.waiting -= 1
+
+    def _next_lane(self, now: float) -> Optional[int]:
+        for lane, queue in enumerate(self._lanes):
+            while queue and queue[0].done(): # Cancelled waiters
+                queue.popleft()
+            if queue and now >= self._lane_paused_until[lane]:
+                return lane
+        return None
+
+    async def _pump(self) -> None:
+        while any(self._lanes):
+            now = time.monotonic()
+            lane = self._next_lane(now)
+            if lane is None:
+                pauses = [until - now for until, queue in zip(self._lane_paused_until, self._lanes) if queue]
+                delay = min(pauses, default=0.0)
+            elif self._try_take():
+                self._lanes[lane].popleft().set_result(None)
+                continue
+            else:
+                delay = self._delay()
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=max(delay, 0.001))
+            except asyncio.TimeoutError:
+                pass
+
+    def waiting_by_lane(self) -> Dict[str, int]:
+        return {lane.name.lower(): sum(not f.done() for f in queue) for lane, queue in zip(OutboundLane, self._lanes)}
+
+class AimdController:
+    """
+    Additive-increase/multiplicative-decrease pacing for bulk sends. Each successful send raises the rate by
+    `increase / rate` (about `increase` msg/s per second of clean sending) and the concurrency by one per
+    full window of sends; a flood wait, a 5xx or network error, or a response latency (moving average)
+    above `latency_target` cuts both by `decrease`, at most once per `cooldown` seconds, so the burst of
+    errors one overload produces counts once. Sends report to it when made inside send_feedback().
+    """
+
+    def __init__(self, rate: float, min_rate: float = 1.0, max_rate: float = 30.0, increase: float = 1.0, decrease: float = 0.5,
+                 max_concurrency: int = 30, latency_target: float = 2.0, cooldown: float = 1.0):
+        self.bucket = TokenBucket(min(max(rate, min_rate), max_rate))
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.max_concurrency = max_concurrency
+        self.concurrency = min(max(int(self.bucket.rate), 1), max_concurrency)
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        self.latency: Optional[float] = None # Seconds, exponential moving average of successful requests
+        self.in_flight = 0
+        self.flood_waits = 0
+        self.server_errors = 0
+        self.decreases = 0
+        self._window = 0 # Successes since the concurrency last changed
+        self._last_decrease = 0.0
+        self._slots = asyncio.Condition()
+
+    @property
+    def rate(self) -> float:
+        return self.bucket.rate
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """Waits for a free concurrency slot and a token of the current rate; the slot is held for the block."""
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < self.concurrency)
+            self.in_flight += 1
+        try:
+            await self.bucket.acquire()
+            yield
+        finally:
+            async with self._slots:
+                self.in_flight -= 1
+                self._slots.notify_all() # The concurrency may have grown since: let every waiter recheck
+
+    def on_success(self, latency: float) -> None:
+        self.latency = latency if self.latency is None else 0.8 * self.latency + 0.2 * latency
+        if self.latency > self.latency_target:
+            self._decrease()
+            return
+        self.bucket.set_rate(min(self.max_rate, self.rate + self.increase / self.rate))
+        self._window += 1
+        if self._window >= self.concurrency:
+            self._window = 0
+            self.concurrency = min(self.concurrency + 1, self.max_concurrency)
+
+    def on_flood_wait(self, retry_after: float) -> None:
+        self.flood_waits += 1
+        self._decrease()
+        self.bucket.pause(retry_after)
+
+    def on_server_error(self) -> None:
+        self.server_errors += 1
+        self._decrease()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return
+        self._last_decrease = now
+        self.decreases += 1
+        self.bucket.set_rate(max(self.min_rate, self.rate * self.decrease))
+        self.concurrency = max(int(self.concurrency * self.decrease), 1)
+        self._window = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.rate,
+            "concurrency": self.concurrency,
+            "in_flight": self.in_flight,
+            "latency_ms": (self.latency or 0.0) * 1000,
+            "flood_waits": self.flood_waits,
+            "server_errors": self.server_errors,
+            "decreases": self.decreases,
+        }
+
+_current_feedback: ContextVar[Optional[AimdController]] = ContextVar("send_feedback", default=None)
+
+@contextmanager
+def send_feedback(controller: AimdController) -> Iterator[None]:
+    """Outcomes and latencies of sends made inside the block (and in tasks started from it) go to `controller`."""
+    token = _current_feedback.set(controller)
+    try:
+        yield
+    finally:
+        _current_feedback.reset(token)
+
+class ChatBuckets:
+    """Per-chat TokenBuckets (private chats and groups have different limits), least recently used dropped first."""
+
+    def __init__(self, chat_rate: float, chat_burst: float, group_rate: float, group_burst: float, max_chats: int = 10000):
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_chats = max_chats
+        self._buckets: "OrderedDict[Union[int, str], TokenBucket]" = OrderedDict()
+
+    def get(self, chat_id: Union[int, str]) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            # Negative ids and @usernames are groups and channels
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            bucket = TokenBucket(self.group_rate, self.group_burst) if is_group else TokenBucket(self.chat_rate, self.chat_burst)
+            self._buckets[chat_id] = bucket
+            if len(self._buckets) > self.max_chats:
+                self._buckets.popitem(last=False) # Idle long enough to be full again, forgetting it changes nothing
+        else:
+            self._buckets.move_to_end(chat_id)
+        return bucket
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+def is_outbound_message(method: TelegramMethod) -> bool:
+    """Methods that count against Telegram's messages-per-second limits."""
+    name = method.__api_method__
+    return name.startswith(("send", "copy", "forward", "edit"))
+
+class OutboundRateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Bot session middleware every outgoing message goes through: it waits for its chat's bucket, then for a
+    token of the bot-wide `bucket` in its lane (see outbound_lane), so interactive replies overtake queued
+    scheduled and broadcast traffic. A flood wait (RetryAfter) pauses the chat and the lane, and the message
+    is sent again after it, up to `max_retries` times. Inside send_feedback(), every attempt's outcome and
+    latency is reported to the AIMD controller pacing the sender.
+    Other API calls (answerCallbackQuery, getChatMember, ...) pass through untouched.
+    """
+
+    def __init__(self, rate: float, chat_rate: float = 1.0, chat_burst: float = 3.0, group_rate: float = 20 / 60,
+                 group_burst: float = 5.0, max_chats: int = 10000, max_retries: int = 3):
+        self.bucket = PriorityTokenBucket(rate)
+        self.chats = ChatBuckets(chat_rate, chat_burst, group_rate, group_burst, max_chats)
+        self.max_retries = max_retries
+        self.flood_waits = 0
+
+    async def __call__(self, make_request: NextRequestMiddlewareType[TelegramType], bot: Bot,
+                       method: TelegramMethod[TelegramType]) -> Response[TelegramType]:
+        if not is_outbound_message(method):
+            return await make_request(bot, method)
+        lane = _current_lane.get()
+        feedback = _current_feedback.get()
+        chat_id = getattr(method, "chat_id", None) # None for inline message edits
+        chat_bucket = self.chats.get(chat_id) if chat_id is not None else None
+        attempt = 0
+        while True:
+            if chat_bucket:
+                await chat_bucket.acquire() # Before the global token, so a busy chat doesn't hold one while it waits
+            await self.bucket.acquire(lane)
+            started = time.monotonic() # The request alone: time queued in the buckets above is our own pacing
+            try:
+                response = await make_request(bot, method)
+            except (TelegramServerError, TelegramNetworkError):
+                if feedback:
+                    feedback.on_server_error()
+                raise
+            except TelegramRetryAfter as e:
+                self.flood_waits += 1
+                if feedback:
+                    feedback.on_flood_wait(e.retry_after)
+                if chat_bucket:
+                    chat_bucket.pause(e.retry_after)
+                self.bucket.pause(e.retry_after, lane)
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                logger.warning(f"Flood wait {e.retry_after}s on {method.__api_method__} to {chat_id} ({lane.name.lower()} lane), retry {attempt}/{self.max_retries}")
+            else:
+                if feedback:
+                    feedback.on_success(time.monotonic() - started)
+                return response
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rate": self.bucket.rate,
+            "acquired": self.bucket.acquired,
+            "waiting": self.bucket.waiting,
+            "waiting_by_lane": self.bucket.waiting_by_lane(),
+            "flood_waits": self.flood_waits,
+            "chats": len(self.chats),
+        }
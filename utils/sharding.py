@@ -0,0 +1,360 @@
+# utils/sharding.py
+import asyncio
+import json
+import logging
+import os
+import signal
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
+
+import aiohttp
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+
+from config.settings import settings
+from utils.rate_limit import OutboundRateLimitMiddleware
+from utils.webhook import SECRET_TOKEN_HEADER, require_secret, secret_matches
+
+logger = logging.getLogger(__name__)
+
+_HASH_MULTIPLIER = 0x9E3779B97F4A7C15 # 64-bit Fibonacci hashing: spreads sequential Telegram ids evenly
+_MASK64 = (1 << 64) - 1
+
+INVALIDATE_PATH = "/invalidate_users" # Shard worker endpoint dropping users from its user cache
+
+def shard_for(routing_id: int, shards: int) -> int:
+    return ((routing_id * _HASH_MULTIPLIER) & _MASK64) % shards
+
+def routing_id(update: Dict[str, Any]) -> int:
+    """
+    The id an update is sharded by: its sender (from_user.id), else its chat, else the update itself.
+    Same user -> same worker, so each worker's caches and per-user ordering only ever see its own users.
+    """
+    for key, payload in update.items():
+        if key == "update_id" or not isinstance(payload, dict):
+            continue
+        user = payload.get("from") or payload.get("user") # "user": message_reaction, poll_answer, chat_boost...
+        if isinstance(user, dict) and "id" in user:
+            return user["id"]
+        chat = payload.get("chat") or (payload.get("message") or {}).get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return chat["id"]
+    return update["update_id"]
+
+def split_budget(total: float, demands: List[float], floor: float) -> List[float]:
+    """
+    Splits `total` sends/s between workers: a `floor` fraction evenly, so idle workers can still answer
+    right away, the rest in proportion to each worker's recent demand (evenly when nobody sends).
+    """
+    n = len(demands)
+    even = total * floor / n
+    remainder = total - even * n
+    demand_sum = sum(demands)
+    if demand_sum <= 0:
+        return [total / n] * n
+    return [even + remainder * d / demand_sum for d in demands]
+
+def worker_health(dp: Dispatcher, outbound: OutboundRateLimitMiddleware) -> Callable[[web.Request], Dict[str, Any]]:
+    """GET /health of a shard worker: applies the outbound rate the front sends along and reports load."""
+    def health(request: web.Request) -> Dict[str, Any]:
+        try:
+            rate = float(request.query.get("rate", 0))
+        except ValueError:
+            rate = 0
+        if rate > 0:
+            outbound.bucket.set_rate(rate)
+        executor = dp.get("update_executor")
+        invalidator = dp.get("peer_invalidator")
+        return {
+            "worker_id": settings.WORKER_ID,
+            "executor": executor.stats() if executor else {},
+            "outbound": outbound.stats(),
+            "cache_invalidations": invalidator.stats() if invalidator else {},
+        }
+    return health
+
+def worker_invalidation(dp: Dispatcher) -> Callable[[web.Request], Awaitable[web.Response]]:
+    """POST /invalidate_users of a shard worker: drops users written by another worker from this one's user cache."""
+    async def invalidate(request: web.Request) -> web.Response:
+        try:
+            user_ids = (await request.json())["user_ids"] # None: every user
+        except (ValueError, KeyError, TypeError):
+            return web.Response(status=400)
+        user_repo = dp.get("user_repo")
+        if user_repo: # Not started yet: nothing cached
+            if user_ids is None:
+                user_repo.cache.clear()
+            else:
+                for user_id in user_ids:
+                    user_repo.cache.invalidate(user_id)
+        return web.Response()
+    return invalidate
+
+class PeerCacheInvalidator:
+    """
+    UserRepository.on_invalidate of a shard worker. A user is cached by the worker their updates are routed to,
+    but other workers write users too: worker 0 runs the scheduled jobs (payment checks credit balances) and admin
+    commands (bans, balance changes) run on the admin's worker. Every invalidation of a user owned by another
+    worker is posted to that worker's /invalidate_users, batched per event loop iteration.
+    Guarantee: the owner drops its copy within one local round trip of the write. If the post fails (owner
+    restarting, timeout) the copy stays stale for at most USER_CACHE_TTL_SECONDS.
+    """
+
+    def __init__(self, index: int, workers: int, secret: str):
+        self.index = index
+        self.workers = workers
+        self.secret = secret
+        self._pending: Dict[int, Optional[Set[int]]] = {} # Worker index -> user ids, None: all users
+        self._flush_scheduled = False
+        self._tasks: Set[asyncio.Task] = set() # Strong references to the flush tasks
+        self._session: Optional[aiohttp.ClientSession] = None
+        # Counters for /health
+        self.sent = 0
+        self.failed = 0
+
+    def __call__(self, user_id: Optional[int]) -> None:
+        if user_id is None:
+            for worker in range(self.workers):
+                if worker != self.index:
+                    self._pending[worker] = None
+        else:
+            owner = shard_for(user_id, self.workers)
+            if owner == self.index: # Our own cache, already invalidated by the repository
+                return
+            user_ids = self._pending.setdefault(owner, set())
+            if user_ids is not None:
+                user_ids.add(user_id)
+        if self._pending and not self._flush_scheduled:
+            self._flush_scheduled = True
+            task = asyncio.create_task(self._flush())
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _flush(self) -> None:
+        await asyncio.sleep(0) # Writes made in the same iteration join this batch
+        pending, self._pending = self._pending, {}
+        self._flush_scheduled = False
+        if self._session is None:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.SHARD_FORWARD_TIMEOUT_SECONDS))
+        await asyncio.gather(*(self._send(worker, user_ids) for worker, user_ids in pending.items()))
+
+    async def _send(self, worker: int, user_ids: Optional[Set[int]]) -> None:
+        url = f"http://127.0.0.1:{settings.SHARD_BASE_PORT + worker}{INVALIDATE_PATH}"
+        body = {"user_ids": sorted(user_ids) if user_ids is not None else None}
+        try:
+            async with self._session.post(url, json=body, headers={SECRET_TOKEN_HEADER: self.secret}) as response:
+                response.raise_for_status()
+            self.sent += 1
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            self.failed += 1
+            logger.warning(f"User cache invalidation for shard worker {worker} failed, its copy expires with the TTL: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {"sent": self.sent, "failed": self.failed}
+
+    async def close(self) -> None:
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._session:
+            await self._session.close()
+
+class WorkerProcess:
+    """One bot worker: `python bot.py` with BOT_MODE=shard_worker, serving updates on 127.0.0.1:port."""
+
+    def __init__(self, index: int, port: int):
+        self.index = index
+        self.port = port
+        self.url = f"http://127.0.0.1:{port}"
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self.started_at = 0.0
+        self.healthy = False # Passed a health check since the last (re)start
+        self.failures = 0 # Consecutive failed health checks
+        self.crashes = 0 # Consecutive restarts without becoming healthy, drives the restart backoff
+        self.restarts = 0
+        self.restart_at = 0.0 # Backoff: not restarted before this monotonic time
+        self.rate = 0.0 # Outbound sends/s currently granted
+        self.demand = 0.0 # Sends/s it asked for over the last interval
+        self._last_acquired: Optional[int] = None
+        self.stats: Dict[str, Any] = {}
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, rate: float) -> None:
+        env = {
+            **os.environ,
+            "BOT_MODE": "shard_worker",
+            "WORKER_ID": str(settings.WORKER_ID + self.index), # Distinct snowflake ID worker bits per process
+            "SHARD_INDEX": str(self.index),
+            "WEBHOOK_HOST": "127.0.0.1",
+            "WEBHOOK_PORT": str(self.port),
+            # Scheduled jobs and migrations must run exactly once: worker 0 owns them
+            "RUN_SCHEDULER": "true" if self.index == 0 else "false",
+            "MONGO_AUTO_MIGRATE": str(settings.MONGO_AUTO_MIGRATE and self.index == 0).lower(),
+            "OUTBOUND_RATE_LIMIT": str(rate),
+        }
+        self.process = await asyncio.create_subprocess_exec(
+            sys.executable, str(settings.BASE_DIR / "bot.py"), cwd=str(settings.BASE_DIR), env=env
+        )
+        self.started_at = time.monotonic()
+        self.healthy = False
+        self.failures = 0
+        self._last_acquired = None
+        self.rate = rate
+        logger.info(f"Started shard worker {self.index} (pid {self.process.pid}) on port {self.port}")
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        if not self.alive:
+            return
+        self.process.send_signal(signal.SIGTERM) # Worker drains its queue and runs on_shutdown
+        try:
+            await asyncio.wait_for(self.process.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Shard worker {self.index} did not stop within {timeout}s, killing it")
+            self.process.kill()
+            await self.process.wait()
+
+class ShardSupervisor:
+    """
+    Front process of BOT_MODE=sharded. Receives Telegram's webhook, forwards each update unparsed to the
+    worker owning its user, restarts workers that exit or fail health checks, and splits the bot-wide
+    outbound rate (OUTBOUND_RATE_LIMIT) between workers by demand through the health checks.
+    """
+
+    def __init__(self, workers: int, secret: str):
+        self.workers = [WorkerProcess(i, settings.SHARD_BASE_PORT + i) for i in range(workers)]
+        self.secret = secret # Checked on Telegram's requests and sent to the workers, which check it too
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping = False
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secret_matches(request, self.secret):
+            return web.Response(status=401)
+        body = await request.read()
+        try:
+            worker = self.workers[shard_for(routing_id(json.loads(body)), len(self.workers))]
+        except (ValueError, KeyError, TypeError, AttributeError):
+            return web.Response(status=400)
+        if not worker.alive:
+            return web.Response(status=503) # Telegram redelivers later, to the same worker once it is back
+        try:
+            async with self._session.post(f"{worker.url}{settings.WEBHOOK_PATH}", data=body, headers={
+                "Content-Type": "application/json", SECRET_TOKEN_HEADER: self.secret
+            }) as response:
+                return web.Response(status=response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning(f"Forwarding update to shard worker {worker.index} failed: {e}")
+            return web.Response(status=503)
+
+    async def _check(self, worker: WorkerProcess) -> None:
+        if not worker.alive:
+            if time.monotonic() >= worker.restart_at:
+                await worker.start(settings.OUTBOUND_RATE_LIMIT / len(self.workers))
+            return
+        try:
+            async with self._session.get(f"{worker.url}/health", params={"rate": f"{worker.rate:.3f}"},
+                                         headers={SECRET_TOKEN_HEADER: self.secret},
+                                         timeout=aiohttp.ClientTimeout(total=settings.SHARD_HEALTH_TIMEOUT_SECONDS)) as response:
+                response.raise_for_status()
+                worker.stats = await response.json()
+        except (aiohttp.ClientError, asyncio.TimeoutError, ValueError) as e:
+            # A freshly started worker is still importing and connecting: no verdict until the grace period ends
+            if not worker.healthy and time.monotonic() - worker.started_at < settings.SHARD_STARTUP_GRACE_SECONDS:
+                return
+            worker.failures += 1
+            logger.warning(f"Shard worker {worker.index} health check failed ({worker.failures}/{settings.SHARD_HEALTH_FAILURES}): {e}")
+            if worker.failures >= settings.SHARD_HEALTH_FAILURES:
+                await worker.stop(timeout=5.0) # _watch sees the exit and schedules the restart
+            return
+
+        worker.healthy = True
+        worker.failures = 0
+        worker.crashes = 0
+        outbound = worker.stats.get("outbound", {})
+        acquired = outbound.get("acquired", 0)
+        if worker._last_acquired is not None:
+            # Sends/s over the last interval, plus whatever is queued for tokens right now
+            worker.demand = max(acquired - worker._last_acquired, 0) / settings.SHARD_HEALTH_INTERVAL_SECONDS + outbound.get("waiting", 0)
+        worker._last_acquired = acquired
+
+    def _schedule_restart(self, worker: WorkerProcess) -> None:
+        delay = min(2 ** worker.crashes - 1, 60) # 0s, 1s, 3s, 7s... for a worker that keeps crashing
+        worker.crashes += 1
+        worker.restarts += 1
+        worker.restart_at = time.monotonic() + delay
+        logger.warning(f"Restarting shard worker {worker.index} in {delay}s")
+
+    async def _watch(self, worker: WorkerProcess) -> None:
+        """Notices a worker exiting as soon as it happens rather than at the next health check."""
+        while not self._stopping:
+            if worker.alive:
+                code = await worker.process.wait()
+                if self._stopping:
+                    return
+                logger.error(f"Shard worker {worker.index} exited with code {code}")
+                self._schedule_restart(worker)
+            await asyncio.sleep(settings.SHARD_HEALTH_INTERVAL_SECONDS)
+
+    async def _supervise(self) -> None:
+        while not self._stopping:
+            await asyncio.sleep(settings.SHARD_HEALTH_INTERVAL_SECONDS)
+            await asyncio.gather(*(self._check(worker) for worker in self.workers))
+            # New shares take effect on each worker with the next health check
+            shares = split_budget(settings.OUTBOUND_RATE_LIMIT, [w.demand for w in self.workers], settings.SHARD_RATE_FLOOR)
+            for worker, share in zip(self.workers, shares):
+                worker.rate = share
+
+    async def start(self) -> None:
+        self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=settings.SHARD_FORWARD_TIMEOUT_SECONDS))
+        for worker in self.workers:
+            await worker.start(settings.OUTBOUND_RATE_LIMIT / len(self.workers))
+        self._tasks.append(asyncio.create_task(self._supervise()))
+        self._tasks.extend(asyncio.create_task(self._watch(worker)) for worker in self.workers)
+
+    async def stop(self) -> None:
+        self._stopping = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        await asyncio.gather(*(worker.stop() for worker in self.workers))
+        await self._session.close()
+
+async def run_sharded(bot: Bot) -> None:
+    """
+    Front process: registers the webhook and routes updates to SHARD_WORKERS worker processes
+    until SIGINT/SIGTERM. It never touches MongoDB itself.
+    """
+    secret = require_secret("sharded")
+    if not settings.WEBHOOK_BASE_URL:
+        raise RuntimeError("BOT_MODE=sharded requires WEBHOOK_BASE_URL")
+
+    supervisor = ShardSupervisor(settings.SHARD_WORKERS, secret)
+    app = web.Application()
+    app.router.add_post(settings.WEBHOOK_PATH, supervisor.handle)
+    runner = web.AppRunner(app, access_log=None)
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError:
+            pass
+
+    await supervisor.start()
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+        await bot.set_webhook(
+            url=settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH,
+            secret_token=secret,
+            max_connections=settings.WEBHOOK_MAX_CONNECTIONS
+        ) # allowed_updates is left as is: the front has no dispatcher to derive it from
+        logger.info(f"Sharded front listening on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}, {len(supervisor.workers)} workers")
+        await stop_event.wait()
+    finally:
+        await runner.cleanup()
+        await supervisor.stop()
+        await bot.session.close()
@@ -0,0 +1,157 @@
+# utils/startup_profile.py
+"""
+Import and initialization timing for bot startup.
+Enabled by STARTUP_PROFILE=1 in the process environment. It is read here directly rather than through
+config.settings, because the profiler has to be installed before settings (and pydantic) are imported.
+Offline: python -m utils.startup_profile [--top 25] imports bot.py without starting it and prints the report.
+"""
+import argparse
+import importlib
+import os
+import sys
+import time
+from contextlib import contextmanager
+from importlib.abc import Loader, MetaPathFinder
+from importlib.machinery import ModuleSpec
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+ENV_FLAG = "STARTUP_PROFILE"
+
+class _TimedLoader(Loader):
+    """Wraps a module's loader to time its exec_module; everything else goes to the real loader."""
+
+    def __init__(self, loader: Loader, profiler: "StartupProfiler"):
+        self._loader = loader
+        self._profiler = profiler
+
+    def create_module(self, spec: ModuleSpec) -> Any:
+        return self._loader.create_module(spec)
+
+    def exec_module(self, module: Any) -> None:
+        with self._profiler.timed_import(module.__name__):
+            self._loader.exec_module(module)
+
+    def __getattr__(self, name: str) -> Any: # get_resource_reader, is_package, get_source...
+        return getattr(self._loader, name)
+
+class _TimingFinder(MetaPathFinder):
+    # Recognized by attribute, not class: `python -m utils.startup_profile` loads this file twice
+    # (__main__ and utils.startup_profile), and two finders delegating to each other would recurse
+    timing_finder = True
+
+    def __init__(self, profiler: "StartupProfiler"):
+        self._profiler = profiler
+        self._resolving: Set[str] = set() # Re-entrancy guard: names being looked up through the other finders
+
+    def find_spec(self, fullname: str, path: Optional[Sequence[str]], target: Any = None) -> Optional[ModuleSpec]:
+        if fullname in self._resolving:
+            return None
+        self._resolving.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if getattr(finder, "timing_finder", False) or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                        spec.loader = _TimedLoader(spec.loader, self._profiler)
+                    return spec
+            return None
+        finally:
+            self._resolving.discard(fullname)
+
+class StartupProfiler:
+    """
+    Per-module import time (self: the module's own code; total: including the imports it triggered) and
+    named initialization phases, reported together once startup is done.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.enabled = False
+        self.imports: Dict[str, List[float]] = {} # module -> [self ms, total ms]
+        self.phases: List[Tuple[str, float]] = []
+        self.import_ms = 0.0 # Wall time spent in outermost imports, nested ones not counted twice
+        self._stack: List[List[Any]] = [] # [module, start, time spent in nested imports]
+        self._finder = _TimingFinder(self)
+
+    def install(self) -> None:
+        """Idempotent, also across copies of this module: a timing finder already installed keeps the job."""
+        if not self.enabled and not any(getattr(finder, "timing_finder", False) for finder in sys.meta_path):
+            sys.meta_path.insert(0, self._finder)
+            self.enabled = True
+
+    def install_from_env(self) -> None:
+        if os.environ.get(ENV_FLAG, "").lower() in ("1", "true", "yes"):
+            self.install()
+
+    def uninstall(self) -> None:
+        if self.enabled:
+            sys.meta_path.remove(self._finder)
+            self.enabled = False
+
+    @contextmanager
+    def timed_import(self, module: str) -> Iterator[None]:
+        frame = [module, time.perf_counter(), 0.0]
+        self._stack.append(frame)
+        try:
+            yield
+        finally:
+            self._stack.pop()
+            total = (time.perf_counter() - frame[1]) * 1000
+            self.imports[module] = [total - frame[2], total]
+            if self._stack:
+                self._stack[-1][2] += total
+            else:
+                self.import_ms += total
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Times one initialization step (connecting, building routers...); a no-op while profiling is off."""
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, (time.perf_counter() - start) * 1000))
+
+    def report(self, top: int = 20) -> str:
+        elapsed = (time.perf_counter() - self.started) * 1000
+        lines = [f"Startup profile: {elapsed:.0f}ms since profiling began, {len(self.imports)} modules imported in {self.import_ms:.0f}ms"]
+        # Top-level packages first: what each dependency costs as a whole
+        packages: Dict[str, float] = {}
+        for module, (self_ms, _total) in self.imports.items():
+            package = module.split(".", 1)[0]
+            packages[package] = packages.get(package, 0.0) + self_ms
+        lines.append("Packages by import time:")
+        lines += [f"  {ms:8.1f}ms  {package}" for package, ms in sorted(packages.items(), key=lambda item: -item[1])[:top]]
+        lines.append("Modules by own import time (self / including nested imports):")
+        lines += [f"  {self_ms:8.1f}ms / {total:8.1f}ms  {module}"
+                  for module, (self_ms, total) in sorted(self.imports.items(), key=lambda item: -item[1][0])[:top]]
+        if self.phases:
+            lines.append("Initialization phases:")
+            lines += [f"  {ms:8.1f}ms  {name}" for name, ms in self.phases]
+        return "\n".join(lines)
+
+startup_profiler = StartupProfiler()
+
+def main() -> None:
+    if __name__ == "__main__":
+        # Run as a script: use the importable copy's profiler, the one bot.py (re)installs and reports on
+        from utils.startup_profile import main as module_main
+        module_main()
+        return
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--module", default="bot", help="Module to import (it must not start anything on import)")
+    parser.add_argument("--top", type=int, default=25)
+    args = parser.parse_args()
+    startup_profiler.install()
+    with startup_profiler.phase(f"import {args.module}"):
+        importlib.import_module(args.module)
+    startup_profiler.uninstall()
+    print(startup_profiler.report(args.top))
+
+if __name__ == "__main__":
+    main()
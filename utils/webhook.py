@@ -0,0 +1,185 @@
+# utils/webhook.py
+import asyncio
+import hmac
+import logging
+import signal
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from aiohttp import web
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+
+from config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SECRET_TOKEN_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+def require_secret(mode: str) -> str:
+    """WEBHOOK_SECRET, which every webhook-serving mode needs: without it anyone could post forged updates."""
+    if not settings.WEBHOOK_SECRET:
+        raise RuntimeError(f"BOT_MODE={mode} requires WEBHOOK_SECRET")
+    return settings.WEBHOOK_SECRET
+
+def secret_matches(request: web.Request, secret: str) -> bool:
+    """Constant-time check of the secret token header."""
+    return hmac.compare_digest(request.headers.get(SECRET_TOKEN_HEADER, "").encode(), secret.encode())
+
+class RecentUpdateIds:
+    """Bounded set of the last `maxsize` update_ids seen, oldest evicted first."""
+
+    def __init__(self, maxsize: int = 10000):
+        self.maxsize = maxsize
+        self._ids: "OrderedDict[int, None]" = OrderedDict()
+
+    def add(self, update_id: int) -> bool:
+        """Remembers the id. False if it was already seen (a Telegram retry)."""
+        if update_id in self._ids:
+            return False
+        self._ids[update_id] = None
+        if len(self._ids) > self.maxsize:
+            self._ids.popitem(last=False)
+        return True
+
+    def discard(self, update_id: int) -> None:
+        self._ids.pop(update_id, None)
+
+class WebhookUpdateHandler:
+    """
+    aiohttp endpoint for Telegram webhooks. Acknowledges each POST as soon as the update is queued;
+    a fixed pool of workers feeds the queue to the dispatcher, so a traffic spike grows the queue
+    instead of the number of concurrently running handlers.
+    Retried deliveries of an update_id still remembered are acknowledged and dropped.
+    """
+
+    def __init__(self, dispatcher: Dispatcher, bot: Bot, secret_token: str,
+                 workers: int = 64, queue_size: int = 10000, dedup_size: int = 10000):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.secret_token = secret_token
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._seen = RecentUpdateIds(dedup_size)
+        self._tasks: List[asyncio.Task] = []
+        # Counters for the logs
+        self.duplicates = 0
+        self.rejected = 0
+
+    async def handle(self, request: web.Request) -> web.Response:
+        if not secret_matches(request, self.secret_token):
+            return web.Response(status=401)
+        try:
+            data: Dict[str, Any] = await request.json()
+            update_id = data["update_id"]
+        except (ValueError, KeyError, TypeError):
+            return web.Response(status=400)
+
+        if not self._seen.add(update_id):
+            self.duplicates += 1
+            return web.Response() # Already queued or processed: a retry must still get 200 or Telegram keeps sending it
+        try:
+            self._queue.put_nowait(data) # Parsing into Update happens in the worker, off the request path
+        except asyncio.QueueFull:
+            # Non-2xx makes Telegram redeliver later; forget the id so the retry is accepted
+            self._seen.discard(update_id)
+            self.rejected += 1
+            logger.warning(f"Webhook queue full ({self._queue.maxsize}), refusing update {update_id}")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def _worker(self) -> None:
+        while True:
+            data = await self._queue.get()
+            try:
+                update = Update.model_validate(data, context={"bot": self.bot})
+                await self.dispatcher.feed_update(self.bot, update)
+            except Exception as e:
+                logger.error(f"Error processing update {data.get('update_id')}: {e}", exc_info=True)
+            finally:
+                self._queue.task_done()
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def start(self) -> None:
+        if not self._tasks:
+            self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = 30.0) -> None:
+        """Waits (up to `timeout`) for queued updates to be processed, then stops the workers."""
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Webhook shutdown: {self.pending} queued updates were not processed")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        logger.info(f"Webhook workers stopped ({self.duplicates} duplicate and {self.rejected} refused deliveries)")
+
+async def run_webhook(dp: Dispatcher, bot: Bot, register: bool = True,
+                      health: Optional[Callable[[web.Request], Dict[str, Any]]] = None,
+                      posts: Optional[Dict[str, Callable[[web.Request], Awaitable[web.Response]]]] = None) -> None:
+    """
+    Serves updates on settings.WEBHOOK_HOST:WEBHOOK_PORT + WEBHOOK_PATH until SIGINT/SIGTERM.
+    Runs the dispatcher's startup/shutdown hooks like start_polling does. The webhook stays registered
+    on shutdown, so Telegram holds updates for the next start instead of dropping them.
+    `register=False` skips setWebhook (shard workers behind utils/sharding.py); `health` adds GET /health and
+    `posts` more POST endpoints by path, which also require the secret token header.
+    """
+    secret = require_secret("webhook" if register else "shard_worker")
+    if register and not settings.WEBHOOK_BASE_URL:
+        raise RuntimeError("BOT_MODE=webhook requires WEBHOOK_BASE_URL")
+
+    handler = WebhookUpdateHandler(
+        dp, bot,
+        secret_token=secret,
+        workers=settings.WEBHOOK_WORKERS,
+        queue_size=settings.WEBHOOK_QUEUE_SIZE,
+        dedup_size=settings.WEBHOOK_DEDUP_SIZE
+    )
+    app = web.Application()
+    app.router.add_post(settings.WEBHOOK_PATH, handler.handle)
+    if health:
+        async def handle_health(request: web.Request) -> web.Response:
+            if not secret_matches(request, secret): # Its ?rate= sets the outbound budget
+                return web.Response(status=401)
+            return web.json_response({"webhook_pending": handler.pending, **health(request)})
+        app.router.add_get("/health", handle_health)
+    for path, post in (posts or {}).items():
+        async def handle_post(request: web.Request, post=post) -> web.Response:
+            if not secret_matches(request, secret):
+                return web.Response(status=401)
+            return await post(request)
+        app.router.add_post(path, handle_post)
+    runner = web.AppRunner(app, access_log=None) # One access log line per update is too much under load
+
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop_event.set)
+        except NotImplementedError: # Windows: KeyboardInterrupt still cancels main()
+            pass
+
+    await dp.emit_startup(bot=bot, dispatcher=dp, **dp.workflow_data)
+    handler.start()
+    await runner.setup()
+    try:
+        await web.TCPSite(runner, settings.WEBHOOK_HOST, settings.WEBHOOK_PORT).start()
+        if register:
+            await bot.set_webhook(
+                url=settings.WEBHOOK_BASE_URL.rstrip("/") + settings.WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=dp.resolve_used_update_types(),
+                max_connections=settings.WEBHOOK_MAX_CONNECTIONS
+            )
+        logger.info(f"Webhook server listening on {settings.WEBHOOK_HOST}:{settings.WEBHOOK_PORT}{settings.WEBHOOK_PATH}")
+        await stop_event.wait()
+    finally:
+        await runner.cleanup() # Stop accepting first, then drain what was already acknowledged
+        await handler.stop()
+        await dp.emit_shutdown(bot=bot, dispatcher=dp, **dp.workflow_data)
+        await bot.session.close()